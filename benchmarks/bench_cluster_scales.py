@@ -0,0 +1,186 @@
+"""
+Benchmark of the VsanClusterCheck checks against synthetic clusters of growing
+size, served by libs.fakevcenter.
+
+For each scale a fake vCenter is started in its own process, and each check runs
+in a fresh client process which reports the median wall time and client CPU time
+of the check, collect and render included, the peak RSS of the client and the
+bytes of the request and response bodies of one run.
+
+The results can be saved as a baseline and later runs compared to it, a run is
+a regression when a measure grows by more than the threshold.
+
+Usage (from the repository root):
+  python -m benchmarks.bench_cluster_scales --save-baseline baseline.json
+  python -m benchmarks.bench_cluster_scales --hosts 4 64 --objects 1000 --compare baseline.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+from typing import Dict, List
+
+HOST_COUNTS = [4, 64, 256]
+OBJECT_COUNTS = [1000, 10000, 100000]
+
+# vSAN objects per VM of the synthetic clusters, a namespace, a disk and a swap object
+OBJECTS_PER_VM = 3
+
+RUNS = 3
+
+# Check name and VsanClusterCheck method, the method collects and renders
+CHECKS = {
+    'capacity': 'get_cluster_vsan_capacity',
+    'health': 'get_health_status',
+    'hcl': 'get_cluster_hcl_info',
+    'vms': 'get_cluster_vms',
+}
+
+# Measure name and column header
+MEASURES = {
+    'wall': 'Wall (s)',
+    'cpu': 'CPU (s)',
+    'rss': 'Peak RSS (MB)',
+    'sent': 'Sent (KB)',
+    'received': 'Received (KB)',
+}
+
+# Relative growth of a measure reported as a regression
+THRESHOLD = 0.2
+
+# Absolute growth of a measure below which it is noise, never a regression
+NOISE = {'wall': 0.01, 'cpu': 0.01, 'rss': 1, 'sent': 0, 'received': 0}
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description='Benchmark of the vSAN checks at synthetic cluster scales')
+    parser.add_argument('--hosts', type=int, nargs='+', default=HOST_COUNTS, metavar='N',
+                        help='Hosts per cluster of the scales')
+    parser.add_argument('--objects', type=int, nargs='+', default=OBJECT_COUNTS, metavar='N',
+                        help='vSAN objects per cluster of the scales')
+    parser.add_argument('--checks', nargs='+', default=list(CHECKS), choices=list(CHECKS), metavar='CHECK',
+                        help='Checks to run')
+    parser.add_argument('--runs', type=int, default=RUNS, metavar='N', help='Runs of each check')
+    parser.add_argument('--save-baseline', metavar='FILE', help='Save the results as a baseline')
+    parser.add_argument('--compare', metavar='FILE', help='Compare the results to a baseline')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='Relative growth reported as a regression (default {})'.format(THRESHOLD))
+    # Internal, run one check in this process against a running fake vCenter
+    parser.add_argument('--client', metavar='HOST:PORT', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def run_client(address: str, check: str, runs: int) -> dict:
+    """ Run a check against the fake vCenter, in this process """
+
+    import libs.vsanmgmtObjects
+    from libs.session import VsanSession
+    from libs.transport import ByteCounter, Redirector
+    from libs.vsanclustercheck import VsanClusterCheck
+
+    counter = ByteCounter(Redirector(address))
+    session = VsanSession(host='fake', user='fake', password='fake', transport=counter)
+    vcc = VsanClusterCheck(cluster='cluster-1', session=session)
+    method = getattr(vcc, CHECKS[check])
+
+    walls, cpus = [], []
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(runs):
+            # Each run queries the cluster health summary again
+            vcc.health_summaries = {}
+            counter.reset()
+            wall, cpu = time.perf_counter(), time.process_time()
+            method()
+            walls.append(time.perf_counter() - wall)
+            cpus.append(time.process_time() - cpu)
+
+    session.close()
+    return {'wall': statistics.median(walls),
+            'cpu': statistics.median(cpus),
+            # ru_maxrss is in kilobytes on Linux
+            'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            'sent': counter.sent / 1024,
+            'received': counter.received / 1024}
+
+
+def run_scale(nb_hosts: int, nb_objects: int, checks: List[str], runs: int) -> Dict[str, dict]:
+    """ Run the checks against a fake vCenter of one cluster of the given size """
+
+    server = subprocess.Popen([sys.executable, '-m', 'libs.fakevcenter', '--port', '0',
+                               '--hosts', str(nb_hosts),
+                               '--vms', str(max(nb_objects // OBJECTS_PER_VM, 1)),
+                               '--objects', str(nb_objects)],
+                              stdout=subprocess.PIPE, universal_newlines=True)
+    try:
+        address = server.stdout.readline().split()[-1]
+        results = {}
+        for check in checks:
+            output = subprocess.check_output([sys.executable, '-m', 'benchmarks.bench_cluster_scales',
+                                              '--client', address, '--checks', check, '--runs', str(runs)],
+                                             universal_newlines=True)
+            results[check] = json.loads(output)
+        return results
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def get_key(nb_hosts: int, nb_objects: int, check: str) -> str:
+    return '{}h/{}o/{}'.format(nb_hosts, nb_objects, check)
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    """ Regressions of the results compared to the baseline """
+
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        for measure in MEASURES:
+            growth = result[measure] - base[measure]
+            if base[measure] and growth > base[measure] * threshold and growth > NOISE[measure]:
+                regressions.append('{} {}: {:.3f} -> {:.3f} (+{:.0%})'.format(
+                    key, measure, base[measure], result[measure], result[measure] / base[measure] - 1))
+    return regressions
+
+
+def main():
+    args = get_args()
+
+    if args.client:
+        print(json.dumps(run_client(args.client, args.checks[0], args.runs)))
+        return
+
+    print('{:<20} {}'.format('Scale', ' '.join('{:>14}'.format(x) for x in MEASURES.values())))
+    results = {}
+    for nb_hosts in args.hosts:
+        for nb_objects in args.objects:
+            for check, result in run_scale(nb_hosts, nb_objects, args.checks, args.runs).items():
+                key = get_key(nb_hosts, nb_objects, check)
+                results[key] = result
+                print('{:<20} {}'.format(key, ' '.join('{:>14.3f}'.format(result[x]) for x in MEASURES)),
+                      flush=True)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print('Regression: {}'.format(regression))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
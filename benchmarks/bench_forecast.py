@@ -0,0 +1,104 @@
+"""
+Benchmark of the capacity forecast of libs.forecast over a synthetic history of
+thousands of clusters.
+
+Each cluster grows its used and committed capacity at its own seeded rate with
+some noise, the benchmark reports the time of the forecast of all the clusters
+and the largest error of the fitted growth against the generated rate.
+
+Usage (from the repository root):
+  python -m benchmarks.bench_forecast --clusters 1000 5000 --days 30 --per-day 4
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from libs.forecast import forecast_capacity
+from libs.history import HistoryStore
+
+CLUSTER_COUNTS = [1000, 5000]
+
+# Days of history and samples per day of each cluster, e.g. a fleet run every 6 hours
+DAYS = 30
+PER_DAY = 4
+
+RUNS = 5
+
+# Total capacity of the synthetic clusters
+TOTAL = 100 * 2 ** 40
+
+
+def generate(history: HistoryStore, nb_clusters: int, days: int, per_day: int, now: float) -> dict:
+    """ Write the samples of the clusters, returns the generated used growth per day of each """
+
+    rng = random.Random(nb_clusters)
+    growths = {}
+    series = []
+    rows = []
+    for i in range(nb_clusters):
+        cluster = 'cluster-{}'.format(i)
+        used, committed = rng.uniform(20, 60), rng.uniform(30, 70)
+        growth, committed_growth = rng.uniform(-0.1, 0.5), rng.uniform(-0.1, 0.5)
+        growths[cluster] = growth
+        ids = {}
+        for metric in ['capacity_total_bytes', 'capacity_free_bytes', 'capacity_committed_bytes',
+                       'capacity_used_percent', 'capacity_committed_percent']:
+            ids[metric] = len(series) + 1
+            series.append((ids[metric], 'vc', cluster, metric, json.dumps({})))
+        for j in range(days * per_day):
+            day = j / per_day - days
+            ts = int(now + day * 86400)
+            used_pct = used + growth * day + rng.gauss(0, 0.2)
+            committed_pct = committed + committed_growth * day + rng.gauss(0, 0.2)
+            for metric, value in [('capacity_total_bytes', TOTAL),
+                                  ('capacity_free_bytes', TOTAL * (100 - used_pct) / 100),
+                                  ('capacity_committed_bytes', TOTAL * committed_pct / 100),
+                                  ('capacity_used_percent', used_pct),
+                                  ('capacity_committed_percent', committed_pct)]:
+                rows.append((ids[metric], ts, value, value, value))
+
+    # Bulk insert, the store appends one run of one cluster at a time.
+    with history.connection:
+        history.connection.execute('BEGIN')
+        history.connection.executemany('INSERT INTO series VALUES (?, ?, ?, ?, ?)', series)
+        history.connection.executemany('INSERT INTO samples VALUES (?, 0, ?, ?, ?, ?, 1)', rows)
+    return growths
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description='Benchmark of the capacity forecast of many clusters')
+    parser.add_argument('--clusters', type=int, nargs='+', default=CLUSTER_COUNTS, metavar='N',
+                        help='Clusters of the history')
+    parser.add_argument('--days', type=int, default=DAYS, metavar='N', help='Days of history')
+    parser.add_argument('--per-day', type=int, default=PER_DAY, metavar='N', help='Samples per day')
+    parser.add_argument('--runs', type=int, default=RUNS, metavar='N', help='Runs of the forecast')
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+    now = time.time()
+    print('{:>10} {:>10} {:>14} {:>16}'.format('Clusters', 'Samples', 'Forecast (s)', 'Max error (%/d)'))
+    for nb_clusters in args.clusters:
+        with tempfile.TemporaryDirectory() as directory:
+            history = HistoryStore(os.path.join(directory, 'history.db'))
+            growths = generate(history, nb_clusters, args.days, args.per_day, now)
+            durations = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                forecasts = forecast_capacity(history, window=args.days * 86400, now=now)
+                durations.append(time.perf_counter() - start)
+            history.close()
+
+        error = max(abs(x.used.growth - growths[x.cluster_name]) for x in forecasts)
+        print('{:>10} {:>10} {:>14.3f} {:>16.4f}'.format(nb_clusters, nb_clusters * args.days * args.per_day,
+                                                         statistics.median(durations), error))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Micro-benchmark of the object identity / VM / object information pairing done
+by VsanClusterCheck.get_cluster_vms, using synthetic identities.
+
+Each size is paired several times with the garbage collector off and the best
+run is kept, next to a reference pairing written inline with the same dict
+indexes. The memory of the large sizes does not fit in the CPU caches, so even a
+linear pass costs more per object at 100k objects than at 1k. The pairing is
+compared to the reference, which pays the same cache misses:
+
+* the slope of log(time) against log(objects) may exceed the slope of the
+  reference by MAX_SLOPE_EXCESS, an n log n pairing exceeds it by about 0.1;
+* its time may be MAX_REFERENCE_RATIO times the reference time, as the geometric
+  mean over the sizes.
+
+The benchmark exits with 1 when either gate fails.
+
+Usage (from the repository root):
+  python -m benchmarks.bench_object_pairing
+"""
+
+import argparse
+import gc
+import math
+import sys
+import time
+
+from types import SimpleNamespace
+
+from libs.inventory import ClusterVm
+from libs.objectquery import ObjectInfo
+from libs.vsanclustercheck import VsanClusterCheck
+
+OBJECT_COUNTS = [1000, 10000, 50000, 100000]
+OBJECTS_PER_VM = 4
+
+RUNS = 7
+
+# Largest excess of the log-log slope of the pairing over the one of the reference.
+# The slopes differ by 0.04 at most between runs, n log n adds 1 / ln(n), about 0.1.
+MAX_SLOPE_EXCESS = 0.08
+
+# Largest time of the pairing against the reference, geometric mean over the sizes.
+# The pairing measures 1.05 to 1.1 times the reference.
+MAX_REFERENCE_RATIO = 1.3
+
+
+def make_cluster(nb_objects: int):
+    vms = [ClusterVm(moref='vm-{}'.format(i), name='vm-{:06}'.format(i), instance_uuid=None, host_name=None)
+           for i in range(nb_objects // OBJECTS_PER_VM)]
+    identities = [SimpleNamespace(uuid='uuid-{:08}'.format(i),
+                                  type='vdisk',
+                                  vm=SimpleNamespace(_moId='vm-{}'.format(i // OBJECTS_PER_VM)))
+                  for i in range(nb_objects)]
+    # vCenter does not return the information in the identities order
+    objs_info = [ObjectInfo(uuid='uuid-{:08}'.format(i), health='healthy', compliance='compliant')
+                 for i in reversed(range(nb_objects))]
+    return identities, vms, objs_info
+
+
+def reference_pairing(identities, vms, objs_info) -> list:
+    """ Linear pairing with the fewest operations, the baseline of the cost of the same dict lookups """
+    vms_by_moref = {x.moref: x for x in vms}
+    objs_info_by_uuid = {x.uuid: x for x in objs_info}
+    return [(x, vms_by_moref.get(x.vm._moId), objs_info_by_uuid.get(x.uuid)) for x in identities]
+
+
+def timed(pairing, identities, vms, objs_info) -> float:
+    """ Time of a pairing, without garbage collection during the run """
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        objs = pairing(identities, vms, objs_info)
+        elapsed = time.perf_counter() - start
+    finally:
+        gc.enable()
+    assert all(obj_ident.uuid == obj_info.uuid for obj_ident, _, obj_info in objs)
+    return elapsed
+
+
+def best_times(identities, vms, objs_info, runs: int) -> tuple:
+    """ Best times of the pairing and of the reference over the runs, interleaved to share the noise """
+    best, reference = float('inf'), float('inf')
+    for _ in range(runs):
+        best = min(best, timed(VsanClusterCheck.pair_objects, identities, vms, objs_info))
+        reference = min(reference, timed(reference_pairing, identities, vms, objs_info))
+    return best, reference
+
+
+def log_slope(counts: list, times: list) -> float:
+    """ Least squares slope of log(time) against log(count), 1 for a linear time """
+    xs = [math.log(x) for x in counts]
+    ys = [math.log(x) for x in times]
+    mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sum((x - mean_x) ** 2 for x in xs)
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description='Benchmark of the vSAN object pairing')
+    parser.add_argument('--objects', type=int, nargs='+', default=OBJECT_COUNTS, metavar='N',
+                        help='Objects of the synthetic clusters')
+    parser.add_argument('--runs', type=int, default=RUNS, metavar='N', help='Runs per size, the best is kept')
+    parser.add_argument('--max-slope-excess', type=float, default=MAX_SLOPE_EXCESS, metavar='SLOPE',
+                        help='Largest excess of the log-log slope over the reference')
+    parser.add_argument('--max-reference-ratio', type=float, default=MAX_REFERENCE_RATIO, metavar='RATIO',
+                        help='Largest time against the reference, geometric mean over the sizes')
+    args = parser.parse_args()
+    if len(set(args.objects)) < 2:
+        parser.error('the slope needs at least two sizes')
+    return args
+
+
+def main():
+    args = get_args()
+    print('{:>10} {:>12} {:>14} {:>14} {:>10}'.format('Objects', 'Best (s)', 'us / object', 'Reference (s)',
+                                                      'Ratio'))
+    counts = sorted(set(args.objects))
+    times, references = [], []
+    for nb_objects in counts:
+        identities, vms, objs_info = make_cluster(nb_objects)
+        elapsed, reference = best_times(identities, vms, objs_info, args.runs)
+        times.append(elapsed)
+        references.append(reference)
+        print('{:>10} {:>12.4f} {:>14.3f} {:>14.4f} {:>9.2f}x'.format(nb_objects, elapsed, elapsed / nb_objects * 1e6,
+                                                                      reference, elapsed / reference))
+
+    slope, reference_slope = log_slope(counts, times), log_slope(counts, references)
+    ratio = math.exp(sum(math.log(x / y) for x, y in zip(times, references)) / len(counts))
+    print('\nLog-log slope: {:.3f}, reference: {:.3f} (max excess {:g})'.format(slope, reference_slope,
+                                                                               args.max_slope_excess))
+    print('Time against the reference: {:.2f}x (max {:g}x)'.format(ratio, args.max_reference_ratio))
+    failed = False
+    if slope - reference_slope > args.max_slope_excess:
+        print('The pairing does not scale linearly')
+        failed = True
+    if ratio > args.max_reference_ratio:
+        print('The pairing is slower than the reference')
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
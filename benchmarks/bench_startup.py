@@ -0,0 +1,69 @@
+"""
+Startup benchmark of the vSAN SDK sample scripts, each measure is taken in fresh
+interpreters and the median is reported.
+
+The vSAN types of libs.vsanmgmtObjects are registered with the pyVmomi
+CreateDataType / CreateManagedType / CreateEnumType calls, which only record the
+type definitions: the types are created on their first lookup. The 'first vSAN
+type lookup' line measures that deferred creation.
+
+Usage (from the repository root):
+  python -m benchmarks.bench_startup
+"""
+
+import statistics
+import subprocess
+import sys
+import time
+
+RUNS = 10
+
+# (description, setup statements, measured statements)
+MEASURES = [
+    ('import pyVmomi', '', 'import pyVmomi'),
+    ('import libs.vsanmgmtObjects', 'import pyVmomi', 'import libs.vsanmgmtObjects'),
+    ('first vSAN type lookup', 'import libs.vsanmgmtObjects\nfrom pyVmomi import vim',
+     'vim.cluster.VsanVcClusterHealthSystem'),
+    ('import libs.vsanclustercheck', '', 'import libs.vsanclustercheck'),
+    ('import queryvsancluster', '', 'import queryvsancluster'),
+]
+
+TEMPLATE = """
+import time
+{setup}
+start = time.perf_counter()
+{statement}
+print(time.perf_counter() - start)
+"""
+
+
+def measure(setup: str, statement: str) -> float:
+    """ Median time of the statement in fresh interpreters, in seconds """
+    times = []
+    for _ in range(RUNS):
+        output = subprocess.check_output([sys.executable, '-c', TEMPLATE.format(setup=setup, statement=statement)])
+        times.append(float(output))
+    return statistics.median(times)
+
+
+def measure_process(args: list) -> float:
+    """ Median wall time of the process, interpreter startup included, in seconds """
+    times = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable] + args, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    print('{:<32} {:>10}'.format('Step', 'Time (ms)'))
+    for description, setup, statement in MEASURES:
+        print('{:<32} {:>10.2f}'.format(description, measure(setup, statement) * 1e3))
+    print('{:<32} {:>10.2f}'.format('python -c pass', measure_process(['-c', 'pass']) * 1e3))
+    print('{:<32} {:>10.2f}'.format('queryvsancluster.py --help',
+                                    measure_process(['queryvsancluster.py', '--help']) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pyVmomi import vim
+
+from libs.results import CapacityResult, HclResult, HealthResult, VmsResult
+from libs.session import VsanSession
+from libs.vsanclustercheck import VsanClusterCheck
+
+# Seconds between two refreshes of each check, per check
+REFRESH_INTERVALS = {'capacity': 300, 'health': 300, 'hcl': 3600, 'vms': 900}
+
+EXPORTER_PORT = 9598
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# (metric family, labels, value)
+Sample = Tuple[str, Dict[str, str], float]
+
+# Type and help of each metric family, in exposition order
+METRICS = {
+    'vsan_capacity_total_bytes': ('gauge', 'vSAN datastore capacity'),
+    'vsan_capacity_free_bytes': ('gauge', 'vSAN datastore free capacity'),
+    'vsan_capacity_committed_bytes': ('gauge', 'vSAN datastore committed capacity'),
+    'vsan_space_used_bytes': ('gauge', 'Space used by object type'),
+    'vsan_space_reserved_bytes': ('gauge', 'Space reserved by object type'),
+    'vsan_space_overhead_bytes': ('gauge', 'Space overhead by object type'),
+    'vsan_cluster_status': ('gauge', 'Cluster health status, 1 for the current status'),
+    'vsan_host_status': ('gauge', 'Host health status, 1 for the current status'),
+    'vsan_clomd_liveness_issue': ('gauge', 'Whether a CLOMD liveness issue was found'),
+    'vsan_host_clomd_status': ('gauge', 'Host CLOMD status, 1 for the current status'),
+    'vsan_disk_fullness_percent': ('gauge', 'Disk usage'),
+    'vsan_disk_variance_percent': ('gauge', 'Disk usage variance from the cluster average'),
+    'vsan_objects': ('gauge', 'Number of vSAN objects by health state'),
+    'vsan_hcl_db_last_update_timestamp_seconds': ('gauge', 'Time of the last HCL database update'),
+    'vsan_hcl_device_supported': ('gauge', 'Whether the controller is on the HCL'),
+    'vsan_hcl_driver_supported': ('gauge', 'Whether the controller driver version is on the HCL'),
+    'vsan_hcl_firmware_supported': ('gauge', 'Whether the controller firmware version is on the HCL'),
+    'vsan_exporter_collector_up': ('gauge', 'Whether the last refresh of the check succeeded'),
+    'vsan_exporter_collector_duration_seconds': ('gauge', 'Duration of the last refresh of the check'),
+    'vsan_exporter_collector_last_success_timestamp_seconds': ('gauge', 'Time of the last successful refresh'),
+}
+
+
+def _bool(value: Optional[bool]) -> float:
+    return float('nan') if value is None else float(bool(value))
+
+
+def _timestamp(value) -> float:
+    return value.timestamp() if value else float('nan')
+
+
+def capacity_samples(result: CapacityResult) -> List[Sample]:
+    samples = [('vsan_capacity_total_bytes', {}, result.total),
+               ('vsan_capacity_free_bytes', {}, result.free),
+               ('vsan_capacity_committed_bytes', {}, result.committed)]
+    for obj in result.space_usage:
+        labels = {'obj_type': obj.obj_type}
+        samples.extend([('vsan_space_used_bytes', labels, obj.used),
+                        ('vsan_space_reserved_bytes', labels, obj.reserved),
+                        ('vsan_space_overhead_bytes', labels, obj.overhead)])
+    return samples
+
+
+def health_samples(result: HealthResult) -> List[Sample]:
+    samples = []
+    if result.cluster_status:
+        samples.append(('vsan_cluster_status', {'status': result.cluster_status.status or ''}, 1))
+        samples.extend(('vsan_host_status', {'hostname': x.hostname, 'status': x.status or ''}, 1)
+                       for x in result.cluster_status.hosts)
+    if result.clomd_liveness:
+        samples.append(('vsan_clomd_liveness_issue', {}, _bool(result.clomd_liveness.issue_found)))
+        samples.extend(('vsan_host_clomd_status', {'hostname': x.hostname, 'status': x.status or ''}, 1)
+                       for x in result.clomd_liveness.hosts)
+    for disk in result.disk_balance or []:
+        samples.extend([('vsan_disk_fullness_percent', {'uuid': disk.uuid}, disk.fullness),
+                        ('vsan_disk_variance_percent', {'uuid': disk.uuid}, disk.variance)])
+    return samples
+
+
+def hcl_samples(result: HclResult) -> List[Sample]:
+    samples = [('vsan_hcl_db_last_update_timestamp_seconds', {}, _timestamp(result.db_last_update))]
+    for host in result.hosts:
+        for device in host.controllers:
+            labels = {'hostname': host.hostname, 'device': device.device_name}
+            samples.extend([('vsan_hcl_device_supported', labels, _bool(device.device_on_hcl)),
+                            ('vsan_hcl_driver_supported', labels, _bool(device.driver_version_supported)),
+                            ('vsan_hcl_firmware_supported', labels, _bool(device.fw_version_supported))])
+    return samples
+
+
+def vms_samples(result: VmsResult) -> List[Sample]:
+    return [('vsan_objects', {'health': x.health}, x.num_objects) for x in result.health_counts]
+
+
+# Collect method and sample conversion of each exported check
+COLLECTORS: Dict[str, Tuple[str, Callable[..., List[Sample]]]] = {
+    'capacity': ('collect_vsan_capacity', capacity_samples),
+    'health': ('collect_health_status', health_samples),
+    'hcl': ('collect_cluster_hcl_info', hcl_samples),
+    'vms': ('collect_cluster_vms', vms_samples),
+}
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_value(value: float) -> str:
+    if value != value:
+        return 'NaN'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def format_metrics(samples: Iterable[Sample]) -> bytes:
+    """ Format the samples in the Prometheus text exposition format, grouped by metric family """
+
+    families: Dict[str, List[str]] = {x: [] for x in METRICS}
+    for family, labels, value in samples:
+        label_str = ','.join('{}="{}"'.format(k, _escape(v)) for k, v in labels.items())
+        families[family].append('{}{{{}}} {}'.format(family, label_str, _format_value(value)))
+
+    lines = []
+    for family, family_lines in families.items():
+        if not family_lines:
+            continue
+        metric_type, metric_help = METRICS[family]
+        lines.append('# HELP {} {}'.format(family, metric_help))
+        lines.append('# TYPE {} {}'.format(family, metric_type))
+        lines.extend(family_lines)
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+class MetricsCache(object):
+    """Latest samples of every collector and their formatted snapshot
+
+    The snapshot is formatted when a collector updates its samples, so a scrape only
+    returns the cached bytes.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples: Dict[Tuple[str, str], List[Sample]] = {}
+        self.status: Dict[Tuple[str, str], List[Sample]] = {}
+        self.body = format_metrics([])
+
+    def update(self, key: Tuple[str, str], samples: Optional[List[Sample]], status: List[Sample]) -> None:
+        """ Replace the samples of a collector, None keeps its previous samples """
+        with self.lock:
+            if samples is not None:
+                self.samples[key] = samples
+            self.status[key] = status
+            self.body = format_metrics([x for y in self.samples.values() for x in y] +
+                                       [x for y in self.status.values() for x in y])
+
+    def snapshot(self) -> bytes:
+        return self.body
+
+
+class Collector(threading.Thread):
+    """ Refresh one check of one cluster every 'interval' seconds in the background """
+
+    def __init__(self, cache: MetricsCache, vcc: VsanClusterCheck, check: str, interval: float,
+                 stop_event: threading.Event):
+        super().__init__(name='collector-{}-{}'.format(vcc.cluster_name, check), daemon=True)
+        self.cache = cache
+        self.vcc = vcc
+        self.check = check
+        self.interval = interval
+        self.stop_event = stop_event
+        self.labels = {'vcenter': vcc.host_name, 'cluster': vcc.cluster_name}
+        self.last_success = float('nan')
+
+    def refresh(self) -> None:
+        method, to_samples = COLLECTORS[self.check]
+        start = time.time()
+        try:
+            # The health summary is queried again on each refresh.
+            self.vcc.health_summaries = {}
+            samples = [(family, dict(self.labels, **labels), value)
+                       for family, labels, value in to_samples(getattr(self.vcc, method)())]
+            up = 1
+            self.last_success = time.time()
+        except Exception:
+            # The previous samples are served until a refresh succeeds.
+            samples = None
+            up = 0
+
+        labels = dict(self.labels, check=self.check)
+        status = [('vsan_exporter_collector_up', labels, up),
+                  ('vsan_exporter_collector_duration_seconds', labels, time.time() - start),
+                  ('vsan_exporter_collector_last_success_timestamp_seconds', labels, self.last_success)]
+        self.cache.update((self.vcc.cluster_name, self.check), samples, status)
+
+    def run(self) -> None:
+        while not self.stop_event.is_set():
+            start = time.time()
+            self.refresh()
+            self.stop_event.wait(max(self.interval - (time.time() - start), 0))
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.server.cache.snapshot()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Exporter(object):
+    """Prometheus exporter of the vSAN checks of the clusters of a vCenter
+
+    Each check of each cluster is refreshed by its own background thread on its own
+    interval, and /metrics serves the cached snapshot without calling vCenter.
+    """
+
+    def __init__(self,
+                 session: VsanSession,
+                 clusters: Dict[str, Optional[vim.ClusterComputeResource]],
+                 checks: List[str] = None,
+                 intervals: Dict[str, float] = None,
+                 address: str = '',
+                 port: int = EXPORTER_PORT,
+                 **kwargs):
+        self.cache = MetricsCache()
+        self.stop_event = threading.Event()
+        intervals = dict(REFRESH_INTERVALS, **(intervals or {}))
+
+        self.collectors = []
+        for name, instance in clusters.items():
+            for check in checks or list(COLLECTORS):
+                # One checker per collector, so the collectors do not share a health summary.
+                vcc = VsanClusterCheck(cluster=name, session=session, cluster_instance=instance, **kwargs)
+                vcc.health_checks = [x for x in [check] if x in vcc.health_summary_fields]
+                # The cluster is looked up once for all its checks.
+                instance = vcc.cluster_instance
+                self.collectors.append(Collector(self.cache, vcc, check, intervals[check], self.stop_event))
+
+        self.server = ThreadingHTTPServer((address, port), MetricsHandler)
+        self.server.daemon_threads = True
+        self.server.cache = self.cache
+
+    def serve_forever(self) -> None:
+        for collector in self.collectors:
+            collector.start()
+        try:
+            self.server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self.stop_event.set()
+        self.server.server_close()
@@ -0,0 +1,917 @@
+"""
+Synthetic vCenter answering the vim and vsanHealth SOAP calls made by the checks,
+for offline benchmarks and tests.
+
+The inventory holds 'datacenters' datacenters of 'clusters' vSAN clusters each, named
+alike in every datacenter, of 'hosts' hosts each, with 'vms' VMs and 'objects' vSAN
+objects per cluster, all generated from 'seed'. Every request is
+answered after 'latency' seconds, to simulate the round trip to a remote vCenter.
+
+The server speaks plain HTTP, connect a session to it with the
+libs.transport.Redirector transport, e.g. queryvsancluster.py --fake-vcenter.
+
+Usage (from the repository root):
+  python -m libs.fakevcenter --port 8989 --hosts 16 --vms 2000 --objects 10000 --latency 0.05
+"""
+
+import argparse
+import gzip
+import io
+import itertools
+import math
+import random
+import threading
+import time
+import xml.etree.ElementTree as ElementTree
+import zlib
+
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+from uuid import NAMESPACE_URL, uuid5
+
+import libs.vsanmgmtObjects
+from pyVmomi import SoapAdapter, VmomiSupport, vim, vmodl
+from pyVmomi.Iso8601 import ParseISO8601
+from pyVmomi.VmomiSupport import Object
+
+VIM_VERSION = VmomiSupport.newestVersions.Get('vim')
+VSAN_VERSION = VmomiSupport.newestVersions.Get('vsan')
+
+SERVICE_VERSIONS = {
+    '/sdk/vimServiceVersions.xml': '<namespaces version="1.0"><namespace><name>urn:vim25</name>'
+                                   '<version>6.7.3</version></namespace></namespaces>',
+    '/sdk/vsanServiceVersions.xml': '<namespaces version="1.0"><namespace><name>urn:vsan</name>'
+                                    '<version>6.7.3</version></namespace></namespaces>',
+}
+
+OBJECT_TYPES = ['namespace', 'vdisk', 'vmswap']
+
+_method_lock = threading.Lock()
+
+# Share of the objects that are not healthy
+UNHEALTHY_RATIO = 0.02
+
+# Share of the objects being resynced, and their bytes to sync
+RESYNC_RATIO = 0.01
+RESYNC_MIN_BYTES = 2 ** 30
+RESYNC_MAX_BYTES = 64 * 2 ** 30
+
+# Reasons of the resyncs
+RESYNC_REASONS = ['evacuate', 'repair', 'rebalance', 'reconfigure']
+
+# Metric labels of the perf entities, and seconds between two of their samples by default
+PERF_LABELS = ['iopsRead', 'iopsWrite', 'throughputRead', 'throughputWrite', 'latencyAvgRead', 'latencyAvgWrite']
+PERF_INTERVAL = 300
+
+# Network performance and VMDK load tests in the history of each cluster, one a day, and VMDKs per host
+HISTORY_TESTS = 7
+HISTORY_VMDKS = 2
+
+# Managed types whose methods are answered, listing them loads them and registers their methods
+MANAGED_TYPES = [vim.ServiceInstance, vim.SessionManager, vim.view.ViewManager, vim.view.ContainerView,
+                 vim.view.ListView, vim.SearchIndex, vmodl.query.PropertyCollector,
+                 vmodl.query.PropertyCollector.Filter, vim.cluster.VsanSpaceReportSystem,
+                 vim.cluster.VsanVcClusterHealthSystem, vim.cluster.VsanObjectSystem, vim.VsanMassCollector,
+                 vim.cluster.VsanPerformanceManager]
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def _children(element: ElementTree.Element, name: str) -> List[ElementTree.Element]:
+    return [x for x in element if _local_name(x.tag) == name]
+
+
+def _text(element: ElementTree.Element, name: str, default: str = None) -> Optional[str]:
+    children = _children(element, name)
+    return children[0].text if children else default
+
+
+def _xsi_type(element: ElementTree.Element) -> str:
+    for key, value in element.attrib.items():
+        if _local_name(key) == 'type':
+            return value.rsplit(':', 1)[-1]
+    return ''
+
+
+def _history_value(key: str, low: int, high: int) -> int:
+    """ Value of a test history sample, a function of its key so every query returns it """
+    return low + zlib.crc32(key.encode()) % (high - low)
+
+
+def _serialize_fault(fault: vmodl.MethodFault, version: str, ns_map: Dict[str, str]) -> str:
+    """ Fault detail element, SoapAdapter.SerializeFaultDetail is broken in pyVmomi 6.7.3 """
+    writer = io.StringIO()
+    serializer = SoapAdapter.SoapSerializer(writer, version, ns_map)
+    # The declared type is the base fault type, so the element gets the xsi:type of the fault.
+    # noinspection PyProtectedMember
+    serializer._SerializeDataObject(fault, Object(name=fault._wsdlName + 'Fault', type=vmodl.MethodFault,
+                                                  version=version, flags=0),
+                                    ' xmlns="{}"'.format(VmomiSupport.GetWsdlNamespace(version)), serializer.defaultNS)
+    return writer.getvalue()
+
+
+class FakeVcenter(object):
+    """ Synthetic vCenter inventory and the handlers of the SOAP calls """
+
+    def __init__(self,
+                 clusters: int = 1,
+                 hosts: int = 4,
+                 vms: int = 100,
+                 objects: int = 400,
+                 latency: float = 0.,
+                 task_duration: float = 1.,
+                 resync_rate: float = 100 * 2 ** 20,
+                 seed: int = 0,
+                 datacenters: int = 1):
+        self.latency = latency
+        self.task_duration = task_duration
+        self.resync_rate = resync_rate
+        self.random = random.Random(seed)
+        # The resyncs are drawn apart, so the objects of a seed are the same as without them.
+        self.resync_random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.props: Dict[str, Tuple[str, Dict[str, object]]] = {}
+        self.cluster_data: Dict[str, dict] = {}
+        self.pages: Dict[str, list] = {}
+        # Filters of each collector created by CreatePropertyCollector, their FilterSpec, the objects
+        # and properties of their last update set and the version of each collector
+        self.collectors: Dict[str, List[str]] = {}
+        self.filters: Dict[str, ElementTree.Element] = {}
+        self.sent: Dict[str, Dict[str, tuple]] = {}
+        self.versions: Dict[str, int] = {}
+        # Notified when the objects change, for the pending WaitForUpdatesEx calls
+        self.changed = threading.Condition(self.lock)
+        self.ids = itertools.count(1)
+        self.now = datetime.now(timezone.utc)
+        self.started = time.monotonic()
+
+        self.content = vim.ServiceInstanceContent(
+            rootFolder=vim.Folder('group-d1'),
+            propertyCollector=vmodl.query.PropertyCollector('propertyCollector'),
+            viewManager=vim.view.ViewManager('ViewManager'),
+            searchIndex=vim.SearchIndex('SearchIndex'),
+            sessionManager=vim.SessionManager('SessionManager'),
+            about=vim.AboutInfo(name='VMware vCenter Server', fullName='VMware vCenter Server 6.7.0 (fake)',
+                                vendor='VMware, Inc.', version='6.7.0', build='0', osType='linux-x64',
+                                apiType='VirtualCenter', apiVersion='6.7.3',
+                                instanceUuid='00000000-0000-0000-0000-{:012}'.format(seed)))
+        self.session = vim.UserSession(key='fake-session', userName='fake', fullName='fake',
+                                       loginTime=self.now, lastActiveTime=self.now, locale='en', messageLocale='en')
+        self.add('ServiceInstance', 'ServiceInstance', content=self.content)
+        self.add('SessionManager', 'SessionManager', currentSession=self.session)
+        datacenter_refs = [vim.Datacenter('datacenter-{}'.format(i)) for i in range(1, datacenters + 1)]
+        self.add('group-d1', 'Folder', name='Datacenters', childEntity=vim.ManagedEntity.Array(datacenter_refs))
+
+        cluster_ids = itertools.count(1)
+        vm_ids = itertools.count(1)
+        host_ids = itertools.count(1)
+        for datacenter_index, datacenter_ref in enumerate(datacenter_refs, 1):
+            folder_ref = vim.Folder('group-h{}'.format(datacenter_index))
+            self.add(datacenter_ref._moId, 'Datacenter', name='Datacenter-{}'.format(datacenter_index),
+                     hostFolder=folder_ref, parent=vim.Folder('group-d1'))
+            cluster_refs = [self.add_cluster(next(cluster_ids), cluster_index, folder_ref, host_ids, vm_ids, hosts,
+                                             vms, objects) for cluster_index in range(1, clusters + 1)]
+            self.add(folder_ref._moId, 'Folder', name='host', childEntity=vim.ManagedEntity.Array(cluster_refs),
+                     parent=datacenter_ref)
+
+    def add_cluster(self, cluster_id: int, cluster_index: int, folder_ref: vim.Folder, host_ids: Iterator[int],
+                    vm_ids: Iterator[int], hosts: int, vms: int, objects: int) -> vim.ClusterComputeResource:
+        """ vSAN cluster of the host folder of a datacenter, with its hosts and VMs """
+        cluster_ref = vim.ClusterComputeResource('domain-c{}'.format(cluster_id))
+        host_refs = [vim.HostSystem('host-{}'.format(next(host_ids))) for _ in range(hosts)]
+        vm_refs = [vim.VirtualMachine('vm-{}'.format(next(vm_ids))) for _ in range(vms)]
+        for host_ref in host_refs:
+            self.add(host_ref._moId, 'HostSystem', name='esx-{}.fake.local'.format(host_ref._moId),
+                     vm=vim.VirtualMachine.Array([]), parent=cluster_ref)
+        for i, vm_ref in enumerate(vm_refs):
+            host_ref = host_refs[i % len(host_refs)]
+            self.props[host_ref._moId][1]['vm'].append(vm_ref)
+            self.add(vm_ref._moId, 'VirtualMachine', **{'name': 'vm-{:06}'.format(i),
+                                                        'config.instanceUuid': self.uuid(),
+                                                        'runtime.host': host_ref})
+        self.add(cluster_ref._moId, 'ClusterComputeResource',
+                 name='cluster-{}'.format(cluster_index),
+                 host=vim.HostSystem.Array(host_refs),
+                 parent=folder_ref,
+                 configurationEx=vim.cluster.ConfigInfoEx(
+                     dasConfig=vim.cluster.DasConfigInfo(), drsConfig=vim.cluster.DrsConfigInfo(),
+                     vmSwapPlacement='vmDirectory',
+                     vsanConfigInfo=vim.vsan.cluster.ConfigInfo(
+                         enabled=True,
+                         defaultConfig=vim.vsan.cluster.ConfigInfo.HostDefaultInfo(uuid=self.uuid()))))
+        self.cluster_data[cluster_ref._moId] = self.generate_cluster(host_refs, vm_refs, objects)
+        return cluster_ref
+
+    def uuid(self) -> str:
+        value = '{:032x}'.format(self.random.getrandbits(128))
+        return '-'.join([value[:8], value[8:12], value[12:16], value[16:20], value[20:]])
+
+    def add(self, mo_id: str, type_name: str, **props) -> None:
+        self.props[mo_id] = (type_name, props)
+
+    def generate_cluster(self, host_refs: List[vim.HostSystem], vm_refs: List[vim.VirtualMachine],
+                         nb_objects: int) -> dict:
+        """ vSAN objects, capacity, health summary and HCL of a cluster """
+
+        hostnames = [self.props[x._moId][1]['name'] for x in host_refs]
+        objects = []
+        for i in range(nb_objects):
+            health = 'healthy' if self.random.random() >= UNHEALTHY_RATIO else 'reducedavailabilitywithnorebuild'
+            objects.append({'uuid': self.uuid(),
+                            'type': OBJECT_TYPES[i % len(OBJECT_TYPES)],
+                            'vm': vm_refs[i // len(OBJECT_TYPES) % len(vm_refs)] if vm_refs else None,
+                            'health': health,
+                            'compliance': 'compliant' if health == 'healthy' else 'nonCompliant'})
+
+        # The syncing objects, in the order they are synced, with their host and disk and bytes to sync at start
+        resyncs = []
+        for obj in objects:
+            if self.resync_random.random() < RESYNC_RATIO:
+                resyncs.append({'uuid': obj['uuid'],
+                                'component': self.uuid(),
+                                'host': self.uuid(),
+                                'disk': self.uuid(),
+                                'bytes': self.resync_random.randint(RESYNC_MIN_BYTES, RESYNC_MAX_BYTES),
+                                'reason': self.resync_random.choice(RESYNC_REASONS)})
+
+        health_counts = {}
+        for obj in objects:
+            health_counts[obj['health']] = health_counts.get(obj['health'], 0) + 1
+
+        total = len(host_refs) * 4 * 2 ** 40
+        free = int(total * (0.3 + 0.4 * self.random.random()))
+        space_usage = vim.cluster.VsanSpaceUsage(
+            totalCapacityB=total, freeCapacityB=free, uncommittedB=int((total - free) * 0.2),
+            spaceDetail=vim.cluster.VsanSpaceUsageDetailResult(spaceUsageByObjectType=[
+                vim.cluster.VsanObjectSpaceSummary(objType=x, usedB=(total - free) // len(OBJECT_TYPES),
+                                                   reservedCapacityB=0, overheadB=(total - free) // 10,
+                                                   overReservedB=0)
+                for x in OBJECT_TYPES]))
+
+        controllers = [vim.host.VsanHclControllerInfo(deviceName='vmhba0', deviceDisplayName='Fake RAID controller',
+                                                      driverName='lsi_mr3', driverVersion='7.708.07.00',
+                                                      vendorId=0, deviceId=0, subVendorId=0, subDeviceId=0,
+                                                      usedByVsan=True, deviceOnHcl=True,
+                                                      driverVersionSupported=True,
+                                                      driverVersionsOnHcl=['7.708.07.00'],
+                                                      fwVersion='50.6.3-0109', fwVersionSupported=True,
+                                                      fwVersionOnHcl=['50.6.3-0109'],
+                                                      toolName='storcli', toolVersion='007.0709')]
+        health_summary = vim.cluster.VsanClusterHealthSummary(
+            timestamp=self.now,
+            clusterStatus=vim.cluster.VsanClusterHealthSystemStatusResult(
+                status='green', goalState='installed', untrackedHosts=[],
+                trackedHostsStatus=[vim.host.VsanHostHealthSystemStatusResult(hostname=x, status='green', issues=[])
+                                    for x in hostnames]),
+            clomdLiveness=vim.cluster.VsanClusterClomdLivenessResult(
+                issueFound=False,
+                clomdLivenessResult=[vim.cluster.VsanHostClomdLivenessResult(hostname=x, clomdStat='alive')
+                                     for x in hostnames]),
+            diskBalance=vim.cluster.VsanClusterBalanceSummary(
+                varianceThreshold=30,
+                disks=[vim.cluster.VsanClusterBalancePerDiskInfo(uuid=self.uuid(),
+                                                                 fullness=self.random.randint(20, 80),
+                                                                 variance=self.random.randint(0, 10),
+                                                                 fullnessAboveThreshold=0)
+                       for _ in range(len(hostnames) * 2)]),
+            perfsvcHealth=vim.vsan.VsanPerfsvcHealthResult(enoughFreeSpace=True, statsObjectConsistent=True,
+                                                              verboseModeStatus=False),
+            hclInfo=vim.cluster.VsanClusterHclInfo(
+                hclDbLastUpdate=self.now, hclDbAgeHealth='green',
+                hostResults=[vim.host.VsanHostHclInfo(hostname=x, releaseName='ESXi 6.7 U3',
+                                                      controllers=controllers)
+                             for x in hostnames]))
+
+        return {'hosts': host_refs,
+                'vms': vm_refs,
+                'objects': objects,
+                'health_counts': health_counts,
+                'space_usage': space_usage,
+                'health_summary': health_summary,
+                'resyncs': resyncs}
+
+    # Property collector
+
+    def is_a(self, type_name: str, base_name: str) -> bool:
+        return issubclass(VmomiSupport.GetWsdlType('urn:vim25', type_name),
+                          VmomiSupport.GetWsdlType('urn:vim25', base_name))
+
+    def get_ref(self, mo_id: str):
+        return VmomiSupport.GetWsdlType('urn:vim25', self.props[mo_id][0])(mo_id)
+
+    def collect(self, spec: ElementTree.Element) -> list:
+        """ ObjectContents of a FilterSpec, following its traversal specs """
+
+        traversals = {}
+
+        def register(selection: ElementTree.Element) -> None:
+            if _xsi_type(selection) == 'TraversalSpec':
+                traversals[_text(selection, 'name')] = selection
+            for child in _children(selection, 'selectSet'):
+                register(child)
+
+        for obj_spec in _children(spec, 'objectSet'):
+            for selection in _children(obj_spec, 'selectSet'):
+                register(selection)
+
+        found = []
+        visited = set()
+
+        def visit(mo_id: str, skip: bool, selections: List[ElementTree.Element]) -> None:
+            if mo_id not in self.props or (mo_id, skip) in visited:
+                return
+            visited.add((mo_id, skip))
+            if not skip and mo_id not in found:
+                found.append(mo_id)
+            for selection in selections:
+                traversal = traversals.get(_text(selection, 'name')) if _xsi_type(selection) != 'TraversalSpec' \
+                    else selection
+                if traversal is None or not self.is_a(self.props[mo_id][0], _text(traversal, 'type')):
+                    continue
+                value = self.props[mo_id][1].get(_text(traversal, 'path'))
+                for child in (value if isinstance(value, list) else [value] if value is not None else []):
+                    visit(child._moId, _text(traversal, 'skip') == 'true', _children(traversal, 'selectSet'))
+
+        for obj_spec in _children(spec, 'objectSet'):
+            obj = _children(obj_spec, 'obj')[0]
+            visit(obj.text, _text(obj_spec, 'skip') == 'true', _children(obj_spec, 'selectSet'))
+
+        prop_specs = [(_text(x, 'type'), _text(x, 'all') == 'true', [y.text for y in _children(x, 'pathSet')])
+                      for x in _children(spec, 'propSet')]
+        contents = []
+        for mo_id in found:
+            type_name, props = self.props[mo_id]
+            paths = []
+            for spec_type, spec_all, path_set in prop_specs:
+                if self.is_a(type_name, spec_type):
+                    paths.extend(x for x in (list(props) if spec_all else path_set) if x not in paths)
+            if not prop_specs or paths:
+                contents.append(vmodl.query.PropertyCollector.ObjectContent(
+                    obj=self.get_ref(mo_id),
+                    propSet=[vmodl.DynamicProperty(name=x, val=props[x]) for x in paths if x in props]))
+        return contents
+
+    def page(self, contents: list, max_objects: Optional[int]):
+        if max_objects and len(contents) > max_objects:
+            token = str(next(self.ids))
+            with self.lock:
+                self.pages[token] = contents[max_objects:]
+            return vmodl.query.PropertyCollector.RetrieveResult(token=token, objects=contents[:max_objects])
+        return vmodl.query.PropertyCollector.RetrieveResult(objects=contents)
+
+    def RetrievePropertiesEx(self, request: ElementTree.Element):
+        contents = [x for spec in _children(request, 'specSet') for x in self.collect(spec)]
+        options = _children(request, 'options')
+        max_objects = _text(options[0], 'maxObjects') if options else None
+        return self.page(contents, int(max_objects) if max_objects else None)
+
+    def ContinueRetrievePropertiesEx(self, request: ElementTree.Element):
+        with self.lock:
+            contents = self.pages.pop(_text(request, 'token'))
+        return self.page(contents, len(contents))
+
+    def RetrieveProperties(self, request: ElementTree.Element):
+        return [x for spec in _children(request, 'specSet') for x in self.collect(spec)]
+
+    def CreatePropertyCollector(self, request: ElementTree.Element):
+        collector = 'session[fake]collector-{}'.format(next(self.ids))
+        with self.lock:
+            self.collectors[collector] = []
+            self.versions[collector] = 0
+        return vmodl.query.PropertyCollector(collector)
+
+    def DestroyPropertyCollector(self, request: ElementTree.Element):
+        with self.changed:
+            for filter_id in self.collectors.pop(_text(request, '_this'), []):
+                self.filters.pop(filter_id, None)
+                self.sent.pop(filter_id, None)
+            self.changed.notify_all()
+        return None
+
+    def CreateFilter(self, request: ElementTree.Element):
+        filter_id = 'session[fake]filter-{}'.format(next(self.ids))
+        with self.lock:
+            self.collectors.setdefault(_text(request, '_this'), []).append(filter_id)
+            self.filters[filter_id] = _children(request, 'spec')[0]
+        return vmodl.query.PropertyCollector.Filter(filter_id)
+
+    def DestroyPropertyFilter(self, request: ElementTree.Element):
+        filter_id = _text(request, '_this')
+        with self.changed:
+            for filter_ids in self.collectors.values():
+                if filter_id in filter_ids:
+                    filter_ids.remove(filter_id)
+            self.filters.pop(filter_id, None)
+            self.sent.pop(filter_id, None)
+            self.changed.notify_all()
+        return None
+
+    def object_updates(self, filter_id: str) -> list:
+        """ (moref, properties, ObjectUpdate) of the changes of the filter since its last update set """
+
+        Change = vmodl.query.PropertyCollector.Change
+        sent = self.sent.setdefault(filter_id, {})
+        current = {x.obj._moId: (x.obj, {y.name: y.val for y in x.propSet})
+                   for x in self.collect(self.filters[filter_id])}
+
+        updates = []
+        for mo_id, (obj, props) in current.items():
+            previous = sent.get(mo_id)
+            if previous is None:
+                updates.append((mo_id, (obj, props), vmodl.query.PropertyCollector.ObjectUpdate(
+                    kind='enter', obj=obj, changeSet=[Change(name=x, op='assign', val=y) for x, y in props.items()])))
+                continue
+            # The properties are replaced, never modified in place, when they change.
+            changes = [Change(name=x, op='assign', val=y) for x, y in props.items()
+                       if x not in previous[1] or previous[1][x] is not y]
+            changes.extend(Change(name=x, op='remove') for x in previous[1] if x not in props)
+            if changes:
+                updates.append((mo_id, (obj, props), vmodl.query.PropertyCollector.ObjectUpdate(
+                    kind='modify', obj=obj, changeSet=changes)))
+        for mo_id, (obj, _) in sent.items():
+            if mo_id not in current:
+                updates.append((mo_id, None, vmodl.query.PropertyCollector.ObjectUpdate(kind='leave', obj=obj)))
+        return updates
+
+    def WaitForUpdatesEx(self, request: ElementTree.Element):
+        """ Changes of the objects of the collector filters since the version, the versions are counters """
+
+        collector = _text(request, '_this')
+        version = _text(request, 'version') or ''
+        options = _children(request, 'options')
+        max_wait = _text(options[0], 'maxWaitSeconds') if options else None
+        max_updates = _text(options[0], 'maxObjectUpdates') if options else None
+        deadline = time.time() + float(max_wait) if max_wait is not None else None
+
+        with self.changed:
+            while True:
+                if collector not in self.collectors:
+                    raise vmodl.fault.ManagedObjectNotFound(obj=vmodl.query.PropertyCollector(collector))
+                if version and version != str(self.versions[collector]):
+                    raise vmodl.query.InvalidCollectorVersion()
+                if not version:
+                    for filter_id in self.collectors[collector]:
+                        self.sent[filter_id] = {}
+
+                updates = [(x, y) for x in self.collectors[collector] for y in self.object_updates(x)]
+                if updates:
+                    selected = updates[:int(max_updates)] if max_updates else updates
+                    filter_updates = {}
+                    for filter_id, (mo_id, sent, update) in selected:
+                        if sent is None:
+                            self.sent[filter_id].pop(mo_id, None)
+                        else:
+                            self.sent[filter_id][mo_id] = sent
+                        filter_updates.setdefault(filter_id, []).append(update)
+                    self.versions[collector] += 1
+                    return vmodl.query.PropertyCollector.UpdateSet(
+                        version=str(self.versions[collector]),
+                        truncated=len(selected) < len(updates),
+                        filterSet=[vmodl.query.PropertyCollector.FilterUpdate(
+                            filter=vmodl.query.PropertyCollector.Filter(x), objectSet=y)
+                            for x, y in filter_updates.items()])
+
+                remaining = deadline - time.time() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.changed.wait(remaining)
+
+    # Service instance, sessions and views
+
+    def RetrieveServiceContent(self, request: ElementTree.Element):
+        return self.content
+
+    def Login(self, request: ElementTree.Element):
+        return self.session
+
+    def Logout(self, request: ElementTree.Element):
+        return None
+
+    def CreateContainerView(self, request: ElementTree.Element):
+        types = [x.text for x in _children(request, 'type')]
+        view = 'session[fake]view-{}'.format(next(self.ids))
+        members = [self.get_ref(mo_id) for mo_id, (type_name, _) in self.props.items()
+                   if any(self.is_a(type_name, x) for x in types)]
+        self.add(view, 'ContainerView', view=vim.ManagedObject.Array(members))
+        return vim.view.ContainerView(view)
+
+    def CreateListView(self, request: ElementTree.Element):
+        view = 'session[fake]view-{}'.format(next(self.ids))
+        self.add(view, 'ListView', view=vim.ManagedObject.Array([self.get_ref(x.text) for x in _children(request, 'obj')
+                                                                 if x.text in self.props]))
+        return vim.view.ListView(view)
+
+    def ModifyListView(self, request: ElementTree.Element):
+        with self.changed:
+            props = self.props[_text(request, '_this')][1]
+            removed = set(x.text for x in _children(request, 'remove'))
+            members = [x for x in props['view'] if x._moId not in removed]
+            member_ids = set(x._moId for x in members)
+            members.extend(self.get_ref(x.text) for x in _children(request, 'add')
+                           if x.text in self.props and x.text not in member_ids)
+            props['view'] = vim.ManagedObject.Array(members)
+            self.changed.notify_all()
+        return []
+
+    def DestroyView(self, request: ElementTree.Element):
+        with self.changed:
+            self.props.pop(_text(request, '_this'), None)
+            self.changed.notify_all()
+        return None
+
+    # Tasks
+
+    def start_task(self, result) -> vim.Task:
+        """ Task reaching 50% after half of 'task_duration' seconds, and succeeding with 'result' at the end """
+
+        mo_id = 'task-{}'.format(next(self.ids))
+        with self.lock:
+            self.add(mo_id, 'Task', **{'info.state': vim.TaskInfo.State.running, 'info.progress': 0})
+
+        def step(progress: int, state: vim.TaskInfo.State = None) -> None:
+            with self.changed:
+                props = self.props[mo_id][1]
+                props['info.progress'] = progress
+                if state is not None:
+                    props['info.state'] = state
+                    props['info.result'] = result
+                self.changed.notify_all()
+
+        for delay, args in [(self.task_duration / 2, (50,)), (self.task_duration, (100, vim.TaskInfo.State.success))]:
+            timer = threading.Timer(delay, step, args)
+            timer.daemon = True
+            timer.start()
+        return vim.Task(mo_id)
+
+    def FindChild(self, request: ElementTree.Element):
+        entity = self.props.get(_text(request, 'entity'))
+        name = _text(request, 'name')
+        for child in (entity[1].get('childEntity') or []) if entity else []:
+            if self.props[child._moId][1].get('name') == name:
+                return child
+        return None
+
+    # vSAN
+
+    def VsanQuerySpaceUsage(self, request: ElementTree.Element):
+        return self.cluster_data[_text(request, 'cluster')]['space_usage']
+
+    def health_summary(self, data: dict, fields: List[str], include_uuids: bool):
+        """ Health summary of a cluster, with the object health when it is one of the fields """
+        if 'objectHealth' not in fields:
+            return data['health_summary']
+
+        # The object health is only built when requested, it lists the UUIDs of every object.
+        uuids = {}
+        for obj in data['objects']:
+            uuids.setdefault(obj['health'], []).append(obj['uuid'])
+        summary = vim.cluster.VsanClusterHealthSummary(
+            objectHealth=vim.host.VsanObjectOverallHealth(objectHealthDetail=[
+                vim.host.VsanObjectHealth(health=health, numObjects=len(x), objUuids=x if include_uuids else None)
+                for health, x in sorted(uuids.items())]))
+        for prop in data['health_summary']._GetPropertyList():
+            if prop.name != 'objectHealth':
+                setattr(summary, prop.name, getattr(data['health_summary'], prop.name))
+        return summary
+
+    def VsanQueryVcClusterHealthSummary(self, request: ElementTree.Element):
+        return self.health_summary(self.cluster_data[_text(request, 'cluster')],
+                                   [x.text for x in _children(request, 'fields')],
+                                   _text(request, 'includeObjUuids') == 'true')
+
+    def VsanQueryVcClusterHealthSummaryTask(self, request: ElementTree.Element):
+        return self.start_task(self.cluster_data[_text(request, 'cluster')]['health_summary'])
+
+    def VsanQueryObjectIdentities(self, request: ElementTree.Element):
+        data = self.cluster_data[_text(request, 'cluster')]
+        uuids = set(x.text for x in _children(request, 'objUuids'))
+        objects = [x for x in data['objects'] if not uuids or x['uuid'] in uuids]
+        result = vim.cluster.VsanObjectIdentityAndHealth()
+        if _text(request, 'includeObjIdentity') == 'true':
+            result.identities = [vim.cluster.VsanObjectIdentity(uuid=x['uuid'], type=x['type'], vm=x['vm'])
+                                 for x in objects]
+        if _text(request, 'includeHealth') == 'true':
+            result.health = vim.host.VsanObjectOverallHealth(objectHealthDetail=[
+                vim.host.VsanObjectHealth(health=health, numObjects=count)
+                for health, count in sorted(data['health_counts'].items())])
+        return result
+
+    def VosQueryVsanObjectInformation(self, request: ElementTree.Element):
+        data = self.cluster_data[_text(request, 'cluster')]
+        by_uuid = data.setdefault('objects_by_uuid', {x['uuid']: x for x in data['objects']})
+        result = []
+        for spec in _children(request, 'vsanObjectQuerySpecs'):
+            obj = by_uuid.get(_text(spec, 'uuid'))
+            if obj:
+                result.append(vim.cluster.VsanObjectInformation(
+                    vsanObjectUuid=obj['uuid'], vsanHealth=obj['health'],
+                    spbmComplianceResult=vim.cluster.StorageComplianceResult(complianceStatus=obj['compliance'],
+                                                                             checkTime=self.now)))
+        return result
+
+    def QuerySyncingVsanObjectsSummary(self, request: ElementTree.Element):
+        data = self.cluster_data[_text(request, 'cluster')]
+
+        # The objects are synced one after the other at the resync rate since the start of the fake.
+        synced = (time.monotonic() - self.started) * self.resync_rate
+        syncing = []
+        for resync in data['resyncs']:
+            remaining = resync['bytes'] - max(synced, 0)
+            synced -= resync['bytes']
+            if remaining > 0:
+                syncing.append((resync, int(remaining)))
+
+        total_bytes = sum(x for _, x in syncing)
+        eta = int(total_bytes / self.resync_rate) if self.resync_rate else None
+        syncing_filter = _children(request, 'syncingObjectFilter')
+        offset = int(_text(syncing_filter[0], 'offset', '0')) if syncing_filter else 0
+        limit = _text(syncing_filter[0], 'numberOfObjects') if syncing_filter else None
+        page = syncing[offset:offset + int(limit) if limit is not None else None]
+
+        # The ETA of an object is the time to sync it and the objects before it.
+        to_sync = sum(x for _, x in syncing[:offset])
+        objects = []
+        for resync, remaining in page:
+            to_sync += remaining
+            objects.append(vim.vsan.host.VsanObjectSyncState(uuid=resync['uuid'], components=[
+                vim.vsan.host.VsanComponentSyncState(
+                    uuid=resync['component'], diskUuid=resync['disk'], hostUuid=resync['host'], bytesToSync=remaining,
+                    recoveryETA=int(to_sync / self.resync_rate) if self.resync_rate else None,
+                    reasons=[resync['reason']])]))
+
+        active = min(len(syncing), 1) if self.resync_rate else 0
+        active_bytes = sum(x for _, x in syncing[:active])
+        return vim.vsan.host.VsanSyncingObjectQueryResult(
+            totalObjectsToSync=len(syncing), totalBytesToSync=total_bytes, totalRecoveryETA=eta,
+            objects=objects,
+            syncingObjectRecoveryDetails=vim.vsan.host.VsanSyncingObjectRecoveryDetails(
+                activeObjectsToSync=active, queuedObjectsToSync=len(syncing) - active, suspendedObjectsToSync=0,
+                bytesToSyncForActiveObjects=active_bytes, bytesToSyncForQueuedObjects=total_bytes - active_bytes,
+                bytesToSyncForSuspendedObjects=0))
+
+    def perf_entities(self, cluster_id: str, entity_type: str) -> List[str]:
+        """ Entity UUIDs of a perf entity type of the cluster, the ones without a vSAN UUID get a stable one """
+        data = self.cluster_data[cluster_id]
+        if entity_type.startswith('cluster-'):
+            return [self.props[cluster_id][1]['configurationEx'].vsanConfigInfo.defaultConfig.uuid]
+        if entity_type == 'virtual-machine':
+            return [self.props[x._moId][1]['config.instanceUuid'] for x in data['vms']]
+        if entity_type.startswith('host-') or entity_type == 'disk-group':
+            return [str(uuid5(NAMESPACE_URL, '{}/{}'.format(x._moId, entity_type))) for x in data['hosts']]
+        return []
+
+    def VsanPerfQueryPerf(self, request: ElementTree.Element):
+        cluster_id = _text(request, 'cluster')
+        now = time.time()
+        result = []
+        for spec in _children(request, 'querySpecs'):
+            entity_type, _, entity_uuid = _text(spec, 'entityRefId').partition(':')
+            interval = int(_text(spec, 'interval', PERF_INTERVAL))
+            end = min(ParseISO8601(_text(spec, 'endTime')).timestamp() if _text(spec, 'endTime') else now, now)
+            start = ParseISO8601(_text(spec, 'startTime')).timestamp() if _text(spec, 'startTime') else end - 3600
+            timestamps = range(int(math.ceil(start / interval)) * interval, int(end) + 1, interval)
+            sample_info = ','.join(datetime.fromtimestamp(x, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+                                   for x in timestamps)
+            for uuid in self.perf_entities(cluster_id, entity_type):
+                if entity_uuid not in ('*', uuid):
+                    continue
+                entity_ref_id = '{}:{}'.format(entity_type, uuid)
+                series = []
+                for label in PERF_LABELS:
+                    # The value of a sample is a function of its entity, label and time, every query returns it.
+                    base = zlib.crc32('{}/{}'.format(entity_ref_id, label).encode()) % 1000 + 10
+                    values = ['{:.2f}'.format(base * (1.5 + math.sin(x / 3600.) + zlib.crc32(
+                        '{}/{}/{}'.format(entity_ref_id, label, x).encode()) % 100 / 200.)) for x in timestamps]
+                    series.append(vim.cluster.VsanPerfMetricSeriesCSV(metricId=vim.cluster.VsanPerfMetricId(
+                        label=label, metricsCollectInterval=interval), values=','.join(values)))
+                result.append(vim.cluster.VsanPerfEntityMetricCSV(entityRefId=entity_ref_id, sampleInfo=sample_info,
+                                                                  value=series))
+        return result
+
+    def history_tests(self, data: dict, count: Optional[str]) -> List[Tuple[int, datetime, List[str]]]:
+        """ Days ago, time and host names of the last 'count' proactive tests of a cluster, the newest first """
+        hostnames = [self.props[x._moId][1]['name'] for x in data['hosts']]
+        return [(i, self.now - timedelta(days=i), hostnames) for i in range(min(int(count or HISTORY_TESTS),
+                                                                                 HISTORY_TESTS))]
+
+    @staticmethod
+    def proactive_test_result(timestamp: datetime) -> vim.cluster.VsanClusterProactiveTestResult:
+        return vim.cluster.VsanClusterProactiveTestResult(overallStatus='green', overallStatusDescription='',
+                                                          timestamp=timestamp)
+
+    def network_perf_history(self, data: dict,
+                             count: Optional[str]) -> vim.cluster.VsanClusterNetworkLoadTestResult.Array:
+        results = []
+        for days, timestamp, hostnames in self.history_tests(data, count):
+            host_results = []
+            for i, hostname in enumerate(hostnames):
+                key = '{}/{}'.format(hostname, days)
+                bandwidth = _history_value(key + '/bandwidth', 8 * 10 ** 9, 10 * 10 ** 9)
+                host_results.append(vim.host.VsanNetworkLoadTestResult(
+                    hostname=hostname, client=i > 0, bandwidthBps=bandwidth, totalBytes=bandwidth // 8 * 30,
+                    lossPct=_history_value(key + '/loss', 0, 3),
+                    jitterMs=_history_value(key + '/jitter', 1, 500) / 100.))
+            results.append(vim.cluster.VsanClusterNetworkLoadTestResult(
+                clusterResult=self.proactive_test_result(timestamp), hostResults=host_results))
+        return vim.cluster.VsanClusterNetworkLoadTestResult.Array(results)
+
+    def vmdk_load_history(self, data: dict, count: Optional[str]) -> vim.cluster.VsanClusterVmdkLoadTestResult.Array:
+        results = []
+        for days, timestamp, hostnames in self.history_tests(data, count):
+            host_results = []
+            for hostname in hostnames:
+                vmdk_results = []
+                for vmdk in range(HISTORY_VMDKS):
+                    key = '{}/{}/{}'.format(hostname, days, vmdk)
+                    iops = _history_value(key + '/iops', 5000, 20000)
+                    latency = _history_value(key + '/latency', 200, 2000)
+                    vmdk_results.append(vim.host.VsanVmdkLoadTestResult(
+                        success=True, spec=vim.host.VsanVmdkLoadTestSpec(), iops=iops, tputBps=iops * 4096,
+                        avgLatencyUs=latency, maxLatencyUs=latency * _history_value(key + '/max', 2, 10)))
+                host_results.append(vim.host.VsanHostVmdkLoadTestResult(hostname=hostname, issueFound=False,
+                                                                        vmdkResults=vmdk_results))
+            results.append(vim.cluster.VsanClusterVmdkLoadTestResult(
+                clusterResult=self.proactive_test_result(timestamp), hostResults=host_results))
+        return vim.cluster.VsanClusterVmdkLoadTestResult.Array(results)
+
+    def VsanQueryVcClusterNetworkPerfHistoryTest(self, request: ElementTree.Element):
+        return self.network_perf_history(self.cluster_data[_text(request, 'cluster')], _text(request, 'count'))
+
+    def VsanQueryVcClusterVmdkLoadHistoryTest(self, request: ElementTree.Element):
+        return self.vmdk_load_history(self.cluster_data[_text(request, 'cluster')], _text(request, 'count'))
+
+    def VsanRetrieveProperties(self, request: ElementTree.Element):
+        getters = {'spaceUsage': lambda x, _: x['space_usage'],
+                   'clusterHealthSummary': lambda x, params: self.health_summary(
+                       x, params.get('fields', []), params.get('includeObjUuids') == ['true']),
+                   'clusterNetworkPerfHistoryTest': lambda x, params: self.network_perf_history(
+                       x, params.get('count', [None])[0]),
+                   'clusterVmdkLoadHistoryTest': lambda x, params: self.vmdk_load_history(
+                       x, params.get('count', [None])[0])}
+        contents = []
+        for spec in _children(request, 'massCollectorSpecs'):
+            # Arguments of each property, a list of the texts of each argument
+            params = {}
+            for prop_params in _children(spec, 'propertiesParams'):
+                values = params.setdefault(_text(prop_params, 'propertyName'), {})
+                for param in _children(prop_params, 'propertyParams'):
+                    value = _children(param, 'value')[0]
+                    values[_text(param, 'key')] = [x.text for x in _children(value, 'val')] or [value.text]
+            for obj in _children(spec, 'objects'):
+                data = self.cluster_data.get(obj.text)
+                props = [x.text for x in _children(spec, 'properties')]
+                contents.append(vmodl.query.PropertyCollector.ObjectContent(
+                    obj=self.get_ref(obj.text),
+                    propSet=[vmodl.DynamicProperty(name=x, val=getters[x](data, params.get(x, {})))
+                             for x in props if data and x in getters]))
+        return contents
+
+    # SOAP
+
+    def handle(self, method: str, path: str, body: bytes) -> Tuple[int, str, bytes]:
+        """ Answer a request, returns (status, content type, body) """
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if method == 'GET':
+            if path in SERVICE_VERSIONS:
+                return 200, 'text/xml', SERVICE_VERSIONS[path].encode('utf-8')
+            return 404, 'text/plain', b'not found'
+
+        request = [x for x in ElementTree.fromstring(body).iter() if _local_name(x.tag) == 'Body'][0][0]
+        operation = _local_name(request.tag)
+        version = VSAN_VERSION if path == '/vsanHealth' else VIM_VERSION
+        ns_map = dict(SoapAdapter.SOAP_NSMAP, **{VmomiSupport.GetWsdlNamespace(version): ''})
+
+        try:
+            handler = getattr(self, operation, None)
+            if handler is None:
+                raise vmodl.fault.MethodNotFound(receiver=self.receiver(request), method=operation)
+            result = handler(request)
+            info = self.method_info(operation, request)
+            return_value = SoapAdapter.SerializeToUnicode(result, Object(name='returnval', type=info.result,
+                                                                         version=version,
+                                                                         flags=VmomiSupport.F_OPTIONAL),
+                                                          version, ns_map)
+            response = '<{0}Response xmlns="{1}">{2}</{0}Response>'.format(
+                operation, VmomiSupport.GetWsdlNamespace(version), return_value)
+            status = 200
+        except Exception as e:
+            fault = e if isinstance(e, vmodl.MethodFault) else vmodl.fault.SystemError(reason=repr(e))
+            detail = _serialize_fault(fault, version, ns_map)
+            response = ('<soapenv:Fault><faultcode>ServerFaultCode</faultcode><faultstring>{}</faultstring>'
+                        '<detail>{}</detail></soapenv:Fault>').format(type(fault).__name__, detail)
+            status = 500
+
+        return status, 'text/xml; charset=utf-8', ''.join([
+            SoapAdapter.XML_HEADER, '\n', SoapAdapter.SOAP_ENVELOPE_START, SoapAdapter.SOAP_BODY_START,
+            response, SoapAdapter.SOAP_BODY_END, SoapAdapter.SOAP_ENVELOPE_END]).encode('utf-8')
+
+    @staticmethod
+    def receiver(request: ElementTree.Element) -> VmomiSupport.ManagedObject:
+        """ Managed object of a call, the receiver of its faults """
+        this = _children(request, '_this')[0]
+        for ns in ['urn:vim25', 'urn:vsan']:
+            try:
+                return VmomiSupport.GetWsdlType(ns, _xsi_type(this))(this.text)
+            except KeyError:
+                pass
+        return VmomiSupport.ManagedObject(this.text)
+
+    @classmethod
+    def method_info(cls, operation: str, request: ElementTree.Element):
+        # The lookup loads the method type lazily, concurrent loads of the same type fail in pyVmomi.
+        with _method_lock:
+            for ns in ['urn:vim25', 'urn:vsan']:
+                try:
+                    method = VmomiSupport.GetWsdlMethod(ns, operation)
+                    return getattr(method, 'info', method)
+                except (KeyError, RuntimeError):
+                    # pyVmomi raises RuntimeError for some vSAN methods looked up in the other namespace.
+                    pass
+        raise vmodl.fault.MethodNotFound(receiver=cls.receiver(request), method=operation)
+
+
+class FakeVcenterHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    # The headers and the body are written separately, Nagle would delay the body of kept-alive connections
+    disable_nagle_algorithm = True
+
+    def __respond(self, method: str) -> None:
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        status, content_type, response = self.server.fake.handle(method, self.path, body)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        # Compressed like the responses of a vCenter, for the clients which accept it
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            response = gzip.compress(response, compresslevel=1)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def do_GET(self):
+        self.__respond('GET')
+
+    def do_POST(self):
+        self.__respond('POST')
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeVcenterServer(ThreadingHTTPServer):
+    """ Plain HTTP server of a FakeVcenter, on an ephemeral port when 'port' is 0 """
+
+    daemon_threads = True
+
+    def __init__(self, fake: FakeVcenter, address: str = '127.0.0.1', port: int = 0):
+        super().__init__((address, port), FakeVcenterHandler)
+        self.fake = fake
+
+    @property
+    def address(self) -> str:
+        return '{}:{}'.format(*self.server_address[:2])
+
+    def start(self) -> threading.Thread:
+        """ Serve in a daemon thread """
+        thread = threading.Thread(target=self.serve_forever, name='fake-vcenter', daemon=True)
+        thread.start()
+        return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Synthetic vCenter for offline runs of the vSAN checks')
+    parser.add_argument('--address', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8989, help='Port to listen on')
+    parser.add_argument('--datacenters', type=int, default=1, metavar='N', help='Number of datacenters')
+    parser.add_argument('--clusters', type=int, default=1, metavar='N', help='Number of vSAN clusters per datacenter')
+    parser.add_argument('--hosts', type=int, default=4, metavar='N', help='Number of hosts per cluster')
+    parser.add_argument('--vms', type=int, default=100, metavar='N', help='Number of VMs per cluster')
+    parser.add_argument('--objects', type=int, default=400, metavar='N', help='Number of vSAN objects per cluster')
+    parser.add_argument('--latency', type=float, default=0., metavar='SECONDS', help='Delay of every response')
+    parser.add_argument('--task-duration', type=float, default=1., metavar='SECONDS', help='Duration of the tasks')
+    parser.add_argument('--resync-rate', type=float, default=100, metavar='MB',
+                        help='Megabytes per second synced of the resyncing objects, 0 for a stuck resync')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the generated inventory')
+    args = parser.parse_args()
+
+    fake = FakeVcenter(clusters=args.clusters, hosts=args.hosts, vms=args.vms, objects=args.objects,
+                       latency=args.latency, task_duration=args.task_duration,
+                       resync_rate=args.resync_rate * 2 ** 20, seed=args.seed, datacenters=args.datacenters)
+    server = FakeVcenterServer(fake, args.address, args.port)
+    print('Fake vCenter serving on {}'.format(server.address), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+import io
+import json
+import multiprocessing
+import os
+import ssl
+import time
+
+from contextlib import redirect_stdout
+from multiprocessing.connection import wait
+from typing import List, NamedTuple, Optional
+
+# Worker processes started with 'spawn' need the vSAN types registered
+import libs.vsanmgmtObjects
+from libs.inventory import get_vsan_clusters, select_clusters
+from libs.session import VsanSession
+from libs.util import print_green, print_red
+from libs.vsanclustercheck import check_clusters
+
+# Seconds a vCenter worker may run before it is terminated
+VCENTER_TIMEOUT = 3600
+
+
+class VcenterResult(NamedTuple):
+    host: str
+    output: str
+    failed: List[str]
+    error: Optional[str]
+    duration: float
+
+
+def load_inventory(path: str) -> List[dict]:
+    """Load the vCenters of a JSON or YAML inventory file
+
+    The file holds a 'vcenters' list whose entries have a 'host' and 'user', and
+    optionally 'port', 'password' or 'password_env' (environment variable holding
+    the password) and 'clusters' (glob patterns, every vSAN cluster by default).
+    YAML files need PyYAML.
+    """
+
+    with open(path) as f:
+        if path.endswith(('.yml', '.yaml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError('PyYAML is required to read the inventory file {}'.format(path))
+            inventory = yaml.safe_load(f)
+        else:
+            inventory = json.load(f)
+
+    vcenters = inventory.get('vcenters') or []
+    for vcenter in vcenters:
+        if 'host' not in vcenter or 'user' not in vcenter:
+            raise ValueError('Inventory entry {} has no host or user'.format(vcenter))
+    return vcenters
+
+
+def check_vcenter(vcenter: dict, **kwargs) -> VcenterResult:
+    """ Run the checks on the clusters of one vCenter and capture the output """
+
+    start = time.time()
+    host = vcenter['host']
+    password = vcenter.get('password') or os.environ.get(vcenter.get('password_env', ''), '')
+
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+
+    output = io.StringIO()
+    failed = []
+    error = None
+    try:
+        with redirect_stdout(output):
+            session = VsanSession(host=host,
+                                  user=vcenter['user'],
+                                  password=password,
+                                  port=int(vcenter.get('port', 443)),
+                                  context=context)
+            try:
+                clusters = select_clusters(get_vsan_clusters(session.si), vcenter.get('clusters') or ['*'])
+                failed = check_clusters(session, clusters, **kwargs)
+            finally:
+                session.close()
+    except Exception as e:
+        error = str(e) or type(e).__name__
+    return VcenterResult(host=host, output=output.getvalue(), failed=failed, error=error,
+                         duration=time.time() - start)
+
+
+def _worker(conn, vcenter: dict, kwargs: dict) -> None:
+    conn.send(check_vcenter(vcenter, **kwargs))
+    conn.close()
+
+
+def run_fleet(vcenters: List[dict],
+              processes: int = None,
+              timeout: float = VCENTER_TIMEOUT,
+              **kwargs) -> List[VcenterResult]:
+    """Check the vCenters in worker processes, up to 'processes' at a time
+
+    Each vCenter runs in its own process so the pyVmomi deserialization is spread
+    over the cores. A worker that runs longer than 'timeout' seconds is terminated
+    and a worker that dies is reported as failed, neither stalls the other vCenters.
+    The output of each vCenter is printed in inventory order as soon as it and the
+    vCenters before it are done, and the results are returned in the same order.
+    """
+
+    processes = processes or os.cpu_count() or 1
+    results: List[Optional[VcenterResult]] = [None] * len(vcenters)
+    pending = list(range(len(vcenters)))
+    running = {}
+    printed = 0
+
+    while pending or running:
+        while pending and len(running) < processes:
+            index = pending.pop(0)
+            parent_conn, child_conn = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=_worker, args=(child_conn, vcenters[index], kwargs), daemon=True)
+            process.start()
+            child_conn.close()
+            running[parent_conn] = (index, process, time.time())
+
+        now = time.time()
+        deadline = min(started + timeout for _, _, started in running.values())
+        for conn in wait(list(running), timeout=max(deadline - now, 0)):
+            index, process, started = running.pop(conn)
+            try:
+                results[index] = conn.recv()
+            except EOFError:
+                process.join()
+                results[index] = VcenterResult(host=vcenters[index]['host'], output='', failed=[],
+                                               error='worker exited with code {}'.format(process.exitcode),
+                                               duration=time.time() - started)
+            conn.close()
+            process.join()
+
+        now = time.time()
+        for conn, (index, process, started) in list(running.items()):
+            if now - started >= timeout:
+                process.terminate()
+                process.join()
+                conn.close()
+                del running[conn]
+                results[index] = VcenterResult(host=vcenters[index]['host'], output='', failed=[],
+                                               error='timed out after {}s'.format(timeout),
+                                               duration=now - started)
+
+        while printed < len(results) and results[printed] is not None:
+            print(results[printed].output, end='', flush=True)
+            printed += 1
+
+    return results
+
+
+def print_fleet_summary(results: List[VcenterResult]) -> None:
+    print('\nvSAN fleet summary')
+    for result in results:
+        if result.error:
+            status = print_red('error: {}'.format(result.error))
+        elif result.failed:
+            status = print_red('failed clusters: {}'.format(', '.join(result.failed)))
+        else:
+            status = print_green('ok')
+        print('  vCenter: {:<32} Duration: {:>8.1f}s Status: {}'.format(result.host, result.duration, status))
@@ -0,0 +1,140 @@
+"""
+Capacity exhaustion forecast of every cluster of a history store at once.
+
+The used and committed capacity of each sample are taken as a percentage of the
+total capacity of the sample, so an expansion of the cluster does not read as a
+shrink of its usage, and a line is fitted to each by least squares over the
+samples of the window. The sums of the fits of all the clusters are computed by
+a single aggregate query of the store, which leaves a few operations per cluster
+to get the growth per day and the days until the threshold is reached.
+"""
+
+import time
+
+from dataclasses import dataclass
+from typing import List, Optional
+
+from libs.history import HistoryStore
+from libs.util import print_green, print_red, print_yellow
+
+# Percentage of the total capacity the forecast counts the days to
+THRESHOLD = 80
+
+# Seconds of history the trends are fitted on
+WINDOW = 30 * 86400
+
+# Days to the threshold printed in red, and in yellow, below these
+RED_DAYS = 30
+YELLOW_DAYS = 90
+
+# Samples below which a cluster has no forecast
+MIN_SAMPLES = 3
+
+# Sums of the least squares fits of the used and committed percentage series against the
+# time in seconds relative to now, with the last sample of each. total() sums as floats,
+# the sums of the squares of the times would overflow the integers of sum() over years.
+SUMS_SQL = """
+SELECT s.vcenter, s.cluster, s.metric, count(*), total(p.ts - :now), total((p.ts - :now) * (p.ts - :now)),
+       total(p.value), total((p.ts - :now) * p.value), max(p.ts), p.value
+FROM series s
+JOIN samples p ON p.series_id = s.id AND p.resolution IN ({resolutions}) AND p.ts >= :start
+WHERE s.metric IN ('capacity_used_percent', 'capacity_committed_percent')
+GROUP BY s.id
+"""
+
+
+@dataclass
+class Trend:
+    __slots__ = ('percent', 'growth', 'days')
+    # Last sample, percentage of the total capacity
+    percent: float
+    # Fitted growth, percentage points per day
+    growth: float
+    # Days until the fitted line reaches the threshold, 0 past it, None when it does not grow
+    days: Optional[float]
+
+
+@dataclass
+class CapacityForecast:
+    __slots__ = ('host_name', 'cluster_name', 'samples', 'last_sample', 'used', 'committed')
+    host_name: str
+    cluster_name: str
+    samples: int
+    last_sample: float
+    used: Optional[Trend]
+    committed: Optional[Trend]
+
+
+def fit(n: int, sx: float, sxx: float, sy: float, sxy: float, last: float, threshold: float) -> Optional[Trend]:
+    """ Trend of the least squares line of the sums, None when the times do not vary """
+
+    denominator = n * sxx - sx * sx
+    if denominator <= 0:
+        return None
+    slope = (n * sxy - sx * sy) / denominator
+    growth = slope * 86400
+    # The times are relative to now, the intercept is the fitted value now.
+    now = (sy - slope * sx) / n
+    if now >= threshold:
+        days = 0.
+    elif growth > 0:
+        days = (threshold - now) / growth
+    else:
+        days = None
+    return Trend(percent=last, growth=growth, days=days)
+
+
+def forecast_capacity(history: HistoryStore,
+                      threshold: float = THRESHOLD,
+                      window: float = WINDOW,
+                      now: float = None) -> List[CapacityForecast]:
+    """ Forecast of every cluster with MIN_SAMPLES capacity samples in the window, soonest exhaustion first """
+
+    now = int(now if now is not None else time.time())
+    forecasts = {}
+    sql = SUMS_SQL.format(resolutions=', '.join(str(x) for x in history.retention))
+    for row in history.fetch(sql, {'now': now, 'start': now - int(window)}):
+        vcenter, cluster, metric, n, sx, sxx, sy, sxy, last_ts, last = row
+        if n < MIN_SAMPLES:
+            continue
+        forecast = forecasts.get((vcenter, cluster))
+        if forecast is None:
+            forecast = CapacityForecast(host_name=vcenter,
+                                        cluster_name=cluster,
+                                        samples=n,
+                                        last_sample=last_ts,
+                                        used=None,
+                                        committed=None)
+            forecasts[(vcenter, cluster)] = forecast
+        trend = fit(n, sx, sxx, sy, sxy, last, threshold)
+        if metric == 'capacity_used_percent':
+            forecast.used = trend
+        else:
+            forecast.committed = trend
+
+    def soonest(forecast: CapacityForecast) -> float:
+        days = [x.days for x in [forecast.used, forecast.committed] if x is not None and x.days is not None]
+        return min(days, default=float('inf'))
+
+    return sorted(forecasts.values(), key=soonest)
+
+
+def format_trend(trend: Optional[Trend]) -> str:
+    if trend is None:
+        return '{:>8} {:>9} {:>10}'.format('-', '-', '-')
+    if trend.days is None:
+        days = print_green('{:>10}'.format('never'))
+    else:
+        days = '{:>10.0f}'.format(trend.days)
+        days = print_red(days) if trend.days < RED_DAYS else print_yellow(days) if trend.days < YELLOW_DAYS \
+            else print_green(days)
+    return '{:>7.1f}% {:>+8.2f}% {}'.format(trend.percent, trend.growth, days)
+
+
+def print_capacity_forecast(forecasts: List[CapacityForecast], threshold: float = THRESHOLD) -> None:
+    print('\nvSAN capacity forecast, days to {:g}% of the capacity\n'.format(threshold))
+    print('  {:<30} {:<30} {:>8} {:>9} {:>10} {:>8} {:>9} {:>10}'.format(
+        'vCenter', 'Cluster', 'Used', 'Per day', 'Days', 'Commit.', 'Per day', 'Days'))
+    for forecast in forecasts:
+        print('  {:<30} {:<30} {} {}'.format(forecast.host_name, forecast.cluster_name,
+                                             format_trend(forecast.used), format_trend(forecast.committed)))
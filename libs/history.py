@@ -0,0 +1,259 @@
+"""
+Local history of the capacity and health of the clusters, in a SQLite database.
+
+Each run of the capacity, health and vms checks appends its capacity, space
+efficiency, per disk fullness and variance, and object health counts as samples
+of series identified by vCenter, cluster, metric and labels, so the trends are
+read from the local file instead of vCenter.
+
+The samples of a series are stored in its primary key order, so a time range of
+a series is a range scan of the key whatever the size of the database. The
+database is in WAL mode, readers do not block the running checks which append
+to it. Samples older than the retention of their resolution are averaged into
+the next resolution, the raw samples into hourly ones then into daily ones.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+from array import array
+from dataclasses import dataclass
+from typing import Dict, List, Tuple, Union
+
+from libs.results import CapacityResult, HealthResult, VmsResult
+
+# Seconds each resolution is kept, the samples older than that are averaged into
+# the next resolution, and dropped after the last one. 0 is the raw samples.
+RETENTION = {0: 7 * 86400, 3600: 90 * 86400, 86400: 5 * 365 * 86400}
+
+# Seconds between two compactions, done by the first record after that time
+COMPACT_INTERVAL = 3600
+
+# Seconds a writer waits for another process holding the write lock
+BUSY_TIMEOUT = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    id INTEGER PRIMARY KEY,
+    vcenter TEXT NOT NULL,
+    cluster TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    UNIQUE (vcenter, cluster, metric, labels)
+);
+CREATE TABLE IF NOT EXISTS samples (
+    series_id INTEGER NOT NULL,
+    resolution INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    value REAL NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (series_id, resolution, ts)
+) WITHOUT ROWID;
+"""
+
+# (metric, labels, value)
+Sample = Tuple[str, Dict[str, str], float]
+
+Result = Union[CapacityResult, HealthResult, VmsResult]
+
+
+@dataclass
+class Series:
+    __slots__ = ('vcenter', 'cluster', 'metric', 'labels', 'timestamps', 'values', 'minimums', 'maximums')
+    vcenter: str
+    cluster: str
+    metric: str
+    labels: Dict[str, str]
+    timestamps: array
+    values: array
+    minimums: array
+    maximums: array
+
+
+def capacity_samples(result: CapacityResult) -> List[Sample]:
+    samples = [('capacity_total_bytes', {}, result.total),
+               ('capacity_free_bytes', {}, result.free),
+               ('capacity_committed_bytes', {}, result.committed)]
+    if result.total:
+        # Percentages of the capacity of the sample, the trends are not broken by a cluster expansion.
+        samples += [('capacity_used_percent', {}, (result.total - result.free) * 100 / result.total),
+                    ('capacity_committed_percent', {}, result.committed * 100 / result.total)]
+    efficiency = result.efficiency
+    if efficiency:
+        samples += [('efficiency_metadata_bytes', {}, efficiency.metadata),
+                    ('efficiency_logical_bytes', {}, efficiency.logical),
+                    ('efficiency_logical_used_bytes', {}, efficiency.logical_used),
+                    ('efficiency_physical_bytes', {}, efficiency.physical),
+                    ('efficiency_physical_used_bytes', {}, efficiency.physical_used)]
+    return samples
+
+
+def health_samples(result: HealthResult) -> List[Sample]:
+    samples = []
+    for disk in result.disk_balance or []:
+        samples += [('disk_fullness_percent', {'disk': disk.uuid}, disk.fullness),
+                    ('disk_variance_percent', {'disk': disk.uuid}, disk.variance)]
+    return samples
+
+
+def vms_samples(result: VmsResult) -> List[Sample]:
+    return [('objects', {'health': x.health}, x.num_objects) for x in result.health_counts]
+
+
+# Samples of each recorded result type
+SAMPLES = {
+    CapacityResult: capacity_samples,
+    HealthResult: health_samples,
+    VmsResult: vms_samples,
+}
+
+
+class HistoryStore(object):
+    """Time series of the check results of the clusters in a SQLite database
+
+    The store is shared by the threads of a run, and the database by the
+    processes appending to it, e.g. a run and an exporter.
+    """
+
+    def __init__(self, path: str, retention: Dict[int, float] = None):
+        self.path = path
+        self.retention = dict(sorted((retention or RETENTION).items()))
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False,
+                                          isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        # A commit in WAL mode is durable at the next checkpoint, which is enough for a history.
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+        self.series_ids: Dict[Tuple[str, str, str, str], int] = {}
+        self.compacted = 0.
+
+    def __series_id(self, vcenter: str, cluster: str, metric: str, labels: str, created: Dict[tuple, int]) -> int:
+        key = (vcenter, cluster, metric, labels)
+        series_id = self.series_ids.get(key) or created.get(key)
+        if series_id is None:
+            self.connection.execute('INSERT OR IGNORE INTO series (vcenter, cluster, metric, labels) '
+                                    'VALUES (?, ?, ?, ?)', key)
+            series_id = self.connection.execute('SELECT id FROM series WHERE vcenter = ? AND cluster = ? '
+                                                'AND metric = ? AND labels = ?', key).fetchone()[0]
+            created[key] = series_id
+        return series_id
+
+    def append(self, vcenter: str, cluster: str, samples: List[Sample], timestamp: float = None) -> None:
+        """ Append raw samples of a cluster at the timestamp, now by default """
+
+        ts = int(timestamp if timestamp is not None else time.time())
+        with self.lock:
+            # The ids of the series inserted by the transaction are cached once it is committed, a
+            # rolled back insert leaves no id of a missing series in the cache.
+            created = {}
+            with self.connection:
+                self.connection.execute('BEGIN IMMEDIATE')
+                rows = [(self.__series_id(vcenter, cluster, metric, json.dumps(labels, sort_keys=True), created),
+                         ts, value, value, value)
+                        for metric, labels, value in samples if value is not None]
+                # A sample of the same second, e.g. a health summary read again from the cache, replaces it.
+                self.connection.executemany('INSERT OR REPLACE INTO samples VALUES (?, 0, ?, ?, ?, ?, 1)', rows)
+            self.series_ids.update(created)
+
+        if time.time() - self.compacted > COMPACT_INTERVAL:
+            self.compact()
+
+    def record(self, result: Result) -> None:
+        """ Append the samples of a check result, at the time of its health summary if any """
+        timestamp = getattr(result, 'timestamp', None)
+        self.append(result.host_name,
+                    result.cluster_name,
+                    SAMPLES[type(result)](result),
+                    timestamp=timestamp.timestamp() if timestamp else None)
+
+    def compact(self, now: float = None) -> None:
+        """ Average the samples past the retention of their resolution into the next one """
+
+        now = int(now if now is not None else time.time())
+        resolutions = list(self.retention)
+        with self.lock:
+            self.compacted = time.time()
+            series_ids = [x for x, in self.connection.execute('SELECT id FROM series')]
+            with self.connection:
+                self.connection.execute('BEGIN IMMEDIATE')
+                for resolution, next_resolution in zip(resolutions, resolutions[1:] + [None]):
+                    cutoff = now - int(self.retention[resolution])
+                    if next_resolution:
+                        # Whole buckets only, so a bucket is not averaged from samples of two compactions.
+                        cutoff -= cutoff % next_resolution
+                    for series_id in series_ids:
+                        if next_resolution:
+                            self.__roll_up(series_id, resolution, next_resolution, cutoff)
+                        self.connection.execute('DELETE FROM samples WHERE series_id = ? AND resolution = ? '
+                                                'AND ts < ?', (series_id, resolution, cutoff))
+
+    def __roll_up(self, series_id: int, resolution: int, next_resolution: int, cutoff: int) -> None:
+        self.connection.execute(
+            'INSERT INTO samples '
+            'SELECT series_id, :next, ts - ts % :next, sum(value * count) / sum(count), min(min), max(max), '
+            '       sum(count) '
+            'FROM samples WHERE series_id = :series AND resolution = :resolution AND ts < :cutoff '
+            'GROUP BY ts - ts % :next '
+            'ON CONFLICT (series_id, resolution, ts) DO UPDATE SET '
+            '    value = (value * count + excluded.value * excluded.count) / (count + excluded.count), '
+            '    min = min(min, excluded.min), max = max(max, excluded.max), count = count + excluded.count',
+            {'series': series_id, 'resolution': resolution, 'next': next_resolution, 'cutoff': cutoff})
+
+    def series(self, vcenter: str = None, cluster: str = None, metric: str = None) -> List[tuple]:
+        """ (id, vcenter, cluster, metric, labels) of the series matching the filters """
+        conditions = [(name, value) for name, value in [('vcenter', vcenter), ('cluster', cluster),
+                                                         ('metric', metric)] if value is not None]
+        where = ' AND '.join('{} = ?'.format(x) for x, _ in conditions) or '1'
+        with self.lock:
+            rows = self.connection.execute('SELECT id, vcenter, cluster, metric, labels FROM series WHERE {} '
+                                           'ORDER BY vcenter, cluster, metric, labels'.format(where),
+                                           [x for _, x in conditions]).fetchall()
+        return [(x[0], x[1], x[2], x[3], json.loads(x[4])) for x in rows]
+
+    def query(self,
+              cluster: str,
+              metric: str,
+              start: float,
+              end: float = None,
+              vcenter: str = None,
+              step: int = None) -> List[Series]:
+        """Samples of the matching series from start to end, of every resolution
+
+        With a step, the samples are averaged in buckets of 'step' seconds, the
+        minimum and maximum are those of the bucket.
+        """
+
+        end = end if end is not None else time.time()
+        bucket = 'ts - ts % {}'.format(int(step)) if step else 'ts'
+        sql = ('SELECT {0}, sum(value * count) / sum(count), min(min), max(max) FROM samples '
+               'WHERE series_id = ? AND resolution IN ({1}) AND ts >= ? AND ts < ? '
+               'GROUP BY {0} ORDER BY {0}'.format(bucket, ', '.join(str(x) for x in self.retention)))
+
+        result = []
+        for series_id, series_vcenter, series_cluster, series_metric, labels in self.series(vcenter, cluster,
+                                                                                             metric):
+            with self.lock:
+                rows = self.connection.execute(sql, (series_id, int(start), int(end))).fetchall()
+            result.append(Series(vcenter=series_vcenter,
+                                 cluster=series_cluster,
+                                 metric=series_metric,
+                                 labels=labels,
+                                 timestamps=array('q', [x[0] for x in rows]),
+                                 values=array('d', [x[1] for x in rows]),
+                                 minimums=array('d', [x[2] for x in rows]),
+                                 maximums=array('d', [x[3] for x in rows])))
+        return result
+
+    def fetch(self, sql: str, parameters=()) -> list:
+        """ Rows of a read query of the database, for the reports computed in SQL """
+        with self.lock:
+            return self.connection.execute(sql, parameters).fetchall()
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,176 @@
+from collections import Counter
+from fnmatch import fnmatch
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from pyVmomi import vim, vmodl
+
+# Number of objects returned per RetrievePropertiesEx / ContinueRetrievePropertiesEx page
+PAGE_SIZE = 1000
+
+
+class ClusterVm(NamedTuple):
+    moref: str
+    name: str
+    instance_uuid: Optional[str]
+    host_name: Optional[str]
+
+
+def retrieve_properties(si: vim.ServiceInstance,
+                        obj_specs: List[vmodl.query.PropertyCollector.ObjectSpec],
+                        prop_specs: List[vmodl.query.PropertyCollector.PropertySpec],
+                        page_size: int = PAGE_SIZE) -> Iterator[vmodl.query.PropertyCollector.ObjectContent]:
+    """ Retrieve the properties with RetrievePropertiesEx, following the continuation tokens """
+
+    pc = si.content.propertyCollector
+    filter_spec = vmodl.query.PropertyCollector.FilterSpec(objectSet=obj_specs, propSet=prop_specs)
+    options = vmodl.query.PropertyCollector.RetrieveOptions(maxObjects=page_size)
+
+    result = pc.RetrievePropertiesEx(specSet=[filter_spec], options=options)
+    while result:
+        for obj_content in result.objects:
+            yield obj_content
+        if not result.token:
+            break
+        result = pc.ContinueRetrievePropertiesEx(token=result.token)
+
+
+def get_properties(obj_content: vmodl.query.PropertyCollector.ObjectContent) -> Dict[str, object]:
+    """ Convert the propSet of an ObjectContent to a dict, missing properties are not included """
+    return {prop.name: prop.val for prop in obj_content.propSet}
+
+
+def get_cluster_vms(si: vim.ServiceInstance, cluster: vim.ClusterComputeResource) -> List[ClusterVm]:
+    """Get the VMs registered on the hosts of the cluster
+
+    The hosts and VMs are traversed from the cluster and only the needed properties
+    are collected, in a single paged PropertyCollector retrieval. The VMs are sorted
+    by host name, in the host VM order.
+    """
+
+    TraversalSpec = vmodl.query.PropertyCollector.TraversalSpec
+    host_to_vm = TraversalSpec(name='hostToVm', type=vim.HostSystem, path='vm', skip=False)
+    cluster_to_host = TraversalSpec(name='clusterToHost', type=vim.ClusterComputeResource, path='host',
+                                    skip=False, selectSet=[host_to_vm])
+    obj_spec = vmodl.query.PropertyCollector.ObjectSpec(obj=cluster, skip=True, selectSet=[cluster_to_host])
+    prop_specs = [vmodl.query.PropertyCollector.PropertySpec(type=vim.HostSystem, pathSet=['name']),
+                  vmodl.query.PropertyCollector.PropertySpec(type=vim.VirtualMachine,
+                                                             pathSet=['name', 'config.instanceUuid', 'runtime.host'])]
+
+    host_names = {}
+    vms_props = []
+    for obj_content in retrieve_properties(si, [obj_spec], prop_specs):
+        props = get_properties(obj_content)
+        if isinstance(obj_content.obj, vim.HostSystem):
+            host_names[obj_content.obj._moId] = props.get('name')
+        else:
+            vms_props.append((obj_content.obj._moId, props))
+
+    vms = []
+    for moref, props in vms_props:
+        host = props.get('runtime.host')
+        vms.append(ClusterVm(moref=moref,
+                             name=props.get('name', ''),
+                             instance_uuid=props.get('config.instanceUuid'),
+                             host_name=host_names.get(host._moId) if host else None))
+    vms.sort(key=lambda x: x.host_name or '')
+    return vms
+
+
+def get_vms(si: vim.ServiceInstance, vms: List[vim.VirtualMachine]) -> List[ClusterVm]:
+    """ Get the name and instance UUID of the given VMs, without their host, in a single retrieval """
+
+    if not vms:
+        return []
+    unique_vms = {x._moId: x for x in vms}.values()
+    obj_specs = [vmodl.query.PropertyCollector.ObjectSpec(obj=x, skip=False) for x in unique_vms]
+    prop_spec = vmodl.query.PropertyCollector.PropertySpec(type=vim.VirtualMachine,
+                                                           pathSet=['name', 'config.instanceUuid'])
+    result = []
+    for obj_content in retrieve_properties(si, obj_specs, [prop_spec]):
+        props = get_properties(obj_content)
+        result.append(ClusterVm(moref=obj_content.obj._moId,
+                                name=props.get('name', ''),
+                                instance_uuid=props.get('config.instanceUuid'),
+                                host_name=None))
+    return result
+
+
+def get_datacenter_names(si: vim.ServiceInstance, entities: List[vim.ManagedEntity]) -> Dict[str, Optional[str]]:
+    """ Get the name of the datacenter of each entity by moref, in a single retrieval of their ancestors """
+
+    TraversalSpec = vmodl.query.PropertyCollector.TraversalSpec
+    to_parent = TraversalSpec(name='toParent', type=vim.ManagedEntity, path='parent', skip=False,
+                              selectSet=[vmodl.query.PropertyCollector.SelectionSpec(name='toParent')])
+    obj_specs = [vmodl.query.PropertyCollector.ObjectSpec(obj=x, skip=False, selectSet=[to_parent])
+                 for x in entities]
+    prop_spec = vmodl.query.PropertyCollector.PropertySpec(type=vim.ManagedEntity, pathSet=['name', 'parent'])
+
+    names = {}
+    parents = {}
+    datacenters = set()
+    for obj_content in retrieve_properties(si, obj_specs, [prop_spec]):
+        props = get_properties(obj_content)
+        names[obj_content.obj._moId] = props.get('name')
+        parents[obj_content.obj._moId] = props['parent']._moId if props.get('parent') else None
+        if isinstance(obj_content.obj, vim.Datacenter):
+            datacenters.add(obj_content.obj._moId)
+
+    result = {}
+    for entity in entities:
+        mo_id = entity._moId
+        while mo_id is not None and mo_id not in datacenters:
+            mo_id = parents.get(mo_id)
+        result[entity._moId] = names.get(mo_id)
+    return result
+
+
+def key_clusters(si: vim.ServiceInstance,
+                 clusters: List[Tuple[str, vim.ClusterComputeResource]]) -> Dict[str, vim.ClusterComputeResource]:
+    """Key the clusters by name, or by datacenter/name when clusters of several datacenters have the name
+
+    A cluster name is only unique in its datacenter, the datacenters of the
+    clusters with a shared name are looked up so that none of them is dropped.
+    """
+    counts = Counter(name for name, _ in clusters)
+    shared = [cluster for name, cluster in clusters if counts[name] > 1]
+    datacenters = get_datacenter_names(si, shared) if shared else {}
+    return {'{}/{}'.format(datacenters.get(cluster._moId) or cluster._moId, name) if counts[name] > 1 else name:
+            cluster for name, cluster in clusters}
+
+
+def get_vsan_clusters(si: vim.ServiceInstance) -> Dict[str, vim.ClusterComputeResource]:
+    """Get the vSAN enabled clusters of the vCenter by name, in a single PropertyCollector retrieval
+
+    The clusters sharing their name with a cluster of another datacenter are keyed
+    by datacenter/name instead, see key_clusters.
+    """
+
+    content = si.content
+    view = content.viewManager.CreateContainerView(content.rootFolder, [vim.ClusterComputeResource], recursive=True)
+    try:
+        TraversalSpec = vmodl.query.PropertyCollector.TraversalSpec
+        view_to_cluster = TraversalSpec(name='viewToCluster', type=vim.view.ContainerView, path='view', skip=False)
+        obj_spec = vmodl.query.PropertyCollector.ObjectSpec(obj=view, skip=True, selectSet=[view_to_cluster])
+        prop_spec = vmodl.query.PropertyCollector.PropertySpec(type=vim.ClusterComputeResource,
+                                                               pathSet=['name', 'configurationEx'])
+
+        clusters = []
+        for obj_content in retrieve_properties(si, [obj_spec], [prop_spec]):
+            props = get_properties(obj_content)
+            vsan_config = getattr(props.get('configurationEx'), 'vsanConfigInfo', None)
+            if vsan_config and vsan_config.enabled:
+                clusters.append((props['name'], obj_content.obj))
+    finally:
+        view.Destroy()
+    return key_clusters(si, clusters)
+
+
+def select_clusters(clusters: Dict[str, vim.ClusterComputeResource],
+                    patterns: List[str]) -> Dict[str, vim.ClusterComputeResource]:
+    """Select the clusters whose name matches any of the glob patterns, sorted by name
+
+    A cluster keyed by datacenter/name matches on either, e.g. 'prod-*' selects the
+    clusters of that name in every datacenter and 'dc-1/prod-*' the ones of dc-1.
+    """
+    return {key: clusters[key] for key in sorted(clusters)
+            if any(fnmatch(key, x) or fnmatch(key.rsplit('/', 1)[-1], x) for x in patterns)}
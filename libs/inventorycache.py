@@ -0,0 +1,250 @@
+"""
+Inventory cache of the clusters, hosts and VMs of a vCenter, kept up to date
+with the changes reported by a PropertyCollector filter.
+
+The first refresh loads the whole inventory, the next ones only apply the
+changes since the last version returned by WaitForUpdatesEx, so the cluster and
+VM lookups of the checks are local dict hits.
+
+The state is saved to a JSON file after every refresh which changed it, and is
+served from the file by a restarted process until its first refresh. The version
+tokens belong to the filter of a session, the filter of a new session, e.g.
+after a restart or a new login, loads the inventory again.
+
+The first refresh of a process costs a load of the whole inventory of the
+vCenter, the cache pays off in long-lived processes refreshing it many times,
+e.g. the exporter, not in a one-off run of the checks of a few clusters.
+"""
+
+import json
+import os
+import tempfile
+import threading
+
+from typing import Dict, List, Optional
+
+from pyVmomi import vim, vmodl
+
+from libs.inventory import ClusterVm, key_clusters
+
+# Properties of the cached objects, per type
+PROPERTIES = {
+    vim.ClusterComputeResource: ['name', 'host', 'configurationEx'],
+    vim.HostSystem: ['name'],
+    vim.VirtualMachine: ['name', 'config.instanceUuid', 'runtime.host'],
+}
+
+# Maximum number of objects per WaitForUpdatesEx result
+MAX_OBJECT_UPDATES = 1000
+
+
+def _mo_id(value) -> Optional[str]:
+    return value._moId if value is not None else None
+
+
+class InventoryCache(object):
+    """Clusters, hosts and VMs of a vCenter, refreshed with WaitForUpdatesEx
+
+    Every object is kept as a dict of the fields the checks use, by moref:
+    clusters {'name', 'hosts', 'vsan_enabled'}, hosts {'name'} and VMs
+    {'name', 'instance_uuid', 'host'}.
+    """
+
+    def __init__(self, si: vim.ServiceInstance, path: str = None, max_object_updates: int = MAX_OBJECT_UPDATES):
+        self.si = si
+        self.path = path
+        self.max_object_updates = max_object_updates
+        self.instance_uuid = si.content.about.instanceUuid
+        self.lock = threading.Lock()
+        self.collector: Optional[vmodl.query.PropertyCollector] = None
+        self.view: Optional[vim.view.ContainerView] = None
+        self.version = ''
+        self.clusters: Dict[str, dict] = {}
+        self.hosts: Dict[str, dict] = {}
+        self.vms: Dict[str, dict] = {}
+        # VMs of each host, in their registration order
+        self.host_vms: Dict[str, Dict[str, None]] = {}
+        # Whether the state was loaded from the file, until the first refresh
+        self.loaded = False
+
+        if path:
+            self.load()
+
+    # Persistence
+
+    def load(self) -> None:
+        """ Load the state saved by another process, unless it is missing or of another vCenter """
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        if state.get('instance_uuid') != self.instance_uuid:
+            return
+        with self.lock:
+            self.clusters = state['clusters']
+            self.hosts = state['hosts']
+            self.vms = {}
+            self.host_vms = {}
+            for mo_id, vm in state['vms'].items():
+                self.vms[mo_id] = vm
+                self.__index_vm(mo_id, vm['host'])
+            self.loaded = True
+
+    def save(self) -> None:
+        with self.lock:
+            state = json.dumps({'instance_uuid': self.instance_uuid,
+                                'clusters': self.clusters,
+                                'hosts': self.hosts,
+                                'vms': self.vms})
+
+        # Write to a temporary file and rename it so a restarted process never reads a partial file.
+        fd, path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)))
+        with os.fdopen(fd, 'w') as f:
+            f.write(state)
+        os.replace(path, self.path)
+
+    # Updates
+
+    def __create_filter(self) -> None:
+        """ Filter of the cached properties on a collector of its own, destroyed with the session """
+
+        content = self.si.content
+        self.collector = content.propertyCollector.CreatePropertyCollector()
+        self.view = content.viewManager.CreateContainerView(content.rootFolder, list(PROPERTIES), recursive=True)
+
+        TraversalSpec = vmodl.query.PropertyCollector.TraversalSpec
+        view_to_object = TraversalSpec(name='viewToObject', type=vim.view.ContainerView, path='view', skip=False)
+        obj_spec = vmodl.query.PropertyCollector.ObjectSpec(obj=self.view, skip=True, selectSet=[view_to_object])
+        prop_specs = [vmodl.query.PropertyCollector.PropertySpec(type=x, pathSet=y) for x, y in PROPERTIES.items()]
+        filter_spec = vmodl.query.PropertyCollector.FilterSpec(objectSet=[obj_spec], propSet=prop_specs)
+        self.collector.CreateFilter(filter_spec, partialUpdates=False)
+        self.version = ''
+
+    def __index_vm(self, mo_id: str, host: Optional[str]) -> None:
+        if host is not None:
+            self.host_vms.setdefault(host, {})[mo_id] = None
+
+    def __unindex_vm(self, mo_id: str) -> None:
+        vm = self.vms.get(mo_id)
+        if vm is not None and vm['host'] is not None:
+            self.host_vms.get(vm['host'], {}).pop(mo_id, None)
+
+    def __apply_change(self, obj: vim.ManagedEntity, name: str, value) -> None:
+        mo_id = obj._moId
+        if isinstance(obj, vim.ClusterComputeResource):
+            cluster = self.clusters.setdefault(mo_id, {'name': None, 'hosts': [], 'vsan_enabled': False})
+            if name == 'name':
+                cluster['name'] = value
+            elif name == 'host':
+                cluster['hosts'] = [x._moId for x in value or []]
+            elif name == 'configurationEx':
+                cluster['vsan_enabled'] = bool(getattr(getattr(value, 'vsanConfigInfo', None), 'enabled', False))
+        elif isinstance(obj, vim.HostSystem):
+            self.hosts.setdefault(mo_id, {'name': None})['name'] = value
+        elif isinstance(obj, vim.VirtualMachine):
+            vm = self.vms.setdefault(mo_id, {'name': '', 'instance_uuid': None, 'host': None})
+            if name == 'name':
+                vm['name'] = value
+            elif name == 'config.instanceUuid':
+                vm['instance_uuid'] = value
+            elif name == 'runtime.host':
+                self.__unindex_vm(mo_id)
+                vm['host'] = _mo_id(value)
+                self.__index_vm(mo_id, vm['host'])
+
+    def __apply(self, update_set: vmodl.query.PropertyCollector.UpdateSet) -> None:
+        for filter_update in update_set.filterSet or []:
+            for obj_update in filter_update.objectSet or []:
+                obj = obj_update.obj
+                if obj_update.kind == 'leave':
+                    self.__unindex_vm(obj._moId)
+                    for objects in [self.clusters, self.hosts, self.vms]:
+                        objects.pop(obj._moId, None)
+                    continue
+                for change in obj_update.changeSet or []:
+                    # Without partial updates, a change assigns or removes the whole property.
+                    self.__apply_change(obj, change.name, change.val if change.op == 'assign' else None)
+
+    def __reset(self) -> None:
+        self.clusters, self.hosts, self.vms, self.host_vms = {}, {}, {}, {}
+
+    def __wait_for_updates(self) -> bool:
+        """ Apply the pending updates of the filter, returns whether there were any """
+
+        options = vmodl.query.PropertyCollector.WaitOptions(maxWaitSeconds=0,
+                                                            maxObjectUpdates=self.max_object_updates)
+        changed = False
+        while True:
+            update_set = self.collector.WaitForUpdatesEx(version=self.version, options=options)
+            if update_set is None:
+                return changed
+            if not self.version:
+                # The first update set of a filter holds the whole inventory.
+                self.__reset()
+            self.__apply(update_set)
+            self.version = update_set.version
+            changed = True
+            if not update_set.truncated:
+                return changed
+
+    def refresh(self) -> None:
+        """ Apply the inventory changes since the last refresh, loading the whole inventory on the first one """
+
+        with self.lock:
+            if self.collector is None:
+                self.__create_filter()
+            try:
+                changed = self.__wait_for_updates()
+            except (vmodl.fault.ManagedObjectNotFound, vmodl.query.InvalidCollectorVersion):
+                # The collector went away with its session, e.g. after a new login.
+                self.__create_filter()
+                changed = self.__wait_for_updates()
+
+        if changed and self.path:
+            self.save()
+
+    def close(self) -> None:
+        """ Destroy the collector, with its filter, and the view """
+        with self.lock:
+            collector, view = self.collector, self.view
+            self.collector = self.view = None
+        if collector is not None:
+            collector.Destroy()
+        if view is not None:
+            view.Destroy()
+
+    # Lookups
+
+    def get_vsan_clusters(self) -> Dict[str, vim.ClusterComputeResource]:
+        """ vSAN enabled clusters by name, as libs.inventory.get_vsan_clusters """
+        # noinspection PyProtectedMember
+        stub = self.si._stub
+        with self.lock:
+            clusters = [(x['name'], vim.ClusterComputeResource(mo_id, stub))
+                        for mo_id, x in self.clusters.items() if x['vsan_enabled']]
+        return key_clusters(self.si, clusters)
+
+    def find_cluster(self, name: str) -> Optional[vim.ClusterComputeResource]:
+        # noinspection PyProtectedMember
+        stub = self.si._stub
+        with self.lock:
+            for mo_id, cluster in self.clusters.items():
+                if cluster['name'] == name:
+                    return vim.ClusterComputeResource(mo_id, stub)
+        return None
+
+    def get_cluster_vms(self, cluster: vim.ClusterComputeResource) -> List[ClusterVm]:
+        """ VMs registered on the hosts of the cluster, as libs.inventory.get_cluster_vms """
+        vms = []
+        with self.lock:
+            for host in self.clusters.get(cluster._moId, {}).get('hosts', []):
+                host_name = self.hosts.get(host, {}).get('name')
+                for mo_id in self.host_vms.get(host, {}):
+                    vm = self.vms[mo_id]
+                    vms.append(ClusterVm(moref=mo_id,
+                                         name=vm['name'],
+                                         instance_uuid=vm['instance_uuid'],
+                                         host_name=host_name))
+        vms.sort(key=lambda x: x.host_name or '')
+        return vms
@@ -0,0 +1,40 @@
+from typing import Dict, List
+
+from pyVmomi import vim
+
+from libs.inventory import get_properties
+
+
+def build_params(property_name: str, params: Dict[str, object]):
+    """Build the VsanMassCollectorPropertyParams of a property
+
+    The parameters are the arguments of the API backing the property, e.g. 'count'
+    for clusterNetworkPerfHistoryTest. Lists are wrapped in a DynamicArray.
+    """
+
+    values = [vim.KeyAnyValue(key=key, value=vim.DynamicArray(val=value) if isinstance(value, list) else value)
+              for key, value in params.items()]
+    return vim.VsanMassCollectorPropertyParams(propertyName=property_name, propertyParams=values)
+
+
+def build_spec(objects: List[vim.ManagedEntity],
+               properties: List[str],
+               params: Dict[str, Dict[str, object]] = None):
+    """ Build a VsanMassCollectorSpec getting the properties of the objects, 'params' by property name """
+    return vim.VsanMassCollectorSpec(objects=objects,
+                                     properties=properties,
+                                     propertiesParams=[build_params(name, value)
+                                                       for name, value in (params or {}).items()])
+
+
+def retrieve_properties(mass_collector, specs: list) -> Dict[str, Dict[str, object]]:
+    """Get the properties of all the specs in a single VsanRetrieveProperties call
+
+    The properties are returned by object moId. A property that failed on the server
+    side is in the missingSet of its object and is not included.
+    """
+
+    result = {}
+    for obj_content in mass_collector.VsanRetrieveProperties(massCollectorSpecs=specs) or []:
+        result.setdefault(obj_content.obj._moId, {}).update(get_properties(obj_content))
+    return result
@@ -0,0 +1,54 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterator, List, NamedTuple, Optional
+
+from pyVmomi import vim
+
+# Number of object UUIDs per VosQueryVsanObjectInformation call
+BATCH_SIZE = 500
+
+# Number of VosQueryVsanObjectInformation calls in flight
+BATCH_PARALLEL = 4
+
+
+class ObjectInfo(NamedTuple):
+    uuid: str
+    health: Optional[str]
+    compliance: Optional[str]
+
+
+def to_object_info(item) -> ObjectInfo:
+    """ Keep only the fields used from the object information """
+    compliance = item.spbmComplianceResult.complianceStatus if item.spbmComplianceResult else None
+    return ObjectInfo(uuid=item.vsanObjectUuid, health=item.vsanHealth, compliance=compliance)
+
+
+def query_object_information(vcos,
+                             cluster: vim.ClusterComputeResource,
+                             uuids: List[str],
+                             batch_size: int = BATCH_SIZE,
+                             parallel: int = BATCH_PARALLEL) -> Iterator[ObjectInfo]:
+    """Query the vSAN object information in batches
+
+    The UUIDs are split in batches of 'batch_size' and at most 'parallel' batches
+    are queried at the same time. The results are yielded as each batch completes,
+    reduced to ObjectInfo, so the DataObjects of only 'parallel' batches are held
+    at any time.
+    """
+
+    batches = (uuids[i:i + batch_size] for i in range(0, len(uuids), batch_size))
+
+    def query(batch: List[str]) -> List[ObjectInfo]:
+        specs = [vim.cluster.VsanObjectQuerySpec(uuid=uuid) for uuid in batch]
+        return [to_object_info(item)
+                for item in vcos.VosQueryVsanObjectInformation(cluster=cluster, vsanObjectQuerySpecs=specs)]
+
+    with ThreadPoolExecutor(max_workers=max(parallel, 1)) as executor:
+        pending = set()
+        for batch in batches:
+            pending.add(executor.submit(query, batch))
+            if len(pending) >= parallel:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+        for future in pending:
+            yield from future.result()
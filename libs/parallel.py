@@ -0,0 +1,68 @@
+import io
+import sys
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, TextIO
+
+
+class _ThreadStdout(io.TextIOBase):
+    """ Route writes to a per-thread buffer when one is set, else to the real stream. """
+
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, s: str) -> int:
+        buffer: Optional[io.StringIO] = getattr(self.local, 'buffer', None)
+        if buffer is not None:
+            return buffer.write(s)
+        return self.stream.write(s)
+
+    def flush(self) -> None:
+        if getattr(self.local, 'buffer', None) is None:
+            self.stream.flush()
+
+
+def run_ordered(tasks: List[Callable[[], None]], parallel: int = 1) -> None:
+    """Run the tasks on a thread pool and print their output in task order
+
+    Anything a task prints is buffered and written to stdout once the task and
+    all the tasks before it are done, so the output is the same as a serial run.
+    The first exception raised by a task is re-raised after the output of the
+    tasks before it has been written.
+    """
+
+    if parallel <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            task()
+        return
+
+    # Nested calls from a task reuse the installed proxy, their output goes to the task buffer.
+    installed = not isinstance(sys.stdout, _ThreadStdout)
+    if installed:
+        sys.stdout = _ThreadStdout(sys.stdout)
+    proxy = sys.stdout
+
+    def run(task: Callable[[], None]) -> str:
+        proxy.local.buffer = io.StringIO()
+        try:
+            task()
+            return proxy.local.buffer.getvalue()
+        finally:
+            proxy.local.buffer = None
+
+    try:
+        with ThreadPoolExecutor(max_workers=parallel) as executor:
+            futures = [executor.submit(run, task) for task in tasks]
+            try:
+                for future in futures:
+                    proxy.write(future.result())
+                    proxy.flush()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+    finally:
+        if installed:
+            sys.stdout = proxy.stream
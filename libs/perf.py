@@ -0,0 +1,103 @@
+from array import array
+from calendar import timegm
+from datetime import datetime
+from time import strptime
+from typing import Dict, List
+
+from pyVmomi import vim
+
+# Entity types collected by default, see VsanPerfGetSupportedEntityTypes for the others
+PERF_ENTITY_TYPES = ['cluster-domclient', 'host-domcompmgr', 'disk-group', 'virtual-machine']
+
+# Percentiles computed for the history views
+PERCENTILES = [50, 95, 99]
+
+# Format of the sampleInfo timestamps, in UTC
+PERF_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class PerfSeries(object):
+    """ Samples of one perf entity, timestamps in seconds since the epoch and one array per metric label """
+
+    __slots__ = ('entity_ref_id', 'timestamps', 'metrics')
+
+    def __init__(self, entity_ref_id: str, timestamps: array, metrics: Dict[str, array]):
+        self.entity_ref_id = entity_ref_id
+        self.timestamps = timestamps
+        self.metrics = metrics
+
+    @property
+    def entity_type(self) -> str:
+        return self.entity_ref_id.split(':', 1)[0]
+
+    def __repr__(self):
+        return 'PerfSeries({!r}, {} samples, {})'.format(self.entity_ref_id, len(self.timestamps),
+                                                         sorted(self.metrics))
+
+
+def parse_timestamps(sample_info: str) -> array:
+    """ Parse the comma separated sampleInfo timestamps to seconds since the epoch """
+    if not sample_info:
+        return array('d')
+    return array('d', (timegm(strptime(x, PERF_TIMESTAMP_FORMAT)) for x in sample_info.split(',')))
+
+
+def parse_values(values: str) -> array:
+    """ Parse the comma separated metric values, missing values are NaN """
+    if not values:
+        return array('d')
+    return array('d', (float(x) if x else float('nan') for x in values.split(',')))
+
+
+def parse_entity_metric(entity_metric) -> PerfSeries:
+    """ Convert a VsanPerfEntityMetricCSV to a PerfSeries """
+    return PerfSeries(entity_ref_id=entity_metric.entityRefId,
+                      timestamps=parse_timestamps(entity_metric.sampleInfo),
+                      metrics={x.metricId.label: parse_values(x.values) for x in entity_metric.value})
+
+
+def get_entity_ref_id(entity_type: str, cluster: vim.ClusterComputeResource) -> str:
+    """ Cluster entities are identified by the cluster vSAN UUID, the others are queried for every entity """
+    if entity_type.startswith('cluster-'):
+        return '{}:{}'.format(entity_type, cluster.configurationEx.vsanConfigInfo.defaultConfig.uuid)
+    return '{}:*'.format(entity_type)
+
+
+def query_perf(perf_manager,
+               cluster: vim.ClusterComputeResource,
+               start_time: datetime,
+               end_time: datetime,
+               entity_types: List[str] = None,
+               interval: int = None) -> List[PerfSeries]:
+    """Query the vSAN performance service for the entity types over a time window
+
+    The CSV values of the response are parsed in array.array('d') buffers.
+    """
+
+    query_specs = [vim.cluster.VsanPerfQuerySpec(entityRefId=get_entity_ref_id(x, cluster),
+                                                 startTime=start_time,
+                                                 endTime=end_time,
+                                                 interval=interval)
+                   for x in (entity_types or PERF_ENTITY_TYPES)]
+    entity_metrics = perf_manager.VsanPerfQueryPerf(querySpecs=query_specs, cluster=cluster)
+    return [parse_entity_metric(x) for x in entity_metrics or []]
+
+
+def percentiles(values: array, percents: List[float] = None) -> Dict[str, float]:
+    """Percentiles of the values with linear interpolation, NaN values are ignored
+
+    The values are sorted once and every percentile is read from the sorted buffer.
+    """
+
+    percents = percents or PERCENTILES
+    ordered = sorted(x for x in values if x == x)
+    result = {}
+    for percent in percents:
+        if not ordered:
+            result['p{:g}'.format(percent)] = float('nan')
+            continue
+        rank = (len(ordered) - 1) * percent / 100.
+        low = int(rank)
+        high = min(low + 1, len(ordered) - 1)
+        result['p{:g}'.format(percent)] = ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+    return result
@@ -0,0 +1,153 @@
+import json
+import os
+import tempfile
+import time
+
+from array import array
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+from libs.perf import PERF_ENTITY_TYPES, PerfSeries
+
+# Longest time window requested per VsanPerfQueryPerf call, in seconds
+PERF_POLL_WINDOW = 3600
+
+# Samples older than this are not back-filled after an outage, in seconds
+PERF_MAX_BACKFILL = 24 * 3600
+
+# Window of the first poll of an entity type, in seconds
+PERF_INITIAL_LOOKBACK = 3600
+
+# Delay after which the samples of a window are all available, in seconds
+PERF_SAMPLE_DELAY = 600
+
+# Polls an entity may be missing from before its high-water mark is forgotten
+PERF_MAX_MISSES = 2
+
+
+def _to_datetime(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+
+class PerfPoller(object):
+    """Incremental vSAN performance metric poller
+
+    Each poll requests only the samples newer than the high-water mark of each entity
+    type, in windows of at most 'window' seconds, so the payload of a poll does not
+    grow with the lookback. After an outage the missing range is back-filled, up to
+    'max_backfill' seconds. The high-water marks of the entity types and entities are
+    kept in the JSON 'checkpoint_file', one file per cluster. The mark of an entity
+    missing from 'max_misses' polls in a row, e.g. a removed VM, is forgotten.
+
+    'query' is called as query(start_time, end_time, entity_types=[...]) and returns
+    PerfSeries, e.g. VsanClusterCheck.collect_perf_metrics.
+    """
+
+    def __init__(self,
+                 query: Callable[..., List[PerfSeries]],
+                 checkpoint_file: str,
+                 entity_types: List[str] = None,
+                 window: int = PERF_POLL_WINDOW,
+                 max_backfill: int = PERF_MAX_BACKFILL,
+                 initial_lookback: int = PERF_INITIAL_LOOKBACK,
+                 max_misses: int = PERF_MAX_MISSES):
+        self.query = query
+        self.checkpoint_file = checkpoint_file
+        self.entity_types = entity_types or PERF_ENTITY_TYPES
+        self.window = window
+        self.max_backfill = max_backfill
+        self.initial_lookback = initial_lookback
+        self.max_misses = max_misses
+        self.checkpoint = self.__load_checkpoint()
+
+    def __load_checkpoint(self) -> Dict[str, Dict[str, float]]:
+        try:
+            with open(self.checkpoint_file) as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            checkpoint = {}
+        checkpoint.setdefault('types', {})
+        checkpoint.setdefault('entities', {})
+        checkpoint.setdefault('misses', {})
+        return checkpoint
+
+    def __save_checkpoint(self) -> None:
+        # Write to a temporary file and rename it so a crash never leaves a partial checkpoint.
+        fd, path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.checkpoint_file)))
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.checkpoint, f, indent=2, sort_keys=True)
+        os.replace(path, self.checkpoint_file)
+
+    def windows(self, entity_type: str, now: float, checkpoint: dict = None) -> List[tuple]:
+        """Time windows to request for the entity type, the gap since the last poll split in 'window' chunks
+
+        The gap starts at the oldest of the type mark and the marks of the entities of
+        the type, so an entity lagging behind the others gets its late samples. Only the
+        entities which reported in the last poll, and at most a window behind the type
+        mark, hold back the start, so a removed entity does not stretch the next polls.
+        """
+        checkpoint = checkpoint or self.checkpoint
+        type_mark = checkpoint['types'].get(entity_type, now - self.initial_lookback)
+        marks = [x for entity_ref_id, x in checkpoint['entities'].items()
+                 if entity_ref_id.split(':', 1)[0] == entity_type
+                 and not checkpoint['misses'].get(entity_ref_id) and x >= type_mark - self.window]
+        start = min([type_mark] + marks)
+        start = max(start, now - self.max_backfill)
+        windows = []
+        while start < now:
+            end = min(start + self.window, now)
+            windows.append((start, end))
+            start = end
+        return windows
+
+    def poll(self, now: float = None) -> List[PerfSeries]:
+        """Get the samples newer than the checkpoint, and move the checkpoint to the newest samples
+
+        The marks are moved on a copy of the checkpoint, which replaces it once every
+        query of the poll succeeded. A failed poll returns nothing and the next one
+        requests the same windows again.
+        """
+
+        now = now or time.time()
+        checkpoint = {x: dict(self.checkpoint[x]) for x in ['types', 'entities', 'misses']}
+        type_marks = checkpoint['types']
+        entity_marks = checkpoint['entities']
+        misses = checkpoint['misses']
+        series: Dict[str, PerfSeries] = {}
+        reported = set()
+
+        for entity_type in self.entity_types:
+            for start, end in self.windows(entity_type, now, checkpoint):
+                for entity in self.query(_to_datetime(start), _to_datetime(end), entity_types=[entity_type]):
+                    reported.add(entity.entity_ref_id)
+                    mark = entity_marks.get(entity.entity_ref_id, 0)
+                    keep = [i for i, x in enumerate(entity.timestamps) if x > mark]
+                    if not keep:
+                        continue
+
+                    merged = series.setdefault(entity.entity_ref_id,
+                                               PerfSeries(entity.entity_ref_id, array('d'),
+                                                          {x: array('d') for x in entity.metrics}))
+                    merged.timestamps.extend(entity.timestamps[i] for i in keep)
+                    for label, values in entity.metrics.items():
+                        merged.metrics.setdefault(label, array('d')).extend(values[i] for i in keep)
+
+                    # Each entity moves from its own newest sample, not the newest of the type.
+                    entity_marks[entity.entity_ref_id] = entity.timestamps[keep[-1]]
+
+                # Windows old enough to have all their samples are not requested again, even when empty.
+                type_marks[entity_type] = max(type_marks.get(entity_type, 0), min(end, now - PERF_SAMPLE_DELAY))
+
+        # Forget the entities that are gone for a few polls, or for longer than the back-fill limit.
+        for entity_ref_id, mark in list(entity_marks.items()):
+            if entity_ref_id in reported:
+                misses.pop(entity_ref_id, None)
+            elif entity_ref_id.split(':', 1)[0] in self.entity_types:
+                misses[entity_ref_id] = misses.get(entity_ref_id, 0) + 1
+            if misses.get(entity_ref_id, 0) >= self.max_misses or mark < now - self.max_backfill:
+                del entity_marks[entity_ref_id]
+                misses.pop(entity_ref_id, None)
+
+        self.checkpoint = checkpoint
+        self.__save_checkpoint()
+        return list(series.values())
@@ -0,0 +1,206 @@
+"""
+Per API call profiling of the vim and vsanHealth stubs of a session.
+
+The Profiler transport wraps the InvokeMethod of the stubs it is installed on and
+their connections, and records for every call its method, duration, the time
+spent serializing the request, on the wire (request sent to response read) and
+deserializing the response, and the bytes of the request and response bodies.
+The time of a run outside the API calls is the inventory walk and rendering.
+"""
+
+import dataclasses
+import importlib.util
+import json
+import threading
+import time
+
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from libs.transport import Response, Transport
+
+
+@dataclass
+class ApiCall:
+    __slots__ = ('method', 'thread', 'start', 'duration', 'serialize', 'wire', 'deserialize', 'sent', 'received',
+                 'error')
+    method: str
+    thread: str
+    start: float
+    duration: float
+    serialize: float
+    wire: float
+    deserialize: float
+    sent: int
+    received: int
+    error: Optional[str]
+
+
+class ProfilingConnection(object):
+    """ HTTP connection adding its wire time and bytes to the call in progress on its thread """
+
+    def __init__(self, connection, profiler: 'Profiler'):
+        self.connection = connection
+        self.profiler = profiler
+        self.sock = None
+        self.__sent_at = None
+
+    def request(self, method: str, url: str, body: bytes = None, headers: dict = None) -> None:
+        self.__sent_at = time.perf_counter()
+        call = self.profiler.current()
+        if call is not None:
+            call.serialize = self.__sent_at - self.profiler.local.started
+            call.sent += len(body or b'')
+        self.connection.request(method, url, body, headers or {})
+        self.sock = self.connection.sock
+
+    def getresponse(self) -> Response:
+        # The body is read here, so the deserialization does not include the transfer.
+        real = self.connection.getresponse()
+        body = real.read()
+        call = self.profiler.current()
+        if call is not None:
+            call.wire += time.perf_counter() - self.__sent_at
+            call.received += len(body)
+        return Response(real.status, real.reason, dict(real.getheaders()), body)
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class Profiler(Transport):
+    """Record every API call of the stubs, wrapping the 'inner' transport
+
+    On close, the calls are written to the JSON 'trace' file and, with 'otel', sent
+    as spans to the tracer provider configured for the OpenTelemetry API.
+    """
+
+    def __init__(self, inner: Transport = None, trace: str = None, otel: bool = False):
+        if otel:
+            try:
+                # The spans are sent on close, the module is only looked for here.
+                found = importlib.util.find_spec('opentelemetry.trace') is not None
+            except ImportError:
+                found = False
+            if not found:
+                raise ValueError('opentelemetry-api is required to send the API calls as spans')
+        self.inner = inner or Transport()
+        self.offline = self.inner.offline
+        self.vim_version = self.inner.vim_version
+        self.trace = trace
+        self.otel = otel
+        self.calls: List[ApiCall] = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.started = time.perf_counter()
+
+    def current(self) -> Optional[ApiCall]:
+        """ Call in progress on this thread """
+        return getattr(self.local, 'call', None)
+
+    def scheme(self, scheme: Callable) -> Callable:
+        return lambda host, **kwargs: ProfilingConnection(scheme(host, **kwargs), self)
+
+    def install(self, stub) -> None:
+        # The inner transport installs its own connection class, which is then wrapped.
+        self.inner.install(stub)
+        stub.scheme = self.scheme(stub.scheme)
+        stub.InvokeMethod = self.wrap(stub.InvokeMethod)
+
+    def wrap(self, invoke_method: Callable) -> Callable:
+        def invoke(mo, info, args, *rest, **kwargs):
+            call = ApiCall(method='{}.{}'.format(mo._wsdlName, info.wsdlName),
+                           thread=threading.current_thread().name,
+                           start=time.time(),
+                           duration=0.,
+                           serialize=0.,
+                           wire=0.,
+                           deserialize=0.,
+                           sent=0,
+                           received=0,
+                           error=None)
+            self.local.call = call
+            self.local.started = time.perf_counter()
+            try:
+                return invoke_method(mo, info, args, *rest, **kwargs)
+            except Exception as e:
+                call.error = type(e).__name__
+                raise
+            finally:
+                call.duration = time.perf_counter() - self.local.started
+                if call.received:
+                    call.deserialize = call.duration - call.serialize - call.wire
+                self.local.call = None
+                with self.lock:
+                    self.calls.append(call)
+        return invoke
+
+    def summary(self) -> Dict[str, dict]:
+        """ Calls, total and max duration, deserialization time and bytes per method """
+        methods = {}
+        with self.lock:
+            calls = list(self.calls)
+        for call in calls:
+            stats = methods.setdefault(call.method, {'calls': 0, 'errors': 0, 'total': 0., 'max': 0.,
+                                                     'deserialize': 0., 'sent': 0, 'received': 0})
+            stats['calls'] += 1
+            stats['errors'] += call.error is not None
+            stats['total'] += call.duration
+            stats['max'] = max(stats['max'], call.duration)
+            stats['deserialize'] += call.deserialize
+            stats['sent'] += call.sent
+            stats['received'] += call.received
+        return dict(sorted(methods.items(), key=lambda x: x[1]['total'], reverse=True))
+
+    def render_summary(self) -> None:
+        summary = self.summary()
+        print('\nAPI calls')
+        print('  {:<56} {:>6} {:>10} {:>10} {:>10} {:>12} {:>10} {:>12}'.format(
+            'Method', 'Calls', 'Total (s)', 'Mean (ms)', 'Max (ms)', 'Deser. (s)', 'Sent (KB)', 'Recv. (KB)'))
+        for method, stats in summary.items():
+            print('  {:<56} {:>6} {:>10.3f} {:>10.1f} {:>10.1f} {:>12.3f} {:>10.1f} {:>12.1f}'.format(
+                method, stats['calls'], stats['total'], stats['total'] / stats['calls'] * 1e3, stats['max'] * 1e3,
+                stats['deserialize'], stats['sent'] / 1024, stats['received'] / 1024))
+        api_time = sum(x['total'] for x in summary.values())
+        print('  Run: {:.3f} s, in API calls: {:.3f} s ({} calls, summed over the threads)'.format(
+            time.perf_counter() - self.started, api_time, sum(x['calls'] for x in summary.values())))
+
+    def save_trace(self) -> None:
+        with self.lock:
+            calls = [dataclasses.asdict(x) for x in self.calls]
+        with open(self.trace, 'w') as f:
+            json.dump({'calls': calls}, f, indent=1)
+
+    def send_spans(self) -> None:
+        """ Send the calls as spans of the OpenTelemetry tracer provider, when it was configured """
+        from opentelemetry import trace
+
+        tracer = trace.get_tracer(__name__)
+        with self.lock:
+            calls = list(self.calls)
+        for call in calls:
+            mo_type, method = call.method.split('.', 1)
+            span = tracer.start_span(call.method,
+                                     kind=trace.SpanKind.CLIENT,
+                                     start_time=int(call.start * 1e9),
+                                     attributes={'rpc.system': 'soap',
+                                                 'rpc.service': mo_type,
+                                                 'rpc.method': method,
+                                                 'thread.name': call.thread,
+                                                 'http.request.body.size': call.sent,
+                                                 'http.response.body.size': call.received,
+                                                 'vsan.serialize_seconds': call.serialize,
+                                                 'vsan.wire_seconds': call.wire,
+                                                 'vsan.deserialize_seconds': call.deserialize})
+            if call.error:
+                span.set_status(trace.Status(trace.StatusCode.ERROR, call.error))
+            span.end(end_time=int((call.start + call.duration) * 1e9))
+
+    def close(self) -> None:
+        try:
+            if self.trace:
+                self.save_trace()
+            if self.otel:
+                self.send_spans()
+        finally:
+            self.inner.close()
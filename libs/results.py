@@ -0,0 +1,203 @@
+"""
+Results of the VsanClusterCheck checks.
+
+The collect phase of a check extracts only the fields it renders from the
+pyVmomi DataObjects into these classes, so the DataObjects can be freed as
+soon as the check has collected its data.
+"""
+
+from array import array
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+@dataclass
+class SpaceUsage:
+    __slots__ = ('obj_type', 'used', 'reserved', 'overhead', 'thick')
+    obj_type: str
+    used: int
+    reserved: int
+    overhead: int
+    thick: int
+
+
+@dataclass
+class DataEfficiency:
+    __slots__ = ('metadata', 'logical', 'logical_used', 'physical', 'physical_used')
+    metadata: int
+    logical: int
+    logical_used: int
+    physical: int
+    physical_used: int
+
+
+@dataclass
+class CapacityResult:
+    __slots__ = ('host_name', 'cluster_name', 'total', 'free', 'committed', 'efficiency', 'space_usage')
+    host_name: str
+    cluster_name: str
+    total: int
+    free: int
+    committed: int
+    efficiency: Optional[DataEfficiency]
+    space_usage: List[SpaceUsage]
+
+
+@dataclass
+class HostStatus:
+    __slots__ = ('hostname', 'status')
+    hostname: str
+    status: Optional[str]
+
+
+@dataclass
+class ClusterStatus:
+    __slots__ = ('status', 'hosts')
+    status: Optional[str]
+    hosts: List[HostStatus]
+
+
+@dataclass
+class ClomdLiveness:
+    __slots__ = ('issue_found', 'hosts')
+    issue_found: Optional[bool]
+    hosts: List[HostStatus]
+
+
+@dataclass
+class DiskBalance:
+    __slots__ = ('uuid', 'fullness', 'variance')
+    uuid: str
+    fullness: int
+    variance: int
+
+
+@dataclass
+class PerfsvcHealth:
+    __slots__ = ('enough_free_space', 'stats_object_consistent', 'verbose_mode')
+    enough_free_space: Optional[bool]
+    stats_object_consistent: Optional[bool]
+    verbose_mode: Optional[bool]
+
+
+@dataclass
+class HealthResult:
+    __slots__ = ('host_name', 'cluster_name', 'from_cache', 'timestamp', 'cluster_status', 'clomd_liveness',
+                 'disk_balance', 'perfsvc_health')
+    host_name: str
+    cluster_name: str
+    from_cache: bool
+    timestamp: Optional[datetime]
+    cluster_status: Optional[ClusterStatus]
+    clomd_liveness: Optional[ClomdLiveness]
+    disk_balance: Optional[List[DiskBalance]]
+    perfsvc_health: Optional[PerfsvcHealth]
+
+
+@dataclass
+class HclController:
+    __slots__ = ('device_name', 'display_name', 'used_by_vsan', 'device_on_hcl', 'driver_name', 'driver_version',
+                 'driver_version_supported', 'driver_versions_on_hcl', 'fw_version', 'fw_version_supported',
+                 'fw_versions_on_hcl', 'tool_name', 'tool_version')
+    device_name: str
+    display_name: str
+    used_by_vsan: Optional[bool]
+    device_on_hcl: Optional[bool]
+    driver_name: str
+    driver_version: str
+    driver_version_supported: Optional[bool]
+    driver_versions_on_hcl: List[str]
+    fw_version: str
+    fw_version_supported: Optional[bool]
+    fw_versions_on_hcl: List[str]
+    tool_name: str
+    tool_version: str
+
+
+@dataclass
+class HclHost:
+    __slots__ = ('hostname', 'release_name', 'controllers')
+    hostname: str
+    release_name: str
+    controllers: List[HclController]
+
+
+@dataclass
+class HclResult:
+    __slots__ = ('host_name', 'cluster_name', 'from_cache', 'timestamp', 'db_age_health', 'db_last_update', 'hosts')
+    host_name: str
+    cluster_name: str
+    from_cache: bool
+    timestamp: Optional[datetime]
+    db_age_health: Optional[str]
+    db_last_update: Optional[datetime]
+    hosts: List[HclHost]
+
+
+@dataclass
+class ObjectHealthCount:
+    __slots__ = ('health', 'num_objects')
+    health: str
+    num_objects: int
+
+
+@dataclass
+class VsanObject:
+    __slots__ = ('vm_name', 'obj_type', 'uuid', 'health', 'compliance')
+    vm_name: str
+    obj_type: str
+    uuid: str
+    health: Optional[str]
+    compliance: Optional[str]
+
+
+@dataclass
+class VmsResult:
+    __slots__ = ('host_name', 'cluster_name', 'health_counts', 'objects')
+    host_name: str
+    cluster_name: str
+    health_counts: List[ObjectHealthCount]
+    objects: List[VsanObject]
+
+
+@dataclass
+class HostHistory:
+    __slots__ = ('hostname', 'timestamps', 'metrics', 'percentiles')
+    hostname: str
+    timestamps: List[Optional[datetime]]
+    metrics: Dict[str, array]
+    percentiles: Dict[str, Dict[str, float]]
+
+
+@dataclass
+class HistoryResult:
+    __slots__ = ('host_name', 'cluster_name', 'test_name', 'hosts')
+    host_name: str
+    cluster_name: str
+    test_name: str
+    hosts: List[HostHistory]
+
+
+@dataclass
+class ResyncObject:
+    __slots__ = ('uuid', 'bytes_to_sync', 'eta', 'reasons')
+    uuid: str
+    bytes_to_sync: int
+    eta: Optional[int]
+    reasons: List[str]
+
+
+@dataclass
+class ResyncResult:
+    __slots__ = ('host_name', 'cluster_name', 'objects_to_sync', 'bytes_to_sync', 'eta', 'active_objects',
+                 'queued_objects', 'suspended_objects', 'objects')
+    host_name: str
+    cluster_name: str
+    objects_to_sync: int
+    bytes_to_sync: int
+    eta: Optional[int]
+    active_objects: Optional[int]
+    queued_objects: Optional[int]
+    suspended_objects: Optional[int]
+    objects: List[ResyncObject]
@@ -0,0 +1,103 @@
+"""
+Adaptive resync monitor of a vSAN cluster, e.g. during a host maintenance.
+
+The resync status is polled every 'min_interval' seconds while the backlog of
+objects and bytes to sync changes, and the interval is multiplied by 'backoff'
+at each poll where it does not, up to 'max_interval' seconds. A cluster which
+is not resyncing costs a call every few minutes, and a busy one is followed
+closely. The sync rate is an exponentially weighted average of the decrease of
+the bytes to sync between polls, and the ETA is the bytes left at that rate.
+"""
+
+import time
+
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional
+
+from libs.results import ResyncResult
+
+# Seconds between two polls while the backlog moves, and at most while it does not
+RESYNC_MIN_INTERVAL = 5
+RESYNC_MAX_INTERVAL = 120
+
+# Factor of the interval after a poll without change
+RESYNC_BACKOFF = 2
+
+# Weight of the last poll in the average sync rate
+RESYNC_RATE_WEIGHT = 0.3
+
+
+@dataclass
+class ResyncProgress:
+    __slots__ = ('timestamp', 'result', 'rate', 'eta', 'interval')
+    timestamp: float
+    result: ResyncResult
+    # Average bytes synced per second, None until two polls
+    rate: Optional[float]
+    # Seconds until the bytes to sync are synced at the rate, None without a rate
+    eta: Optional[float]
+    # Seconds until the next poll
+    interval: float
+
+
+class ResyncMonitor(object):
+    """Resync status poller with an interval adapted to the resync activity
+
+    'query' is called without arguments and returns a ResyncResult, e.g.
+    VsanClusterCheck.collect_resync_status.
+    """
+
+    def __init__(self,
+                 query: Callable[[], ResyncResult],
+                 min_interval: float = RESYNC_MIN_INTERVAL,
+                 max_interval: float = RESYNC_MAX_INTERVAL,
+                 backoff: float = RESYNC_BACKOFF,
+                 rate_weight: float = RESYNC_RATE_WEIGHT):
+        self.query = query
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.backoff = backoff
+        self.rate_weight = rate_weight
+        self.interval = min_interval
+        self.rate = None
+        self.last: Optional[ResyncProgress] = None
+
+    def update(self, result: ResyncResult, timestamp: float = None) -> ResyncProgress:
+        """ Progress of a resync status against the previous one, and interval of the next poll """
+
+        timestamp = timestamp if timestamp is not None else time.monotonic()
+        last = self.last.result if self.last else None
+        if last is None or (result.bytes_to_sync, result.objects_to_sync) != (last.bytes_to_sync,
+                                                                              last.objects_to_sync):
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+
+        if last is not None and timestamp > self.last.timestamp:
+            # New objects to sync raise the bytes to sync, they count as no progress.
+            rate = max(last.bytes_to_sync - result.bytes_to_sync, 0) / (timestamp - self.last.timestamp)
+            self.rate = rate if self.rate is None else self.rate_weight * rate + (1 - self.rate_weight) * self.rate
+
+        if not result.bytes_to_sync:
+            eta = 0.
+        elif self.rate:
+            eta = result.bytes_to_sync / self.rate
+        else:
+            eta = None
+
+        self.last = ResyncProgress(timestamp=timestamp, result=result, rate=self.rate, eta=eta,
+                                   interval=self.interval)
+        return self.last
+
+    def poll(self) -> ResyncProgress:
+        return self.update(self.query())
+
+    def run(self, until_done: bool = True) -> Iterator[ResyncProgress]:
+        """ Poll until there are no objects to sync, or forever, sleeping the adapted interval in between """
+        while True:
+            progress = self.poll()
+            yield progress
+            if until_done and not progress.result.objects_to_sync:
+                return
+            # The time of the query counts in the interval.
+            time.sleep(max(progress.timestamp + progress.interval - time.monotonic(), 0))
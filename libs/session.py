@@ -0,0 +1,187 @@
+import ssl
+import threading
+
+from typing import Dict, Optional, Tuple
+
+from pyVim.connect import SmartConnect, Disconnect
+from pyVmomi import SoapStubAdapter, VmomiSupport, vim
+
+from libs import vsanapiutils
+from libs.taskwaiter import TaskWaiter
+from libs.transport import Transport
+from libs.versioncache import get_vmodl_version
+
+# Seconds between two session keep-alive checks of the pool
+KEEP_ALIVE_INTERVAL = 300
+
+
+class VsanSession(object):
+    """ A logged in vCenter session with the vsanHealth stub sharing its cookie """
+
+    def __init__(self,
+                 host: str,
+                 user: str,
+                 password: str,
+                 port: int = 443,
+                 context: ssl.SSLContext = None,
+                 version_cache: str = None,
+                 transport: Transport = None):
+        self.host_name = host
+        self.port = int(port)
+        self.user = user
+        self.password = password
+        self.ssl_context = context
+        self.transport = transport
+        self.lock = threading.Lock()
+
+        if transport is not None and transport.offline:
+            # There is no vCenter to negotiate the API version with, the transport answers the calls.
+            stub = SoapStubAdapter(host=host,
+                                   port=self.port,
+                                   version=transport.vim_version or VmomiSupport.newestVersions.Get('vim'),
+                                   sslContext=context)
+            transport.install(stub)
+            self.si = vim.ServiceInstance('ServiceInstance', stub)
+        else:
+            self.si = SmartConnect(host=host,
+                                   user=user,
+                                   pwd=password,
+                                   port=self.port,
+                                   sslContext=context)
+            if self.si and transport is not None:
+                # noinspection PyProtectedMember
+                transport.install(self.si._stub)
+
+        if not self.si:
+            raise ValueError('Could not connect to the specified host using specified username and password')
+
+        # To avoid multiple code warnings about private member access
+        # noinspection PyProtectedMember
+        self.si_stub = self.si._stub
+
+        # Detecting version
+        self.about_info = self.si.content.about
+        if int(self.about_info.apiVersion.split('.')[0]) < 6:
+            raise ValueError('Host version {} (lower than 6.0) is not supported.'.format(self.about_info.apiVersion))
+
+        # Get VMODL API version, cached per vCenter
+        self.api_version = get_vmodl_version(self.si, cache_file=version_cache)
+
+        # Check if host is VirtualCenter
+        # Note: This sample only assumes connection to vCenter instances
+        if self.about_info.apiType != 'VirtualCenter':
+            raise ValueError('Host {} is not a VirtualCenter.'.format(self.host_name))
+
+        self.__vc_mos = None
+        self.__vc_mos_cookie = None
+        self.__task_waiter = None
+
+    @property
+    def vc_mos(self) -> dict:
+        """ vCenter vSAN Managed Objects, rebuilt when the session cookie changes """
+        with self.lock:
+            if self.__vc_mos is None or self.__vc_mos_cookie != self.si_stub.cookie:
+                self.__vc_mos = self.get_vc_mos()
+                self.__vc_mos_cookie = self.si_stub.cookie
+            return self.__vc_mos
+
+    def get_vc_mos(self) -> dict:
+        """ New vCenter vSAN Managed Objects on their own vsanHealth stub sharing the session cookie """
+        vc_mos = vsanapiutils.GetVsanVcMos(self.si_stub,
+                                           context=self.ssl_context,
+                                           version=self.api_version)
+        if self.transport is not None:
+            # The Managed Objects share a single stub.
+            # noinspection PyProtectedMember
+            self.transport.install(next(iter(vc_mos.values()))._stub)
+        return vc_mos
+
+    @property
+    def task_waiter(self) -> TaskWaiter:
+        """ Waiter of the tasks of the session, shared by its checkers """
+        with self.lock:
+            if self.__task_waiter is None:
+                self.__task_waiter = TaskWaiter(self.si)
+            return self.__task_waiter
+
+    def keep_alive(self) -> None:
+        """ Touch the session and log in again on the same stub if it expired """
+        with self.lock:
+            session_manager = self.si.content.sessionManager
+            if session_manager.currentSession is None:
+                session_manager.Login(userName=self.user, password=self.password)
+
+    def close(self) -> None:
+        try:
+            if self.__task_waiter is not None:
+                self.__task_waiter.close()
+            Disconnect(self.si)
+        finally:
+            if self.transport is not None:
+                self.transport.close()
+
+
+class SessionPool(object):
+    """Sessions shared by the checkers, keyed by (host, port, user)
+
+    A background thread keeps the sessions alive and logs in again when one expired.
+    """
+
+    def __init__(self, keep_alive_interval: int = KEEP_ALIVE_INTERVAL):
+        self.keep_alive_interval = keep_alive_interval
+        self.sessions: Dict[Tuple[str, int, str], VsanSession] = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def get(self,
+            host: str,
+            user: str,
+            password: str,
+            port: int = 443,
+            context: ssl.SSLContext = None,
+            version_cache: str = None,
+            transport: Transport = None) -> VsanSession:
+        key = (host, int(port), user)
+        with self.lock:
+            session = self.sessions.get(key)
+            if session is None:
+                session = VsanSession(host=host,
+                                      user=user,
+                                      password=password,
+                                      port=port,
+                                      context=context,
+                                      version_cache=version_cache,
+                                      transport=transport)
+                self.sessions[key] = session
+            if self.thread is None and self.keep_alive_interval:
+                self.thread = threading.Thread(target=self.__keep_alive, name='session-keep-alive', daemon=True)
+                self.thread.start()
+        session.keep_alive()
+        return session
+
+    def __keep_alive(self) -> None:
+        while not self.stop_event.wait(self.keep_alive_interval):
+            with self.lock:
+                sessions = list(self.sessions.values())
+            for session in sessions:
+                try:
+                    session.keep_alive()
+                except Exception:
+                    # The next get() of this session logs in again or raises.
+                    pass
+
+    def close(self) -> None:
+        """ Stop the keep-alive thread and log out of every session """
+        self.stop_event.set()
+        with self.lock:
+            sessions = list(self.sessions.values())
+            self.sessions.clear()
+        for session in sessions:
+            session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
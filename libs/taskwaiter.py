@@ -0,0 +1,233 @@
+"""
+Waiter of any number of vCenter tasks, including the vSAN tasks converted with
+vsanapiutils.ConvertVsanTaskToVcTask, over a single PropertyCollector filter.
+
+The tracked tasks are the members of a ListView, and one background thread waits
+for the changes of their state and progress with WaitForUpdatesEx. Each task gets
+a concurrent.futures.Future resolved with its result, or its error, and can have
+a deadline and a progress callback.
+"""
+
+import logging
+import math
+import threading
+import time
+
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pyVmomi import vim, vmodl
+
+# Maximum seconds of a WaitForUpdatesEx call, the deadlines are checked at least this often
+MAX_WAIT_SECONDS = 30
+
+# Task properties followed by the filter
+TASK_PROPERTIES = ['info.state', 'info.progress', 'info.result', 'info.error']
+
+ProgressCallback = Callable[[vim.Task, int], None]
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _TrackedTask:
+    __slots__ = ('task', 'future', 'deadline', 'on_progress', 'result', 'error')
+    task: vim.Task
+    future: Future
+    deadline: Optional[float]
+    on_progress: Optional[ProgressCallback]
+    result: object
+    error: Optional[vmodl.MethodFault]
+
+
+class TaskWaiter(object):
+    """Wait for vCenter tasks of a session, multiplexed over one PropertyCollector filter
+
+    The filter is created on a PropertyCollector of its own with the first task and
+    the background thread only calls vCenter while tasks are pending. A task whose
+    deadline passes fails its future with TimeoutError and is no longer tracked, it
+    keeps running in vCenter. An error of a progress callback is logged, it does not
+    stop the waiter.
+    """
+
+    def __init__(self, si: vim.ServiceInstance, max_wait_seconds: int = MAX_WAIT_SECONDS):
+        self.si = si
+        self.max_wait_seconds = max_wait_seconds
+        self.condition = threading.Condition()
+        self.pending: Dict[str, _TrackedTask] = {}
+        self.collector: Optional[vmodl.query.PropertyCollector] = None
+        self.view: Optional[vim.view.ListView] = None
+        self.version = ''
+        self.closed = False
+        self.thread: Optional[threading.Thread] = None
+
+    def __create_filter(self) -> None:
+        content = self.si.content
+        self.collector = content.propertyCollector.CreatePropertyCollector()
+        self.view = content.viewManager.CreateListView(obj=[])
+
+        TraversalSpec = vmodl.query.PropertyCollector.TraversalSpec
+        view_to_task = TraversalSpec(name='viewToTask', type=vim.view.ListView, path='view', skip=False)
+        obj_spec = vmodl.query.PropertyCollector.ObjectSpec(obj=self.view, skip=True, selectSet=[view_to_task])
+        prop_spec = vmodl.query.PropertyCollector.PropertySpec(type=vim.Task, pathSet=TASK_PROPERTIES)
+        filter_spec = vmodl.query.PropertyCollector.FilterSpec(objectSet=[obj_spec], propSet=[prop_spec])
+        self.collector.CreateFilter(filter_spec, partialUpdates=False)
+        self.version = ''
+
+    def submit_many(self,
+                    tasks: List[vim.Task],
+                    timeout: float = None,
+                    on_progress: ProgressCallback = None) -> List[Future]:
+        """ Track the tasks, returns their futures in the same order """
+
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        futures = []
+        added = []
+        with self.condition:
+            if self.closed:
+                raise RuntimeError('The task waiter is closed')
+            if self.collector is None:
+                self.__create_filter()
+            view = self.view
+            for task in tasks:
+                tracked = self.pending.get(task._moId)
+                if tracked is None:
+                    tracked = _TrackedTask(task=task, future=Future(), deadline=deadline, on_progress=on_progress,
+                                           result=None, error=None)
+                    self.pending[task._moId] = tracked
+                    added.append(task)
+                futures.append(tracked.future)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.__run, name='task-waiter', daemon=True)
+                self.thread.start()
+            self.condition.notify_all()
+
+        if added:
+            # The tasks enter the filter, their current state is the next update.
+            view.ModifyListView(add=added)
+        return futures
+
+    def submit(self, task: vim.Task, timeout: float = None, on_progress: ProgressCallback = None) -> Future:
+        """ Track a task, the future is resolved with the task result or fails with its error """
+        return self.submit_many([task], timeout=timeout, on_progress=on_progress)[0]
+
+    def submit_async(self, task: vim.Task, timeout: float = None,
+                     on_progress: ProgressCallback = None) -> Awaitable:
+        """ Awaitable of the task result, for the running event loop """
+        # asyncio is imported on use, it is not needed by the scripts and slows their startup.
+        import asyncio
+        return asyncio.wrap_future(self.submit(task, timeout=timeout, on_progress=on_progress))
+
+    def wait(self, tasks: List[vim.Task], timeout: float = None) -> list:
+        """ Wait for the tasks and return their results, raises the error of the first failed task """
+        return [x.result() for x in self.submit_many(tasks, timeout=timeout)]
+
+    def __wait_seconds(self) -> int:
+        deadlines = [x.deadline for x in self.pending.values() if x.deadline is not None]
+        if not deadlines:
+            return self.max_wait_seconds
+        return max(0, min(self.max_wait_seconds, math.ceil(min(deadlines) - time.monotonic())))
+
+    def __apply(self, update_set: vmodl.query.PropertyCollector.UpdateSet) -> tuple:
+        """ Update the tracked tasks, returns the progress callbacks to call and the finished tasks """
+
+        progress = []
+        finished = []
+        for filter_update in update_set.filterSet or []:
+            for obj_update in filter_update.objectSet or []:
+                tracked = self.pending.get(obj_update.obj._moId)
+                if tracked is None:
+                    continue
+                state = None
+                for change in obj_update.changeSet or []:
+                    value = change.val if change.op == 'assign' else None
+                    if change.name == 'info.state':
+                        state = value
+                    elif change.name == 'info.progress' and value is not None and tracked.on_progress:
+                        progress.append((tracked, value))
+                    elif change.name == 'info.result':
+                        tracked.result = value
+                    elif change.name == 'info.error':
+                        tracked.error = value
+                if state in (vim.TaskInfo.State.success, vim.TaskInfo.State.error):
+                    del self.pending[obj_update.obj._moId]
+                    finished.append((tracked, state))
+        return progress, finished
+
+    def __expire(self) -> List[_TrackedTask]:
+        now = time.monotonic()
+        expired = [x for x in self.pending.values() if x.deadline is not None and x.deadline <= now]
+        for tracked in expired:
+            del self.pending[tracked.task._moId]
+        return expired
+
+    def __run(self) -> None:
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+                collector, view, version = self.collector, self.view, self.version
+                wait_seconds = self.__wait_seconds()
+
+            options = vmodl.query.PropertyCollector.WaitOptions(maxWaitSeconds=wait_seconds)
+            try:
+                update_set = collector.WaitForUpdatesEx(version=version, options=options)
+            except Exception as e:
+                # The collector is gone, e.g. with an expired session, the pending tasks fail with the error.
+                with self.condition:
+                    if self.closed:
+                        return
+                    failed = list(self.pending.values())
+                    self.pending.clear()
+                    self.collector = self.view = None
+                for tracked in failed:
+                    tracked.future.set_exception(e)
+                continue
+
+            with self.condition:
+                progress, finished = self.__apply(update_set) if update_set else ([], [])
+                if update_set:
+                    self.version = update_set.version
+                expired = self.__expire()
+
+            for tracked, value in progress:
+                try:
+                    tracked.on_progress(tracked.task, value)
+                except Exception:
+                    logger.exception('Progress callback of task %s failed', tracked.task._moId)
+            for tracked, state in finished:
+                if state == vim.TaskInfo.State.success:
+                    tracked.future.set_result(tracked.result)
+                else:
+                    tracked.future.set_exception(tracked.error or vmodl.fault.SystemError(reason='Task failed'))
+            for tracked in expired:
+                tracked.future.set_exception(TimeoutError('Task {} did not complete before its deadline'.format(
+                    tracked.task._moId)))
+
+            done = [x.task for x, _ in finished] + [x.task for x in expired]
+            if done:
+                try:
+                    view.ModifyListView(remove=done)
+                except Exception:
+                    # The tasks left in the view are no longer pending, their updates are ignored.
+                    logger.exception('Removal of %d tasks from the view failed', len(done))
+
+    def close(self) -> None:
+        """ Stop tracking, the pending futures are cancelled, and destroy the collector and view """
+        with self.condition:
+            self.closed = True
+            pending = list(self.pending.values())
+            self.pending.clear()
+            collector, view = self.collector, self.view
+            self.collector = self.view = None
+            self.condition.notify_all()
+        for tracked in pending:
+            tracked.future.cancel()
+        if collector is not None:
+            # Destroying the collector ends the WaitForUpdatesEx call in progress.
+            collector.Destroy()
+        if view is not None:
+            view.Destroy()
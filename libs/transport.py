@@ -0,0 +1,293 @@
+import gzip
+import hashlib
+import http.client
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import zlib
+
+from typing import Callable, Dict, List, Optional
+
+# Name of the SOAP operation in a request body, the first element of the SOAP body
+_OPERATION_RE = re.compile(rb'<(?:[\w-]+:)?Body[^>]*>\s*<(?:[\w-]+:)?([\w]+)')
+
+# Response headers kept in a cassette. The session cookie of set-cookie and the auth
+# headers are credentials, they are not written to disk and the replay does not need them.
+RECORDED_HEADERS = ['content-type']
+
+
+def get_operation(body: bytes) -> str:
+    """ SOAP operation of a request body, the empty string for a GET """
+    match = _OPERATION_RE.search(body or b'')
+    return match.group(1).decode() if match else ''
+
+
+def decode_body(body: bytes, encoding: str) -> bytes:
+    """ Body of a response with the gzip or deflate content-encoding, as SoapStubAdapter reads it """
+    encoding = (encoding or 'identity').lower()
+    if encoding == 'gzip':
+        return gzip.decompress(body)
+    if encoding == 'deflate':
+        # Servers send either zlib-wrapped or raw deflate data.
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+    return body
+
+
+def get_request_key(method: str, path: str, body: bytes) -> str:
+    return hashlib.sha256(b'\0'.join([method.encode(), path.encode(), body or b''])).hexdigest()
+
+
+class Response(object):
+    """ Stand-in for http.client.HTTPResponse, as read by SoapStubAdapter """
+
+    def __init__(self, status: int, reason: str, headers: Dict[str, str], body: bytes):
+        self.status = status
+        self.reason = reason
+        self.headers = {k.lower(): v for k, v in headers.items()}
+        self.fp = io.BytesIO(body)
+
+    def getheader(self, name: str, default: str = None) -> Optional[str]:
+        return self.headers.get(name.lower(), default)
+
+    def read(self, amt: int = -1) -> bytes:
+        return self.fp.read(amt)
+
+
+class Cassette(object):
+    """Recorded HTTP exchanges of the vim and vsanHealth endpoints, in a JSON file
+
+    An exchange is looked up by its request, method, path and body. When the same
+    request was recorded several times, the responses are replayed in order and the
+    last one is repeated. A request whose body differs from the recorded ones, e.g. a
+    perf query over another time window, gets the responses of the same SOAP
+    operation on the same path.
+    """
+
+    def __init__(self, path: str, vim_version: str = None):
+        self.path = path
+        self.vim_version = vim_version
+        self.exchanges: List[dict] = []
+        self.lock = threading.Lock()
+        self.__replayed: Dict[str, int] = {}
+
+    @classmethod
+    def load(cls, path: str) -> 'Cassette':
+        with open(path) as f:
+            data = json.load(f)
+        cassette = cls(path, vim_version=data.get('vim_version'))
+        cassette.exchanges = data['exchanges']
+        return cassette
+
+    def save(self) -> None:
+        # Write to a temporary file and rename it so a crash never leaves a partial cassette.
+        with self.lock:
+            data = {'vim_version': self.vim_version, 'exchanges': self.exchanges}
+        fd, path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)))
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=1)
+        os.replace(path, self.path)
+
+    def record(self, method: str, path: str, body: bytes, response: Response, response_body: bytes) -> None:
+        exchange = {'key': get_request_key(method, path, body),
+                    'method': method,
+                    'path': path,
+                    'operation': get_operation(body),
+                    'status': response.status,
+                    'reason': response.reason,
+                    'headers': {k: v for k, v in response.headers.items() if k in RECORDED_HEADERS},
+                    'body': response_body.decode('utf-8')}
+        with self.lock:
+            self.exchanges.append(exchange)
+
+    def replay(self, method: str, path: str, body: bytes) -> Response:
+        key = get_request_key(method, path, body)
+        operation = get_operation(body)
+        with self.lock:
+            matches = [x for x in self.exchanges if x['key'] == key]
+            if not matches:
+                key = '{} {} {}'.format(method, path, operation)
+                matches = [x for x in self.exchanges
+                           if x['method'] == method and x['path'] == path and x['operation'] == operation]
+            if not matches:
+                raise http.client.HTTPException('No recorded exchange for {} {} {}'.format(method, path, operation))
+            index = self.__replayed.get(key, 0)
+            self.__replayed[key] = index + 1
+        exchange = matches[min(index, len(matches) - 1)]
+        return Response(exchange['status'], exchange['reason'], exchange['headers'], exchange['body'].encode('utf-8'))
+
+
+class RecordingConnection(object):
+    """ HTTP connection recording its exchanges to a cassette """
+
+    def __init__(self, connection, cassette: Cassette):
+        self.connection = connection
+        self.cassette = cassette
+        self.sock = None
+        self.__request = None
+
+    def request(self, method: str, url: str, body: bytes = None, headers: dict = None) -> None:
+        self.__request = (method, url, body)
+        self.connection.request(method, url, body, headers or {})
+        self.sock = self.connection.sock
+
+    def getresponse(self) -> Response:
+        real = self.connection.getresponse()
+        body = real.read()
+        response = Response(real.status, real.reason, dict(real.getheaders()), body)
+        # The stub accepts compressed responses, the cassette keeps them decompressed and
+        # without their content-encoding, so the replay serves them as identity.
+        self.cassette.record(*self.__request, response=response,
+                             response_body=decode_body(body, response.getheader('content-encoding')))
+        return response
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class CountingConnection(object):
+    """ HTTP connection adding the bytes of the request and response bodies to a ByteCounter """
+
+    def __init__(self, connection, counter: 'ByteCounter'):
+        self.connection = connection
+        self.counter = counter
+        self.sock = None
+
+    def request(self, method: str, url: str, body: bytes = None, headers: dict = None) -> None:
+        self.counter.add(sent=len(body or b''))
+        self.connection.request(method, url, body, headers or {})
+        self.sock = self.connection.sock
+
+    def getresponse(self) -> Response:
+        real = self.connection.getresponse()
+        body = real.read()
+        self.counter.add(received=len(body))
+        return Response(real.status, real.reason, dict(real.getheaders()), body)
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class ReplayConnection(object):
+    """ HTTP connection answering the requests from a cassette """
+
+    sock = None
+
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+        self.__response = None
+
+    def request(self, method: str, url: str, body: bytes = None, headers: dict = None) -> None:
+        self.__response = self.cassette.replay(method, url, body)
+
+    def getresponse(self) -> Response:
+        return self.__response
+
+    def close(self) -> None:
+        pass
+
+
+class Transport(object):
+    """HTTP transport of the pyVmomi SoapStubAdapters of a session
+
+    The transport replaces the connection class ('scheme') of the stubs it is
+    installed on. An offline transport needs no vCenter, the session does not go
+    through SmartConnect and uses 'vim_version'.
+    """
+
+    offline = False
+    vim_version: Optional[str] = None
+
+    def scheme(self, scheme: Callable) -> Callable:
+        """ Connection class replacing the 'scheme' connection class of a stub """
+        return scheme
+
+    def install(self, stub) -> None:
+        stub.DropConnections()
+        stub.scheme = self.scheme(stub.scheme)
+
+    def close(self) -> None:
+        pass
+
+
+class Redirector(Transport):
+    """ Send every request over plain HTTP to 'address', e.g. a libs.fakevcenter server """
+
+    offline = True
+
+    def __init__(self, address: str, vim_version: str = None):
+        self.address = address
+        self.vim_version = vim_version
+
+    def scheme(self, scheme: Callable) -> Callable:
+        return lambda host, **kwargs: http.client.HTTPConnection(self.address)
+
+
+class Recorder(Transport):
+    """ Record the exchanges of the stubs to a cassette file, saved when the transport is closed """
+
+    def __init__(self, path: str, inner: Transport = None):
+        self.inner = inner or Transport()
+        self.offline = self.inner.offline
+        self.vim_version = self.inner.vim_version
+        self.cassette = Cassette(path)
+
+    def scheme(self, scheme: Callable) -> Callable:
+        inner_scheme = self.inner.scheme(scheme)
+        return lambda host, **kwargs: RecordingConnection(inner_scheme(host, **kwargs), self.cassette)
+
+    def install(self, stub) -> None:
+        self.cassette.vim_version = self.cassette.vim_version or stub.version
+        super().install(stub)
+
+    def close(self) -> None:
+        try:
+            self.cassette.save()
+        finally:
+            self.inner.close()
+
+
+class ByteCounter(Transport):
+    """ Count the bytes of the request and response bodies of the stubs, compressed responses as received """
+
+    def __init__(self, inner: Transport = None):
+        self.inner = inner or Transport()
+        self.offline = self.inner.offline
+        self.vim_version = self.inner.vim_version
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.received = 0
+
+    def scheme(self, scheme: Callable) -> Callable:
+        inner_scheme = self.inner.scheme(scheme)
+        return lambda host, **kwargs: CountingConnection(inner_scheme(host, **kwargs), self)
+
+    def add(self, sent: int = 0, received: int = 0) -> None:
+        with self.lock:
+            self.sent += sent
+            self.received += received
+
+    def reset(self) -> None:
+        with self.lock:
+            self.sent = self.received = 0
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+class Replayer(Transport):
+    """ Answer the requests of the stubs from a cassette file recorded by Recorder """
+
+    offline = True
+
+    def __init__(self, path: str):
+        self.cassette = Cassette.load(path)
+        self.vim_version = self.cassette.vim_version
+
+    def scheme(self, scheme: Callable) -> Callable:
+        return lambda host, **kwargs: ReplayConnection(self.cassette)
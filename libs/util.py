@@ -11,6 +11,18 @@ def convert_bytes(nb_bytes: int) -> str:
     return '%s %s' % (f, suffixes[i])
 
 
+def convert_seconds(seconds: float) -> str:
+    if seconds is None:
+        return 'unknown'
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return '%dh %02dm' % (hours, minutes)
+    if minutes:
+        return '%dm %02ds' % (minutes, seconds)
+    return '%ds' % seconds
+
+
 def print_green(string: str) -> str:
     return '%s%s%s' % (fg('green'), string, attr('reset'))
 
@@ -0,0 +1,104 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+from typing import Dict, Optional, Tuple
+from xml.dom import minidom
+
+from pyVmomi import vim, VmomiSupport
+
+from libs import vsanapiutils
+
+VSAN_SERVICE_VERSIONS_PATH = '/sdk/vsanServiceVersions.xml'
+
+# Seconds a negotiated VMODL version is reused before it is fetched again
+VERSION_CACHE_TTL = 24 * 3600
+
+# In memory cache: (vCenter host, instance UUID) -> (timestamp, version)
+_cache: Dict[Tuple[str, str], Tuple[float, str]] = {}
+_cache_lock = threading.Lock()
+
+
+def _cache_key(si: vim.ServiceInstance) -> Tuple[str, str]:
+    # noinspection PyProtectedMember
+    return si._stub.host, si.content.about.instanceUuid
+
+
+def _read_cache_file(cache_file: str) -> Dict[str, dict]:
+    try:
+        with open(cache_file) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_cache_file(cache_file: str, key: Tuple[str, str], timestamp: float, version: str) -> None:
+    entries = _read_cache_file(cache_file)
+    entries['/'.join(key)] = {'timestamp': timestamp, 'version': version}
+
+    # Write to a temporary file and rename it so concurrent readers never see a partial file.
+    fd, path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(cache_file)))
+    with os.fdopen(fd, 'w') as f:
+        json.dump(entries, f, indent=2, sort_keys=True)
+    os.replace(path, cache_file)
+
+
+def fetch_vmodl_version(si: vim.ServiceInstance) -> Optional[str]:
+    """ Get the vSAN VMODL version using a pooled connection of the vCenter session stub """
+
+    # noinspection PyProtectedMember
+    stub = si._stub
+    conn = stub.GetConnection()
+    try:
+        conn.request('GET', VSAN_SERVICE_VERSIONS_PATH)
+        response = conn.getresponse()
+        body = response.read()
+    except Exception:
+        conn.close()
+        raise
+    stub.ReturnConnection(conn)
+
+    if response.status != 200:
+        raise ValueError('{} returned HTTP status {}'.format(VSAN_SERVICE_VERSIONS_PATH, response.status))
+    return vsanapiutils.GetVmodlVersionFromXml(minidom.parseString(body))
+
+
+def get_vmodl_version(si: vim.ServiceInstance,
+                      cache_file: Optional[str] = None,
+                      ttl: int = VERSION_CACHE_TTL) -> str:
+    """Get the latest vSAN VMODL version supported by the vCenter
+
+    The version is cached in memory, and in the JSON 'cache_file' when set, keyed
+    by vCenter host and instance UUID. Failed fetches fall back to the newest vim
+    version and are not cached.
+    """
+
+    key = _cache_key(si)
+    now = time.time()
+
+    with _cache_lock:
+        entry = _cache.get(key)
+    if entry and now - entry[0] < ttl:
+        return entry[1]
+
+    if cache_file:
+        file_entry = _read_cache_file(cache_file).get('/'.join(key))
+        if file_entry and now - file_entry['timestamp'] < ttl:
+            with _cache_lock:
+                _cache[key] = (file_entry['timestamp'], file_entry['version'])
+            return file_entry['version']
+
+    try:
+        version = fetch_vmodl_version(si)
+    except Exception:
+        version = None
+    if not version:
+        return VmomiSupport.newestVersions.Get('vim')
+
+    with _cache_lock:
+        _cache[key] = (now, version)
+    if cache_file:
+        _write_cache_file(cache_file, key, now, version)
+    return version
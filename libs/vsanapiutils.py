@@ -14,7 +14,9 @@ import ssl
 from urllib.request import urlopen
 from xml.dom import minidom
 
-from pyVmomi import vim, vmodl, SoapStubAdapter, VmomiSupport
+from pyVmomi import vim, SoapStubAdapter, VmomiSupport
+
+from libs.taskwaiter import TaskWaiter
 # Import the vSAN API python bindings
 
 VSAN_API_VC_SERVICE_ENDPOINT = '/vsanHealth'
@@ -173,50 +175,29 @@ def ConvertVsanTaskToVcTask(vsanTask, vcStub):
 
 
 # Wait for the vCenter task and returns after tasks are completed.
-def WaitForTasks(tasks, si):
-    pc = si.content.propertyCollector
-    taskList = [str(task) for task in tasks]
-
-    # Create filter
-    objSpecs = [vmodl.query.PropertyCollector.ObjectSpec(obj=task)
-                for task in tasks]
-    propSpec = vmodl.query.PropertyCollector.PropertySpec(
-        type=vim.Task, pathSet=[], all=True)
-    filterSpec = vmodl.query.PropertyCollector.FilterSpec()
-    filterSpec.objectSet = objSpecs
-    filterSpec.propSet = [propSpec]
-    filter = pc.CreateFilter(filterSpec, True)
-
+# The first error of a failed task is raised. The tasks are tracked by a
+# libs.taskwaiter.TaskWaiter, use one directly for timeouts, futures and
+# progress callbacks.
+def WaitForTasks(tasks, si, timeout=None):
+    waiter = TaskWaiter(si)
     try:
-        version, state = None, None
-
-        # Loop looking for updates till the state moves to a completed state.
-        while len(taskList):
-            update = pc.WaitForUpdates(version)
-            for filterSet in update.filterSet:
-                for objSet in filterSet.objectSet:
-                    task = objSet.obj
-                    for change in objSet.changeSet:
-                        if change.name == 'info':
-                            state = change.val.state
-                        elif change.name == 'info.state':
-                            state = change.val
-                        else:
-                            continue
-
-                        if not str(task) in taskList:
-                            continue
-
-                        if state == vim.TaskInfo.State.success:
-                            # Remove task from taskList
-                            taskList.remove(str(task))
-                        elif state == vim.TaskInfo.State.error:
-                            raise task.info.error
-            # Move to next version
-            version = update.version
+        waiter.wait(tasks, timeout=timeout)
     finally:
-        if filter:
-            filter.Destroy()
+        waiter.close()
+
+
+# Get the VMODL version from the parsed vsanServiceVersions.xml document.
+def GetVmodlVersionFromXml(xmldoc):
+    for element in xmldoc.getElementsByTagName('name'):
+        if (element.firstChild.nodeValue == "urn:vsan"):
+            versions = xmldoc.getElementsByTagName('version')
+            versionId = versions[0].firstChild.nodeValue
+            if versionId == '6.6':
+                return 'vsan.version.version3'
+            else:
+                return VmomiSupport.newestVersions.Get('vsan')
+        else:
+            return VmomiSupport.newestVersions.Get('vim')
 
 
 # Get the VMODL version by checking the existence of vSAN namespace.
@@ -227,16 +208,7 @@ def GetLatestVmodlVersion(hostname):
                 hasattr(ssl, '_create_default_https_context')):
             ssl._create_default_https_context = ssl._create_unverified_context
         xmldoc = minidom.parse(urlopen(vsanVmodlUrl, timeout=5))
-        for element in xmldoc.getElementsByTagName('name'):
-            if (element.firstChild.nodeValue == "urn:vsan"):
-                versions = xmldoc.getElementsByTagName('version')
-                versionId = versions[0].firstChild.nodeValue
-                if versionId == '6.6':
-                    return 'vsan.version.version3'
-                else:
-                    return VmomiSupport.newestVersions.Get('vsan')
-            else:
-                return VmomiSupport.newestVersions.Get('vim')
+        return GetVmodlVersionFromXml(xmldoc)
     except Exception as e:
         # Any exception like failing to open the XML or failed to parse the
         # the content should lead to the returning of namespace with vim.
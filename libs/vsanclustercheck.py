@@ -21,69 +21,140 @@ https://storagehub.vmware.com/t/vmware-vsan/vsan-6-2-2-node-for-remote-and-branc
 __author__ = 'VMware, Inc'
 
 import ssl
+import threading
+
+from array import array
+from datetime import datetime
 
 from libs import vsanapiutils
 
 from operator import attrgetter
-from pyVmomi import vim
-from pyVim.connect import SmartConnect, Disconnect
-from typing import List
-
-from libs.util import convert_bytes, print_green, print_yellow, print_red, print_yes_no, print_no_yes, \
+from pyVmomi import vim, vmodl
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from libs.history import HistoryStore, Result
+from libs.inventory import ClusterVm, get_cluster_vms, get_vms
+from libs.inventorycache import InventoryCache
+from libs.masscollector import build_spec, retrieve_properties
+from libs.objectquery import BATCH_PARALLEL, BATCH_SIZE, ObjectInfo, query_object_information
+from libs.parallel import run_ordered
+from libs.perf import PerfSeries, percentiles, query_perf
+from libs.results import CapacityResult, ClomdLiveness, ClusterStatus, DataEfficiency, DiskBalance, HclController, \
+    HclHost, HclResult, HealthResult, HistoryResult, HostHistory, HostStatus, ObjectHealthCount, PerfsvcHealth, \
+    ResyncObject, ResyncResult, SpaceUsage, VmsResult, VsanObject
+from libs.session import VsanSession
+from libs.util import convert_bytes, convert_seconds, print_green, print_yellow, print_red, print_yes_no, print_no_yes, \
     print_thresholds_inc, print_thresholds_dec
 
+# Seconds to wait for the cluster health summary task
+HEALTH_TASK_TIMEOUT = 1800
 
-class VsanClusterCheck(object):
+# Object health states left out of the problem objects, the green states of the report
+HEALTHY_OBJECT_STATES = ['datamove', 'healthy']
 
-    def __init__(self,
-                 host: str,
-                 user: str,
-                 password: str,
-                 port: int,
-                 cluster: str,
-                 context: ssl.SSLContext):
-        self.host_name = host
-        self.ssl_context = context
-        self.cluster_name = cluster
-        self.si = SmartConnect(host=host,
-                               user=user,
-                               pwd=password,
-                               port=int(port),
-                               sslContext=context)
+# Number of past tests read by the history checks
+HISTORY_COUNT = 10
+
+NETWORK_HISTORY_METRICS = ['bandwidth_bps', 'loss_pct', 'jitter_ms']
+VMDK_HISTORY_METRICS = ['iops', 'tput_bps', 'avg_latency_us', 'max_latency_us']
 
-        if not self.si:
-            raise ValueError('Could not connect to the specified host using specified username and password')
+# Number of syncing objects per page of the resync query
+RESYNC_PAGE_SIZE = 500
 
-        # To avoid multiple code warnings about private member access
-        # noinspection PyProtectedMember
-        self.si_stub = self.si._stub
 
-        # Detecting version
-        self.about_info = self.si.content.about
-        if int(self.about_info.apiVersion.split('.')[0]) < 6:
-            raise ValueError('Host version {} (lower than 6.0) is not supported.'.format(self.about_info.apiVersion))
+class VsanClusterCheck(object):
 
-        # Get VMODL API version
-        self.api_version = vsanapiutils.GetLatestVmodlVersion(self.host_name)
+    CHECKS = ['capacity', 'health', 'hcl', 'vms']
 
-        # Check if host is VirtualCenter
-        # Note: This sample only assumes connection to vCenter instances
-        if self.about_info.apiType != 'VirtualCenter':
-            raise ValueError('Host {} is not a VirtualCenter.'.format(self.host_name))
+    # Checks that run only when requested
+    OPTIONAL_CHECKS = ['network-history', 'vmdk-history', 'resync']
 
-        # Get cluster
+    # Cluster health summary fields used by each check
+    HEALTH_SUMMARY_FIELDS = {'health': ['timestamp', 'clusterStatus', 'clomdLiveness', 'diskBalance', 'perfsvcHealth',
+                                        'groups'],
+                             'hcl': ['timestamp', 'hclInfo']}
+
+    # Cluster health summary fields used by the vms check listing the problem objects only
+    PROBLEM_OBJECTS_HEALTH_SUMMARY_FIELDS = ['timestamp', 'objectHealth']
+
+    # Cluster property of the vSAN mass collector read by each check
+    MASS_COLLECTOR_PROPERTIES = {'capacity': 'spaceUsage',
+                                 'health': 'clusterHealthSummary',
+                                 'hcl': 'clusterHealthSummary',
+                                 'vms': 'objectIdentities',
+                                 'network-history': 'clusterNetworkPerfHistoryTest',
+                                 'vmdk-history': 'clusterVmdkLoadHistoryTest'}
+
+    def __init__(self,
+                 host: str = None,
+                 user: str = None,
+                 password: str = None,
+                 port: int = 443,
+                 cluster: str = None,
+                 context: ssl.SSLContext = None,
+                 batch_size: int = BATCH_SIZE,
+                 batch_parallel: int = BATCH_PARALLEL,
+                 health_task: bool = False,
+                 mass_collector: bool = False,
+                 only_problems: bool = False,
+                 version_cache: str = None,
+                 session: VsanSession = None,
+                 cluster_instance: vim.ClusterComputeResource = None,
+                 inventory: InventoryCache = None,
+                 history: HistoryStore = None):
+        # A pooled session is shared with other checkers and is not closed with this one.
+        owns_session = session is None
+        if session is None:
+            session = VsanSession(host=host,
+                                  user=user,
+                                  password=password,
+                                  port=port,
+                                  context=context,
+                                  version_cache=version_cache)
+
+        self.session = session
+        self.owns_session = owns_session
+        self.host_name = session.host_name
+        self.ssl_context = session.ssl_context
+        self.cluster_name = cluster
+        self.batch_size = batch_size
+        self.batch_parallel = batch_parallel
+        self.health_task = health_task
+        self.mass_collector = mass_collector
+        self.only_problems = only_problems
+        self.inventory = inventory
+        self.history = history
+        self.prefetched = {}
+        # The problem objects are read from the health summary shared with the health checks.
+        self.health_summary_fields = dict(self.HEALTH_SUMMARY_FIELDS)
+        if only_problems:
+            self.health_summary_fields['vms'] = self.PROBLEM_OBJECTS_HEALTH_SUMMARY_FIELDS
+        self.health_checks = list(self.health_summary_fields)
+        self.health_summaries = {}
+        self.health_summary_lock = threading.Lock()
+        self.local = threading.local()
+        self.si = session.si
+        self.si_stub = session.si_stub
+        self.about_info = session.about_info
+        self.api_version = session.api_version
+
+        # Get cluster, unless it was already discovered
         # Note: This sample assumes a single cluster is specified.
-        self.cluster_instance = self.__get_cluster_instance()
+        self.cluster_instance = cluster_instance or self.__get_cluster_instance()
 
         if self.cluster_instance is None:
-            raise ValueError('Cluster {} is not found for {}.'.format(self.cluster_instance, self.host_name))
+            raise ValueError('Cluster {} is not found for {}.'.format(self.cluster_name, self.host_name))
 
-        # Get vCenter Managed Object references.
-        self.vc_mos = vsanapiutils.GetVsanVcMos(self.si_stub,
-                                                context=self.ssl_context,
-                                                version=self.api_version)
+    @property
+    def vc_mos(self) -> dict:
+        # Checks running in a worker thread use their own vsanHealth stub.
+        return getattr(self.local, 'vc_mos', None) or self.session.vc_mos
 
     def __get_cluster_instance(self):
+        if self.inventory is not None:
+            self.inventory.refresh()
+            return self.inventory.find_cluster(self.cluster_name)
+
         content = self.si.RetrieveContent()
         search_index = content.searchIndex
         datacenters = content.rootFolder.childEntity
@@ -93,22 +164,6 @@ class VsanClusterCheck(object):
                 return cluster
         return None
 
-    def __get_cluster_vms(self) -> List[vim.VirtualMachine]:
-        vms: List[vim.VirtualMachine] = []
-        content = self.si.RetrieveContent()
-        for cluster_obj in self.__get_obj(content, vim.ComputeResource):
-            if self.cluster_name:
-                if cluster_obj.name == self.cluster_name:
-                    for host in sorted(cluster_obj.host, key=attrgetter('name')):
-                        vms.extend(host.vm)
-        return vms
-
-    @classmethod
-    def __get_obj(cls, content, vimtype):
-        return [item for item in content.viewManager.CreateContainerView(content.rootFolder,
-                                                                         [vimtype],
-                                                                         recursive=True).view]
-
     @classmethod
     def __color_cluster_status(cls, value: str) -> str:
         if value is None:
@@ -180,8 +235,102 @@ class VsanClusterCheck(object):
         else:
             return '{}...'.format(value[0:(length - 3)])
 
-    def get_cluster_vsan_capacity(self) -> None:
-        """Get the cluster vSAN capacity and usage
+    def get_health_summary(self, fetch_from_cache: bool = False):
+        """ Get the cluster health summary shared by the health checks, it is queried once per run """
+        with self.health_summary_lock:
+            if fetch_from_cache not in self.health_summaries:
+                self.health_summaries[fetch_from_cache] = self.__query_health_summary(fetch_from_cache)
+            return self.health_summaries[fetch_from_cache]
+
+    def __query_health_summary(self, fetch_from_cache: bool):
+        if not fetch_from_cache and 'clusterHealthSummary' in self.prefetched:
+            return self.prefetched['clusterHealthSummary']
+
+        vhs = self.vc_mos['vsan-cluster-health-system']
+
+        if self.health_task:
+            # The task computes the full summary, wait for it instead of blocking on the query.
+            # The tasks of all the clusters are waited for together by the session task waiter.
+            vsan_task = vhs.VsanQueryVcClusterHealthSummaryTask(cluster=self.cluster_instance)
+            vc_task = vsanapiutils.ConvertVsanTaskToVcTask(vsan_task, self.si_stub)
+            return self.session.task_waiter.submit(vc_task, timeout=HEALTH_TASK_TIMEOUT).result()
+
+        # vSAN cluster health summary can be cached at vCenter.
+        return vhs.VsanQueryVcClusterHealthSummary(cluster=self.cluster_instance,
+                                                   includeObjUuids=True,
+                                                   fields=self.__health_summary_fields(),
+                                                   fetchFromCache=fetch_from_cache)
+
+    def __health_summary_fields(self) -> List[str]:
+        """ Union of the health summary fields needed by the requested checks """
+        fields = []
+        for check in self.health_checks:
+            fields.extend(x for x in self.health_summary_fields[check] if x not in fields)
+        return fields
+
+    def prefetch(self, checks: List[str]) -> None:
+        """Get the cluster vSAN properties read by the checks in a single mass collector call
+
+        The checks use the prefetched values instead of making their own API call, so
+        the capacity, health summary, object identities and test histories cost one
+        round trip. When the vCenter has no mass collector or rejects a property, the
+        checks fall back to their own calls.
+
+        Managed Object: VsanMassCollector
+        https://vdc-download.vmware.com/vmwb-repository/dcr-public/8ed923df-bad4-49b3-b677-45bca5326e85/d2d90bb6-d1b3-4266-8ce5-443680187a9a/vim.VsanMassCollector.html
+        """
+
+        # The parameters are the arguments of the per-check calls.
+        params = {'clusterHealthSummary': {'includeObjUuids': True,
+                                           'fields': self.__health_summary_fields(),
+                                           'fetchFromCache': False},
+                  'objectIdentities': {'includeHealth': True, 'includeObjIdentity': True},
+                  'clusterNetworkPerfHistoryTest': {'count': HISTORY_COUNT},
+                  'clusterVmdkLoadHistoryTest': {'count': HISTORY_COUNT}}
+
+        properties = []
+        for check in checks:
+            prop = self.MASS_COLLECTOR_PROPERTIES.get(check)
+            if prop == 'objectIdentities' and self.only_problems:
+                # The identities of the problem objects only are queried by the check, from the health summary.
+                prop = 'clusterHealthSummary'
+            if prop is None or prop in properties or (prop == 'clusterHealthSummary' and self.health_task):
+                continue
+            properties.append(prop)
+        if not properties:
+            return
+
+        spec = build_spec([self.cluster_instance], properties, {x: params[x] for x in properties if x in params})
+        try:
+            result = retrieve_properties(self.vc_mos['vsan-mass-collector'], [spec])
+        except vmodl.MethodFault:
+            result = {}
+        self.prefetched = result.get(self.cluster_instance._moId, {})
+
+    @classmethod
+    def pair_objects(cls, identities, vms: List[ClusterVm], objs_info: Iterable[ObjectInfo]) -> List[Tuple]:
+        """ Pair each object identity with its VM and object information
+
+        The VMs and the object information are indexed once by VM moref and object
+        UUID so the pairing is linear in the number of objects.
+        """
+        vms_by_moref = {vm.moref: vm for vm in vms}
+        objs_info_by_uuid = {item.uuid: item for item in objs_info}
+
+        objs = []
+        for obj_ident in identities:
+            vm = vms_by_moref.get(obj_ident.vm._moId) if obj_ident.vm else None
+            objs.append((obj_ident, vm, objs_info_by_uuid.get(obj_ident.uuid)))
+        return objs
+
+    def __record(self, result: Result) -> Result:
+        """ Append the result to the history store, if any """
+        if self.history is not None:
+            self.history.record(result)
+        return result
+
+    def collect_vsan_capacity(self) -> CapacityResult:
+        """Collect the cluster vSAN capacity and usage
 
         API Reference:
 
@@ -201,20 +350,49 @@ class VsanClusterCheck(object):
         https://vdc-download.vmware.com/vmwb-repository/dcr-public/8ed923df-bad4-49b3-b677-45bca5326e85/d2d90bb6-d1b3-4266-8ce5-443680187a9a/vim.vsan.DataEfficiencyCapacityState.html
         """
 
-        # Get vSAN Cluster Space Report System
-        vsrs = self.vc_mos['vsan-cluster-space-report-system']
-        capacity_data = vsrs.VsanQuerySpaceUsage(cluster=self.cluster_instance)
+        capacity_data = self.prefetched.get('spaceUsage')
+        if capacity_data is None:
+            # Get vSAN Cluster Space Report System
+            vsrs = self.vc_mos['vsan-cluster-space-report-system']
+            capacity_data = vsrs.VsanQuerySpaceUsage(cluster=self.cluster_instance)
+
+        # Dedupe and Compression
+        efficiency = None
+        ec = capacity_data.efficientCapacity
+        if ec:
+            efficiency = DataEfficiency(metadata=ec.dedupMetadataSize,
+                                        logical=ec.logicalCapacity,
+                                        logical_used=ec.logicalCapacityUsed,
+                                        physical=ec.physicalCapacity,
+                                        physical_used=ec.physicalCapacityUsed)
+
+        space_usage = [SpaceUsage(obj_type=obj.objType,
+                                  used=obj.usedB,
+                                  reserved=obj.reservedCapacityB,
+                                  overhead=obj.overheadB,
+                                  thick=obj.overReservedB)
+                       for obj in capacity_data.spaceDetail.spaceUsageByObjectType]
+
+        return self.__record(CapacityResult(host_name=self.host_name,
+                                            cluster_name=self.cluster_name,
+                                            total=capacity_data.totalCapacityB,
+                                            free=capacity_data.freeCapacityB,
+                                            committed=capacity_data.uncommittedB,
+                                            efficiency=efficiency,
+                                            space_usage=space_usage))
 
-        print('\nvSAN capacity on host {}\n'.format(self.host_name),
-              ' Cluster: {}\n'.format(self.cluster_name))
+    @classmethod
+    def render_vsan_capacity(cls, result: CapacityResult) -> None:
+        print('\nvSAN capacity on host {}\n'.format(result.host_name),
+              ' Cluster: {}\n'.format(result.cluster_name))
 
         # Capacity values
-        capacity_total = capacity_data.totalCapacityB
-        capacity_free = capacity_data.freeCapacityB
+        capacity_total = result.total
+        capacity_free = result.free
         capacity_free_pct = (capacity_free / capacity_total) * 100
         capacity_used = capacity_total - capacity_free
         capacity_used_pct = (capacity_used / capacity_total) * 100
-        capacity_committed = capacity_data.uncommittedB
+        capacity_committed = result.committed
         capacity_committed_pct = (capacity_committed / capacity_total) * 100
 
         # Print capacity values
@@ -228,40 +406,39 @@ class VsanClusterCheck(object):
                                                           print_thresholds_inc(capacity_committed_pct)))
 
         # Dedupe and Compression
-        if not capacity_data.efficientCapacity:
+        if not result.efficiency:
             print('Data Efficiency: Not Enabled\n')
         else:
-            ec = capacity_data.efficientCapacity
+            ec = result.efficiency
 
             # Data efficiency values
-            efficiency_metadata = ec.dedupMetadataSize
-            efficiency_logical = ec.logicalCapacity
-            efficiency_logical_used = ec.logicalCapacityUsed
-            efficiency_logical_used_pct = (efficiency_logical_used / efficiency_logical) * 100
-            efficiency_physical = ec.physicalCapacity
-            efficiency_physical_used = ec.physicalCapacityUsed
-            efficiency_physical_used_pct = (efficiency_physical_used / efficiency_physical) * 100
+            efficiency_logical_used_pct = (ec.logical_used / ec.logical) * 100
+            efficiency_physical_used_pct = (ec.physical_used / ec.physical) * 100
 
             print('Data Efficiency: Enabled\n',
-                  ' Metadata size: {:>10}\n'.format(convert_bytes(efficiency_metadata)),
-                  ' Logical size:  {:>10}\n'.format(convert_bytes(efficiency_logical)),
-                  ' Logical used:  {:>10} ({})\n'.format(convert_bytes(efficiency_logical_used),
+                  ' Metadata size: {:>10}\n'.format(convert_bytes(ec.metadata)),
+                  ' Logical size:  {:>10}\n'.format(convert_bytes(ec.logical)),
+                  ' Logical used:  {:>10} ({})\n'.format(convert_bytes(ec.logical_used),
                                                          print_thresholds_inc(efficiency_logical_used_pct)),
-                  ' Physical size: {:>10}\n'.format(convert_bytes(efficiency_physical)),
-                  ' Physical used: {:>10} ({})\n'.format(convert_bytes(efficiency_physical_used),
+                  ' Physical size: {:>10}\n'.format(convert_bytes(ec.physical)),
+                  ' Physical used: {:>10} ({})\n'.format(convert_bytes(ec.physical_used),
                                                          print_thresholds_inc(efficiency_physical_used_pct)))
 
         # Space usage details
         print('Space usage details')
-        for obj in sorted(capacity_data.spaceDetail.spaceUsageByObjectType, key=attrgetter('objType')):
-            print('  Type: {:<19}'.format(obj.objType),
-                  'Used: {:>10}'.format(convert_bytes(obj.usedB)),
-                  'Reserved: {:>10}'.format(convert_bytes(obj.reservedCapacityB)),
-                  'Overhead: {:>10}'.format(convert_bytes(obj.overheadB)),
-                  'Thick: {:>10}'.format(convert_bytes(obj.overReservedB)))
+        for obj in sorted(result.space_usage, key=attrgetter('obj_type')):
+            print('  Type: {:<19}'.format(obj.obj_type),
+                  'Used: {:>10}'.format(convert_bytes(obj.used)),
+                  'Reserved: {:>10}'.format(convert_bytes(obj.reserved)),
+                  'Overhead: {:>10}'.format(convert_bytes(obj.overhead)),
+                  'Thick: {:>10}'.format(convert_bytes(obj.thick)))
 
-    def get_health_status(self, fetch_from_cache: bool = False) -> None:
-        """Get the cluster vSAN health status
+    def get_cluster_vsan_capacity(self) -> None:
+        """ Print the cluster vSAN capacity and usage """
+        self.render_vsan_capacity(self.collect_vsan_capacity())
+
+    def collect_health_status(self, fetch_from_cache: bool = False) -> HealthResult:
+        """Collect the cluster vSAN health status
 
         Managed Object: VsanQueryVcClusterHealthSummary
         https://vdc-download.vmware.com/vmwb-repository/dcr-public/8ed923df-bad4-49b3-b677-45bca5326e85/d2d90bb6-d1b3-4266-8ce5-443680187a9a/vim.cluster.VsanVcClusterHealthSystem.html#queryClusterHealthSummary
@@ -285,52 +462,81 @@ class VsanClusterCheck(object):
         https://vdc-download.vmware.com/vmwb-repository/dcr-public/8ed923df-bad4-49b3-b677-45bca5326e85/d2d90bb6-d1b3-4266-8ce5-443680187a9a/vim.cluster.VsanPerfNodeInformation.html
         """
 
-        # Get vSAN Cluster Health System
-        vhs = self.vc_mos['vsan-cluster-health-system']
-        fields = ['timestamp', 'clusterStatus', 'clomdLiveness', 'diskBalance', 'perfsvcHealth', 'groups']
-
-        # vSAN cluster health summary can be cached at vCenter.
-        health_data = vhs.VsanQueryVcClusterHealthSummary(cluster=self.cluster_instance,
-                                                          includeObjUuids=True,
-                                                          fields=fields,
-                                                          fetchFromCache=fetch_from_cache)
-
-        print('\nvSAN health status on host {}\n'.format(self.host_name),
-              ' Cluster: {}\n'.format(self.cluster_name),
-              ' Using cached data?: {}\n'.format('Yes' if fetch_from_cache else 'No'),
-              ' Timestamp: {}'.format(health_data.timestamp))
+        health_data = self.get_health_summary(fetch_from_cache)
 
+        cluster_status = None
         if health_data.clusterStatus:
-            cluster_status = health_data.clusterStatus
-            print('\nCluster: {:<31} Status: {}\n\nHosts'.format(self.cluster_name,
-                                                                 self.__color_cluster_status(cluster_status.status)))
-            for host_status in sorted(cluster_status.trackedHostsStatus, key=attrgetter('hostname')):
-                print('  Host: {:<32} Status: {}'.format(host_status.hostname,
-                                                         self.__color_cluster_status(host_status.status)))
+            cluster_status = ClusterStatus(status=health_data.clusterStatus.status,
+                                           hosts=[HostStatus(hostname=x.hostname, status=x.status)
+                                                  for x in health_data.clusterStatus.trackedHostsStatus])
 
+        clomd_liveness = None
         if health_data.clomdLiveness:
-            clomd_liveness = health_data.clomdLiveness
-            print('\nCLOMD Liveness Issues: {}'.format(print_no_yes(clomd_liveness.issueFound)))
-            for host in sorted(clomd_liveness.clomdLivenessResult, key=attrgetter('hostname')):
-                print('  Host: {:<32} Status: {}'.format(host.hostname, self.__color_clomd_status(host.clomdStat)))
+            clomd_liveness = ClomdLiveness(issue_found=health_data.clomdLiveness.issueFound,
+                                           hosts=[HostStatus(hostname=x.hostname, status=x.clomdStat)
+                                                  for x in health_data.clomdLiveness.clomdLivenessResult])
 
+        disk_balance = None
         if health_data.diskBalance:
-            disk_balance = health_data.diskBalance
+            disk_balance = [DiskBalance(uuid=x.uuid, fullness=x.fullness, variance=x.variance)
+                            for x in health_data.diskBalance.disks]
+
+        perfsvc_health = None
+        if health_data.perfsvcHealth:
+            perfsvc_health = PerfsvcHealth(enough_free_space=health_data.perfsvcHealth.enoughFreeSpace,
+                                           stats_object_consistent=health_data.perfsvcHealth.statsObjectConsistent,
+                                           verbose_mode=health_data.perfsvcHealth.verboseModeStatus)
+
+        return self.__record(HealthResult(host_name=self.host_name,
+                                          cluster_name=self.cluster_name,
+                                          from_cache=fetch_from_cache,
+                                          timestamp=health_data.timestamp,
+                                          cluster_status=cluster_status,
+                                          clomd_liveness=clomd_liveness,
+                                          disk_balance=disk_balance,
+                                          perfsvc_health=perfsvc_health))
+
+    @classmethod
+    def render_health_status(cls, result: HealthResult) -> None:
+        print('\nvSAN health status on host {}\n'.format(result.host_name),
+              ' Cluster: {}\n'.format(result.cluster_name),
+              ' Using cached data?: {}\n'.format('Yes' if result.from_cache else 'No'),
+              ' Timestamp: {}'.format(result.timestamp))
+
+        if result.cluster_status:
+            cluster_status = result.cluster_status
+            print('\nCluster: {:<31} Status: {}\n\nHosts'.format(result.cluster_name,
+                                                                 cls.__color_cluster_status(cluster_status.status)))
+            for host_status in sorted(cluster_status.hosts, key=attrgetter('hostname')):
+                print('  Host: {:<32} Status: {}'.format(host_status.hostname,
+                                                         cls.__color_cluster_status(host_status.status)))
+
+        if result.clomd_liveness:
+            clomd_liveness = result.clomd_liveness
+            print('\nCLOMD Liveness Issues: {}'.format(print_no_yes(clomd_liveness.issue_found)))
+            for host in sorted(clomd_liveness.hosts, key=attrgetter('hostname')):
+                print('  Host: {:<32} Status: {}'.format(host.hostname, cls.__color_clomd_status(host.status)))
+
+        if result.disk_balance:
             print('\nDisk Balance')
-            for disk in sorted(disk_balance.disks, key=attrgetter('uuid')):
+            for disk in sorted(result.disk_balance, key=attrgetter('uuid')):
                 print('  UUID: {:<37} Usage: {:>3}% Variance {:>3}%'.format(disk.uuid.ljust(37),
                                                                             disk.fullness,
                                                                             disk.variance))
 
-        if health_data.perfsvcHealth:
-            perf_svc_health = health_data.perfsvcHealth
+        if result.perfsvc_health:
+            perf_svc_health = result.perfsvc_health
             print('\nPerformance Service\n',
-                  '  Enough Free Space: {}\n'.format(print_yes_no(perf_svc_health.enoughFreeSpace)),
-                  '  Stats Objects Consistent: {}\n'.format(print_yes_no(perf_svc_health.statsObjectConsistent)),
-                  '  Verbose Mode: {}'.format(print_no_yes(perf_svc_health.verboseModeStatus)))
+                  '  Enough Free Space: {}\n'.format(print_yes_no(perf_svc_health.enough_free_space)),
+                  '  Stats Objects Consistent: {}\n'.format(print_yes_no(perf_svc_health.stats_object_consistent)),
+                  '  Verbose Mode: {}'.format(print_no_yes(perf_svc_health.verbose_mode)))
 
-    def get_cluster_hcl_info(self, fetch_from_cache: bool = False) -> None:
-        """ Get the hardware HCL status for the cluster
+    def get_health_status(self, fetch_from_cache: bool = False) -> None:
+        """ Print the cluster vSAN health status """
+        self.render_health_status(self.collect_health_status(fetch_from_cache))
+
+    def collect_cluster_hcl_info(self, fetch_from_cache: bool = False) -> HclResult:
+        """ Collect the hardware HCL status for the cluster
 
         Managed Object: VsanVcClusterGetHclInfo
         https://vdc-download.vmware.com/vmwb-repository/dcr-public/8ed923df-bad4-49b3-b677-45bca5326e85/d2d90bb6-d1b3-4266-8ce5-443680187a9a/vim.cluster.VsanVcClusterHealthSystem.html#getClusterHclInfo
@@ -339,46 +545,100 @@ class VsanClusterCheck(object):
         https://vdc-download.vmware.com/vmwb-repository/dcr-public/8ed923df-bad4-49b3-b677-45bca5326e85/d2d90bb6-d1b3-4266-8ce5-443680187a9a/vim.cluster.VsanClusterHclInfo.html
         """
 
-        # Get vSAN health system from the vCenter Managed Object references.
-        vhs = self.vc_mos['vsan-cluster-health-system']
-        fields = ['timestamp', 'hclInfo']
-
-        health_data = vhs.VsanQueryVcClusterHealthSummary(cluster=self.cluster_instance,
-                                                          includeObjUuids=True,
-                                                          fields=fields,
-                                                          fetchFromCache=fetch_from_cache)
+        health_data = self.get_health_summary(fetch_from_cache)
         hcl_info = health_data.hclInfo
 
-        print('\nvSAN HCL status on host {}\n'.format(self.host_name),
-              ' Cluster: {}\n'.format(self.cluster_name),
-              ' Using cached data?: {}\n'.format('Yes' if fetch_from_cache else 'No'),
-              ' Timestamp: {}\n'.format(health_data.timestamp),
-              ' HCL DB Age: {} (updated {})'.format(hcl_info.hclDbAgeHealth, hcl_info.hclDbLastUpdate))
+        hosts = []
+        for host in hcl_info.hostResults:
+            controllers = [HclController(device_name=device.deviceName,
+                                         display_name=device.deviceDisplayName,
+                                         used_by_vsan=device.usedByVsan,
+                                         device_on_hcl=device.deviceOnHcl,
+                                         driver_name=device.driverName,
+                                         driver_version=device.driverVersion,
+                                         driver_version_supported=device.driverVersionSupported,
+                                         driver_versions_on_hcl=list(device.driverVersionsOnHcl),
+                                         fw_version=device.fwVersion,
+                                         fw_version_supported=device.fwVersionSupported,
+                                         fw_versions_on_hcl=list(device.fwVersionOnHcl),
+                                         tool_name=device.toolName,
+                                         tool_version=device.toolVersion)
+                           for device in host.controllers]
+            hosts.append(HclHost(hostname=host.hostname, release_name=host.releaseName, controllers=controllers))
+
+        return HclResult(host_name=self.host_name,
+                         cluster_name=self.cluster_name,
+                         from_cache=fetch_from_cache,
+                         timestamp=health_data.timestamp,
+                         db_age_health=hcl_info.hclDbAgeHealth,
+                         db_last_update=hcl_info.hclDbLastUpdate,
+                         hosts=hosts)
 
-        for host in sorted(hcl_info.hostResults, key=attrgetter('hostname')):
-            print('\nChecking Host {} ({})'.format(host.hostname, host.releaseName))
+    @classmethod
+    def render_cluster_hcl_info(cls, result: HclResult) -> None:
+        print('\nvSAN HCL status on host {}\n'.format(result.host_name),
+              ' Cluster: {}\n'.format(result.cluster_name),
+              ' Using cached data?: {}\n'.format('Yes' if result.from_cache else 'No'),
+              ' Timestamp: {}\n'.format(result.timestamp),
+              ' HCL DB Age: {} (updated {})'.format(result.db_age_health, result.db_last_update))
+
+        for host in sorted(result.hosts, key=attrgetter('hostname')):
+            print('\nChecking Host {} ({})'.format(host.hostname, host.release_name))
 
             print('Controllers')
             for device in host.controllers:
-                print('  Device:          {}\n'.format(device.deviceName),
-                      '   Name:           {}\n'.format(device.deviceDisplayName),
-                      '   Used by vSAN:   {}\n'.format(device.usedByVsan),
-                      '   Supported?:     {}\n'.format(print_yes_no(device.deviceOnHcl)),
-                      '   Driver:         {}\n'.format(device.driverName),
-                      '     Version:      {}\n'.format(device.driverVersion),
-                      '     Supported?:   {}\n'.format(print_yes_no(device.driverVersionSupported)),
-                      '     HCL versions: {}\n'.format(', '.join(device.driverVersionsOnHcl)),
+                print('  Device:          {}\n'.format(device.device_name),
+                      '   Name:           {}\n'.format(device.display_name),
+                      '   Used by vSAN:   {}\n'.format(device.used_by_vsan),
+                      '   Supported?:     {}\n'.format(print_yes_no(device.device_on_hcl)),
+                      '   Driver:         {}\n'.format(device.driver_name),
+                      '     Version:      {}\n'.format(device.driver_version),
+                      '     Supported?:   {}\n'.format(print_yes_no(device.driver_version_supported)),
+                      '     HCL versions: {}\n'.format(', '.join(device.driver_versions_on_hcl)),
                       '   Firmware\n',
-                      '     Version:      {}\n'.format(device.fwVersion),
-                      '     Supported?:   {}\n'.format(print_yes_no(device.fwVersionSupported)),
-                      '     HCL versions: {}\n'.format(', '.join(device.fwVersionOnHcl)),
-                      '   Tool:           {}\n'.format(device.toolName),
-                      '     Version:      {}\n'.format(device.toolVersion),
-                      '     Supported?:   {}\n'.format(print_yes_no(device.fwVersionSupported)),
-                      '     HCL versions: {}'.format(', '.join(device.fwVersionOnHcl)))
+                      '     Version:      {}\n'.format(device.fw_version),
+                      '     Supported?:   {}\n'.format(print_yes_no(device.fw_version_supported)),
+                      '     HCL versions: {}\n'.format(', '.join(device.fw_versions_on_hcl)),
+                      '   Tool:           {}\n'.format(device.tool_name),
+                      '     Version:      {}\n'.format(device.tool_version),
+                      '     Supported?:   {}\n'.format(print_yes_no(device.fw_version_supported)),
+                      '     HCL versions: {}'.format(', '.join(device.fw_versions_on_hcl)))
 
-    def get_cluster_vms(self) -> None:
-        """ Get all VMs in the cluster with storage on vSAN
+    def get_cluster_hcl_info(self, fetch_from_cache: bool = False) -> None:
+        """ Print the hardware HCL status for the cluster """
+        self.render_cluster_hcl_info(self.collect_cluster_hcl_info(fetch_from_cache))
+
+    def __query_problem_objects(self) -> Tuple[List[ObjectHealthCount], List[str]]:
+        """Object health counts of the cluster and UUIDs of its objects which are not healthy
+
+        The UUIDs of each health state are listed by the object health of the cluster
+        health summary shared with the health checks, so the healthy objects are never
+        queried one by one. The objects reported as not compliant with their storage
+        policy are included.
+        """
+
+        object_health = self.get_health_summary().objectHealth
+        if object_health is None and self.health_task:
+            # The summary computed by the health task does not list the objects of each state.
+            vhs = self.vc_mos['vsan-cluster-health-system']
+            object_health = vhs.VsanQueryVcClusterHealthSummary(cluster=self.cluster_instance,
+                                                                includeObjUuids=True,
+                                                                fields=['objectHealth'],
+                                                                fetchFromCache=False).objectHealth
+
+        health_counts = []
+        uuids = {}
+        for detail in (object_health.objectHealthDetail if object_health else None) or []:
+            health_counts.append(ObjectHealthCount(health=detail.health, num_objects=detail.numObjects))
+            if detail.health not in HEALTHY_OBJECT_STATES:
+                uuids.update(dict.fromkeys(detail.objUuids or []))
+        for compliance in (object_health.objectsComplianceDetail if object_health else None) or []:
+            if compliance.objectUUID and compliance.complianceStatus not in ['compliant', 'notApplicable']:
+                uuids[compliance.objectUUID] = None
+        return health_counts, list(uuids)
+
+    def collect_cluster_vms(self) -> VmsResult:
+        """ Collect the vSAN objects of the cluster with their VM, health and compliance
 
         https://github.com/vmware/pyvmomi-community-samples/blob/master/samples/getvmsbycluster.py
         https://github.com/vmware/pyvmomi-community-samples/issues/253
@@ -387,61 +647,348 @@ class VsanClusterCheck(object):
 
         vcos = self.vc_mos['vsan-cluster-object-system']
 
-        cos_data = vcos.VsanQueryObjectIdentities(cluster=self.cluster_instance,
-                                                  includeHealth=True,
-                                                  includeObjIdentity=True)
-
-        cos_health = cos_data.health.objectHealthDetail
-        print('\nvSAN object health status on host {}\n'.format(self.host_name),
-              ' Cluster: {}\n'.format(self.cluster_name),
-              ' Objects: {}\n'.format(sum([x.numObjects for x in cos_health])),
-              ' Health:  {}'.format(','.join([self.__color_obj_health_status(x.health) for x in cos_health])))
-
-        cos_uuids = [vim.cluster.VsanObjectQuerySpec(uuid=x.uuid) for x in cos_data.identities]
-        cos_objs_info = vcos.VosQueryVsanObjectInformation(cluster=self.cluster_instance,
-                                                           vsanObjectQuerySpecs=cos_uuids)
+        if self.only_problems:
+            health_counts, problem_uuids = self.__query_problem_objects()
+            identities = []
+            if problem_uuids:
+                cos_data = vcos.VsanQueryObjectIdentities(cluster=self.cluster_instance,
+                                                          objUuids=problem_uuids,
+                                                          includeObjIdentity=True)
+                identities = (cos_data.identities if cos_data else None) or []
+        else:
+            cos_data = self.prefetched.get('objectIdentities')
+            if cos_data is None:
+                cos_data = vcos.VsanQueryObjectIdentities(cluster=self.cluster_instance,
+                                                          includeHealth=True,
+                                                          includeObjIdentity=True)
+
+            health_counts = [ObjectHealthCount(health=x.health, num_objects=x.numObjects)
+                             for x in cos_data.health.objectHealthDetail]
+            identities = cos_data.identities
+
+        # The object information is queried in batches and consumed as it streams in.
+        cos_objs_info = query_object_information(vcos,
+                                                 self.cluster_instance,
+                                                 [x.uuid for x in identities],
+                                                 batch_size=self.batch_size,
+                                                 parallel=self.batch_parallel)
+
+        if self.inventory is not None:
+            self.inventory.refresh()
+            vms = self.inventory.get_cluster_vms(self.cluster_instance)
+        elif self.only_problems:
+            # Only the VMs of the problem objects are looked up, instead of every VM of the cluster.
+            vms = get_vms(self.si, [x.vm for x in identities if x.vm])
+        else:
+            vms = get_cluster_vms(self.si, self.cluster_instance)
+
+        # Pair each identity with its VM and object information and keep only
+        # the rendered fields, the identities are freed with cos_data.
+        objects = [VsanObject(vm_name=vm.name if vm else '',
+                              obj_type=obj_ident.type,
+                              uuid=obj_ident.uuid,
+                              health=obj_info.health if obj_info else None,
+                              compliance=obj_info.compliance if obj_info else None)
+                   for obj_ident, vm, obj_info in self.pair_objects(identities, vms, cos_objs_info)]
+
+        return self.__record(VmsResult(host_name=self.host_name,
+                                       cluster_name=self.cluster_name,
+                                       health_counts=health_counts,
+                                       objects=objects))
 
-        vms = self.__get_cluster_vms()
+    @classmethod
+    def render_cluster_vms(cls, result: VmsResult) -> None:
+        print('\nvSAN object health status on host {}\n'.format(result.host_name),
+              ' Cluster: {}\n'.format(result.cluster_name),
+              ' Objects: {}\n'.format(sum([x.num_objects for x in result.health_counts])),
+              ' Health:  {}'.format(','.join([cls.__color_obj_health_status(x.health) for x in result.health_counts])))
 
-        # Build a list of tuples where we pair the identity and the information to
-        # make it easier to print and return.
-        # The objs tuple could be returned or further processed.
         # the print_objs is created to make the sorting and printing much faster than
-        # working directly with the (large) objs structure.
-        objs = []
-        print_objs = []
-        for obj_ident in cos_data.identities:
-            obj_ident.vm = next((vm for vm in vms if obj_ident.vm == vm), None)
-            obj_info = next((item for item in cos_objs_info if item.vsanObjectUuid == obj_ident.uuid), None)
-            objs.append((obj_ident, obj_info))
-
-            # Populate the print_data
-            vm_name = self.___truncate_vm_name(obj_ident.vm.name if obj_ident.vm else '')
-            obj_type = obj_ident.type
-            obj_uuid = obj_ident.uuid
-            obj_health = self.__color_obj_health_status(obj_info.vsanHealth)
-            obj_compliance = self.__color_obj_compliance_status(obj_info.spbmComplianceResult.complianceStatus)
-            print_objs.append((vm_name,
-                               obj_type,
-                               obj_uuid,
-                               obj_health,
-                               obj_compliance))
+        # working directly with the (large) objects list.
+        print_objs = [(cls.___truncate_vm_name(x.vm_name), x.obj_type, x.uuid, x.health, x.compliance)
+                      for x in result.objects]
 
         print('\nvSAN objects')
         for vm_name, obj_type, obj_uuid, obj_health, obj_compliance in sorted(print_objs, key=lambda x: [x[0], x[1]]):
             print('  VM: {:31}'.format(vm_name),
                   'Type: {:20}'.format(obj_type),
                   'UUID: {}'.format(obj_uuid),
-                  'Status: {}'.format(obj_health),
-                  'Policy: {}'.format(obj_compliance))
+                  'Status: {}'.format(cls.__color_obj_health_status(obj_health)),
+                  'Policy: {}'.format(cls.__color_obj_compliance_status(obj_compliance)))
 
-    def get_cluster_network_performance_history(self):
-        # VsanQueryVcClusterNetworkPerfHistoryTest
-        pass
+    def get_cluster_vms(self) -> None:
+        """ Print all VMs in the cluster with storage on vSAN """
+        self.render_cluster_vms(self.collect_cluster_vms())
+
+    def run_checks(self, checks: List[str] = None, parallel: int = 1) -> None:
+        """ Run the named checks, up to 'parallel' at a time, printing their output in order """
+
+        methods = {'capacity': self.get_cluster_vsan_capacity,
+                   'health': self.get_health_status,
+                   'hcl': self.get_cluster_hcl_info,
+                   'vms': self.get_cluster_vms,
+                   'network-history': self.get_cluster_network_performance_history,
+                   'vmdk-history': self.get_cluster_vmk_load_history,
+                   'resync': self.get_resync_status}
+        checks = checks or self.CHECKS
+
+        # The health summary is fetched once with the fields of the requested checks.
+        self.health_checks = [x for x in checks if x in self.health_summary_fields]
+        self.health_summaries = {}
+        if self.mass_collector:
+            self.prefetch(checks)
+
+        def task(method):
+            def run():
+                if parallel > 1:
+                    self.local.vc_mos = self.session.get_vc_mos()
+                try:
+                    method()
+                finally:
+                    self.local.vc_mos = None
+            return run
+
+        try:
+            run_ordered([task(methods[name]) for name in checks], parallel=parallel)
+        finally:
+            # Free the health summary and prefetched DataObjects once the checks have collected their data.
+            self.health_summaries = {}
+            self.prefetched = {}
+
+    def collect_perf_metrics(self,
+                             start_time: datetime,
+                             end_time: datetime,
+                             entity_types: List[str] = None,
+                             interval: int = None) -> List[PerfSeries]:
+        """ Collect the vSAN performance metrics of the cluster entities over a time window
+
+        Managed Object: VsanPerfQueryPerf
+        https://vdc-download.vmware.com/vmwb-repository/dcr-public/8ed923df-bad4-49b3-b677-45bca5326e85/d2d90bb6-d1b3-4266-8ce5-443680187a9a/vim.cluster.VsanPerformanceManager.html#queryVsanPerf
+
+        Data Object: VsanPerfEntityMetricCSV
+        https://vdc-download.vmware.com/vmwb-repository/dcr-public/8ed923df-bad4-49b3-b677-45bca5326e85/d2d90bb6-d1b3-4266-8ce5-443680187a9a/vim.cluster.VsanPerfEntityMetricCSV.html
+        """
+
+        return query_perf(self.vc_mos['vsan-performance-manager'],
+                          self.cluster_instance,
+                          start_time,
+                          end_time,
+                          entity_types=entity_types,
+                          interval=interval)
+
+    @classmethod
+    def __host_histories(cls, samples: Dict[str, list], metric_names: List[str]) -> List[HostHistory]:
+        """ Build the per host history from (timestamp, values) samples, values in the metric_names order """
+        histories = []
+        for hostname in sorted(samples):
+            metrics = {x: array('d') for x in metric_names}
+            for _, values in samples[hostname]:
+                for name, value in zip(metric_names, values):
+                    metrics[name].append(float('nan') if value is None else value)
+            histories.append(HostHistory(hostname=hostname,
+                                         timestamps=[x for x, _ in samples[hostname]],
+                                         metrics=metrics,
+                                         percentiles={x: percentiles(metrics[x]) for x in metric_names}))
+        return histories
+
+    def collect_cluster_network_performance_history(self, count: int = HISTORY_COUNT) -> HistoryResult:
+        """ Collect the results of the last network performance tests of the cluster
+
+        Managed Object: VsanQueryVcClusterNetworkPerfHistoryTest
+        https://vdc-download.vmware.com/vmwb-repository/dcr-public/8ed923df-bad4-49b3-b677-45bca5326e85/d2d90bb6-d1b3-4266-8ce5-443680187a9a/vim.cluster.VsanVcClusterHealthSystem.html#queryClusterNetworkPerfHistoryTest
+
+        Data Object: VsanClusterNetworkLoadTestResult
+        https://vdc-download.vmware.com/vmwb-repository/dcr-public/8ed923df-bad4-49b3-b677-45bca5326e85/d2d90bb6-d1b3-4266-8ce5-443680187a9a/vim.cluster.VsanClusterNetworkLoadTestResult.html
+        """
 
-    def get_cluster_vmk_load_history(self):
-        # VsanQueryVcClusterVmdkLoadHistoryTest
-        pass
+        if count == HISTORY_COUNT and 'clusterNetworkPerfHistoryTest' in self.prefetched:
+            tests = self.prefetched['clusterNetworkPerfHistoryTest']
+        else:
+            vhs = self.vc_mos['vsan-cluster-health-system']
+            tests = vhs.VsanQueryVcClusterNetworkPerfHistoryTest(cluster=self.cluster_instance, count=count)
+
+        samples = {}
+        for test in tests or []:
+            timestamp = test.clusterResult.timestamp if test.clusterResult else None
+            for host in test.hostResults:
+                samples.setdefault(host.hostname, []).append((timestamp,
+                                                              (host.bandwidthBps, host.lossPct, host.jitterMs)))
+
+        return HistoryResult(host_name=self.host_name,
+                             cluster_name=self.cluster_name,
+                             test_name='network performance',
+                             hosts=self.__host_histories(samples, NETWORK_HISTORY_METRICS))
+
+    def collect_cluster_vmk_load_history(self, count: int = HISTORY_COUNT) -> HistoryResult:
+        """ Collect the results of the last VMDK load tests of the cluster, one sample per VMDK
+
+        Managed Object: VsanQueryVcClusterVmdkLoadHistoryTest
+        https://vdc-download.vmware.com/vmwb-repository/dcr-public/8ed923df-bad4-49b3-b677-45bca5326e85/d2d90bb6-d1b3-4266-8ce5-443680187a9a/vim.cluster.VsanVcClusterHealthSystem.html#queryClusterVmdkLoadHistoryTest
+
+        Data Object: VsanClusterVmdkLoadTestResult
+        https://vdc-download.vmware.com/vmwb-repository/dcr-public/8ed923df-bad4-49b3-b677-45bca5326e85/d2d90bb6-d1b3-4266-8ce5-443680187a9a/vim.cluster.VsanClusterVmdkLoadTestResult.html
+        """
+
+        if count == HISTORY_COUNT and 'clusterVmdkLoadHistoryTest' in self.prefetched:
+            tests = self.prefetched['clusterVmdkLoadHistoryTest']
+        else:
+            vhs = self.vc_mos['vsan-cluster-health-system']
+            tests = vhs.VsanQueryVcClusterVmdkLoadHistoryTest(cluster=self.cluster_instance, count=count)
+
+        samples = {}
+        for test in tests or []:
+            timestamp = test.clusterResult.timestamp if test.clusterResult else None
+            for host in test.hostResults:
+                for vmdk in host.vmdkResults:
+                    samples.setdefault(host.hostname, []).append((timestamp,
+                                                                  (vmdk.iops, vmdk.tputBps, vmdk.avgLatencyUs,
+                                                                   vmdk.maxLatencyUs)))
+
+        return HistoryResult(host_name=self.host_name,
+                             cluster_name=self.cluster_name,
+                             test_name='VMDK load',
+                             hosts=self.__host_histories(samples, VMDK_HISTORY_METRICS))
+
+    @classmethod
+    def render_history(cls, result: HistoryResult) -> None:
+        print('\nvSAN {} history on host {}\n'.format(result.test_name, result.host_name),
+              ' Cluster: {}'.format(result.cluster_name))
+
+        if not result.hosts:
+            print('\nNo test results')
+
+        for host in result.hosts:
+            print('\nHost {} ({} samples)'.format(host.hostname, len(host.timestamps)))
+            for name, values in sorted(host.percentiles.items()):
+                print('  {:<16}'.format(name),
+                      ' '.join('{}: {:>14.2f}'.format(k, v) for k, v in values.items()))
+
+    def get_cluster_network_performance_history(self, count: int = HISTORY_COUNT) -> None:
+        """ Print the network performance test history of the cluster """
+        self.render_history(self.collect_cluster_network_performance_history(count))
+
+    def get_cluster_vmk_load_history(self, count: int = HISTORY_COUNT) -> None:
+        """ Print the VMDK load test history of the cluster """
+        self.render_history(self.collect_cluster_vmk_load_history(count))
+
+    def collect_resync_status(self, include_objects: bool = True, page_size: int = RESYNC_PAGE_SIZE) -> ResyncResult:
+        """Collect the objects of the cluster being resynced, with the bytes left to sync and the ETA
+
+        The syncing objects are read in pages of 'page_size' objects, each page is
+        reduced to the bytes, ETA and reasons of its objects before the next one is
+        requested. Without the objects, a single call returns the totals.
+
+        Managed Object: QuerySyncingVsanObjectsSummary
+        https://vdc-download.vmware.com/vmwb-repository/dcr-public/8ed923df-bad4-49b3-b677-45bca5326e85/d2d90bb6-d1b3-4266-8ce5-443680187a9a/vim.cluster.VsanObjectSystem.html#querySyncingVsanObjectsSummary
+
+        Data Object: VsanSyncingObjectQueryResult
+        https://vdc-download.vmware.com/vmwb-repository/dcr-public/8ed923df-bad4-49b3-b677-45bca5326e85/d2d90bb6-d1b3-4266-8ce5-443680187a9a/vim.vsan.host.VsanSyncingObjectQueryResult.html
+        """
+
+        if page_size < 1:
+            raise ValueError('The page size of the syncing objects must be positive, got {}'.format(page_size))
+        vcos = self.vc_mos['vsan-cluster-object-system']
+
+        objects = []
+        offset = 0
+        while True:
+            syncing_filter = vim.cluster.VsanSyncingObjectFilter(numberOfObjects=page_size if include_objects else 1,
+                                                                 offset=offset)
+            page = vcos.QuerySyncingVsanObjectsSummary(cluster=self.cluster_instance,
+                                                       syncingObjectFilter=syncing_filter)
+            if offset == 0:
+                summary = page
+            page_objects = page.objects or []
+            for obj in page_objects:
+                etas = [x.recoveryETA for x in obj.components if x.recoveryETA is not None]
+                objects.append(ResyncObject(uuid=obj.uuid,
+                                            bytes_to_sync=sum(x.bytesToSync for x in obj.components),
+                                            eta=max(etas) if etas else None,
+                                            reasons=sorted({y for x in obj.components for y in x.reasons or []})))
+            offset += len(page_objects)
+            # The last page is short, or reaches the total when the total is reported.
+            total = summary.totalObjectsToSync
+            if not include_objects or len(page_objects) < page_size or (total is not None and offset >= total):
+                break
+
+        details = summary.syncingObjectRecoveryDetails
+        objects_to_sync = summary.totalObjectsToSync
+        bytes_to_sync = summary.totalBytesToSync
+        if include_objects:
+            objects_to_sync = objects_to_sync if objects_to_sync is not None else len(objects)
+            bytes_to_sync = bytes_to_sync if bytes_to_sync is not None else sum(x.bytes_to_sync for x in objects)
+
+        return ResyncResult(host_name=self.host_name,
+                            cluster_name=self.cluster_name,
+                            objects_to_sync=objects_to_sync or 0,
+                            bytes_to_sync=bytes_to_sync or 0,
+                            eta=summary.totalRecoveryETA,
+                            active_objects=details.activeObjectsToSync if details else None,
+                            queued_objects=details.queuedObjectsToSync if details else None,
+                            suspended_objects=details.suspendedObjectsToSync if details else None,
+                            objects=objects if include_objects else [])
+
+    @classmethod
+    def render_resync_status(cls, result: ResyncResult) -> None:
+        print('\nvSAN resync status on host {}\n'.format(result.host_name),
+              ' Cluster: {}\n'.format(result.cluster_name),
+              ' Objects to sync: {}\n'.format(result.objects_to_sync),
+              ' Bytes to sync:   {}\n'.format(convert_bytes(result.bytes_to_sync)),
+              ' ETA:             {}'.format(convert_seconds(result.eta) if result.objects_to_sync else '-'))
+        if result.active_objects is not None:
+            print('  Active: {}, Queued: {}, Suspended: {}'.format(result.active_objects or 0,
+                                                                  result.queued_objects or 0,
+                                                                  result.suspended_objects or 0))
+
+        if not result.objects_to_sync:
+            print('\n{}'.format(print_green('No objects to sync')))
+            return
+
+        print('\nvSAN syncing objects')
+        for obj in sorted(result.objects, key=attrgetter('bytes_to_sync'), reverse=True):
+            print('  UUID: {}'.format(obj.uuid),
+                  'To sync: {:>10}'.format(convert_bytes(obj.bytes_to_sync)),
+                  'ETA: {:>8}'.format(convert_seconds(obj.eta)),
+                  'Reasons: {}'.format(','.join(obj.reasons)))
+
+    def get_resync_status(self) -> None:
+        """ Print the objects of the cluster being resynced """
+        self.render_resync_status(self.collect_resync_status())
 
     def __del__(self):
-        Disconnect(self.si)
+        if getattr(self, 'owns_session', False):
+            self.session.close()
+
+
+def check_clusters(session: VsanSession,
+                   clusters: Dict[str, Optional[vim.ClusterComputeResource]],
+                   checks: List[str] = None,
+                   parallel: int = 1,
+                   cluster_parallel: int = 1,
+                   **kwargs) -> List[str]:
+    """Run the checks on each cluster, up to 'cluster_parallel' clusters at a time
+
+    The clusters share the session and their output is printed in the order of
+    'clusters'. A cluster whose checks fail does not stop the other clusters, the
+    names of the failed clusters are returned.
+    """
+
+    failed = []
+
+    def task(cluster_name: str, cluster_instance: Optional[vim.ClusterComputeResource]):
+        def run():
+            try:
+                vcc = VsanClusterCheck(cluster=cluster_name,
+                                       session=session,
+                                       cluster_instance=cluster_instance,
+                                       **kwargs)
+                vcc.run_checks(checks, parallel=parallel)
+            except Exception as e:
+                failed.append(cluster_name)
+                print('\nvSAN checks failed on host {}\n'.format(session.host_name),
+                      ' Cluster: {}\n'.format(cluster_name),
+                      ' Error: {}'.format(print_red(e)))
+        return run
+
+    run_ordered([task(name, instance) for name, instance in clusters.items()], parallel=cluster_parallel)
+    return [x for x in clusters if x in failed]
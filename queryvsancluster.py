@@ -2,9 +2,40 @@
 import argparse
 import getpass
 import ssl
+import sys
+
+from typing import Optional
 
 import libs.vsanmgmtObjects
-from libs.vsanclustercheck import VsanClusterCheck
+from libs.history import HistoryStore
+from libs.inventory import get_vsan_clusters, select_clusters
+from libs.objectquery import BATCH_PARALLEL, BATCH_SIZE
+from libs.profiler import Profiler
+from libs.session import VsanSession
+from libs.transport import Recorder, Redirector, Replayer, Transport
+from libs.vsanclustercheck import VsanClusterCheck, check_clusters
+
+
+def positive_int(value: str) -> int:
+    """ Count argument, e.g. of workers or objects per call, at least 1 """
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError('expected a positive integer, got {!r}'.format(value))
+    return number
+
+
+def positive_float(value: str) -> float:
+    """ Duration argument, e.g. seconds between two polls, above 0 """
+    try:
+        number = float(value)
+    except ValueError:
+        number = 0.
+    if not number > 0 or number == float('inf'):
+        raise argparse.ArgumentTypeError('expected a positive number, got {!r}'.format(value))
+    return number
 
 
 def get_args():
@@ -14,14 +45,83 @@ def get_args():
     parser.add_argument('-o', '--port', type=int, default=443, action='store', help='Port to connect on')
     parser.add_argument('-u', '--user', required=True, action='store', help='Username when connecting to host')
     parser.add_argument('-p', '--password', required=False, action='store', help='Password when connecting to host')
-    parser.add_argument('--cluster', dest='cluster_name', metavar="CLUSTER", default='VSAN-Cluster')
+    parser.add_argument('--cluster', dest='cluster_names', metavar="CLUSTER", nargs='+', default=['VSAN-Cluster'],
+                        help='Cluster names or glob patterns')
+    parser.add_argument('--all-clusters', action='store_true', help='Check every vSAN enabled cluster')
+    add_check_args(parser)
+    parser.add_argument('--version-cache', metavar='FILE', help='JSON file caching the vSAN API version per vCenter')
+    parser.add_argument('--history', metavar='FILE',
+                        help='SQLite database the capacity, disk balance and object health of the run are appended to')
+    add_transport_args(parser)
     args = parser.parse_args()
     return args
 
 
+def add_check_args(parser: argparse.ArgumentParser) -> None:
+    """ Command-line arguments tuning how the checks run, shared with queryvsanfleet. """
+    parser.add_argument('--checks', nargs='+', default=VsanClusterCheck.CHECKS, metavar='CHECK',
+                        choices=VsanClusterCheck.CHECKS + VsanClusterCheck.OPTIONAL_CHECKS,
+                        help='Checks to run: {}'.format(', '.join(VsanClusterCheck.CHECKS +
+                                                                  VsanClusterCheck.OPTIONAL_CHECKS)))
+    parser.add_argument('--cluster-parallel', type=positive_int, default=1, metavar='N',
+                        help='Number of clusters to check concurrently')
+    parser.add_argument('--parallel', type=positive_int, default=1, metavar='N',
+                        help='Number of checks to run concurrently')
+    parser.add_argument('--batch-size', type=positive_int, default=BATCH_SIZE, metavar='N',
+                        help='Number of vSAN objects per object information query')
+    parser.add_argument('--batch-parallel', type=positive_int, default=BATCH_PARALLEL, metavar='N',
+                        help='Number of object information queries in flight')
+    parser.add_argument('--health-task', action='store_true',
+                        help='Compute the cluster health summary with a vCenter task')
+    parser.add_argument('--mass-collector', action='store_true',
+                        help='Get the cluster vSAN properties of the checks in one vSAN mass collector call')
+    parser.add_argument('--only-problems', action='store_true',
+                        help='List only the vSAN objects which are not healthy, queried by UUID from the object '
+                             'health summary')
+
+
+def add_transport_args(parser: argparse.ArgumentParser) -> None:
+    """ Command-line arguments to record, replay or fake the vCenter API calls. """
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--record', metavar='FILE', help='Record the API calls to a cassette file')
+    group.add_argument('--replay', metavar='FILE', help='Answer the API calls from a cassette file, offline')
+    parser.add_argument('--fake-vcenter', metavar='HOST:PORT',
+                        help='Send the API calls over HTTP to a fake vCenter (python -m libs.fakevcenter)')
+    parser.add_argument('--profile', action='store_true', help='Print the latency and payload of the API calls')
+    parser.add_argument('--profile-trace', metavar='FILE', help='Write every API call to a JSON trace file')
+    parser.add_argument('--profile-otel', action='store_true',
+                        help='Send the API calls as OpenTelemetry spans (needs opentelemetry-api)')
+
+
+def get_transport(args: argparse.Namespace) -> Optional[Transport]:
+    """ Transport of the session from the add_transport_args arguments. """
+    if args.replay:
+        transport = Replayer(args.replay)
+    else:
+        transport = Redirector(args.fake_vcenter) if args.fake_vcenter else None
+        if args.record:
+            transport = Recorder(args.record, inner=transport)
+    if args.profile or args.profile_trace or args.profile_otel:
+        return Profiler(inner=transport, trace=args.profile_trace, otel=args.profile_otel)
+    return transport
+
+
+def get_check_kwargs(args: argparse.Namespace) -> dict:
+    """ check_clusters keyword arguments from the add_check_args arguments. """
+    return dict(checks=args.checks,
+                parallel=args.parallel,
+                cluster_parallel=args.cluster_parallel,
+                batch_size=args.batch_size,
+                batch_parallel=args.batch_parallel,
+                health_task=args.health_task,
+                mass_collector=args.mass_collector,
+                only_problems=args.only_problems)
+
+
 def main():
     args = get_args()
-    if args.password:
+    transport = get_transport(args)
+    if args.password or (transport and transport.offline):
         password = args.password
     else:
         password = getpass.getpass(prompt='Enter password for host {} and user {}: '.format(args.host, args.user))
@@ -30,17 +130,34 @@ def main():
     context.check_hostname = False
     context.verify_mode = ssl.CERT_NONE
 
-    vcc = VsanClusterCheck(host=args.host,
-                           user=args.user,
-                           password=password,
-                           port=int(args.port),
-                           cluster=args.cluster_name,
-                           context=context)
-
-    vcc.get_cluster_vsan_capacity()
-    vcc.get_health_status()
-    vcc.get_cluster_hcl_info()
-    vcc.get_cluster_vms()
+    session = VsanSession(host=args.host,
+                          user=args.user,
+                          password=password,
+                          port=int(args.port),
+                          context=context,
+                          version_cache=args.version_cache,
+                          transport=transport)
+
+    history = HistoryStore(args.history) if args.history else None
+    try:
+        if args.all_clusters or any(set(x) & set('*?[/') for x in args.cluster_names):
+            # Discover the vSAN clusters in one query and match the names, or datacenter/name, against the patterns.
+            patterns = ['*'] if args.all_clusters else args.cluster_names
+            clusters = select_clusters(get_vsan_clusters(session.si), patterns)
+        else:
+            clusters = {x: None for x in args.cluster_names}
+
+        failed = check_clusters(session, clusters, history=history, **get_check_kwargs(args))
+    finally:
+        if history is not None:
+            history.close()
+        session.close()
+
+    if args.profile:
+        transport.render_summary()
+
+    if failed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,111 @@
+import argparse
+import getpass
+import ssl
+
+import libs.vsanmgmtObjects
+from libs.exporter import COLLECTORS, EXPORTER_PORT, REFRESH_INTERVALS, Exporter
+from libs.history import HistoryStore
+from libs.inventory import get_vsan_clusters, select_clusters
+from libs.inventorycache import InventoryCache
+from libs.objectquery import BATCH_PARALLEL, BATCH_SIZE
+from libs.session import SessionPool
+from queryvsancluster import add_transport_args, get_transport, positive_int
+
+
+def parse_interval(value: str) -> tuple:
+    """ CHECK=SECONDS refresh interval argument """
+    check, _, seconds = value.partition('=')
+    if check not in COLLECTORS or not seconds:
+        raise argparse.ArgumentTypeError('expected CHECK=SECONDS with CHECK in {}'.format(', '.join(COLLECTORS)))
+    return check, float(seconds)
+
+
+def get_args():
+    """ Supports the command-line arguments listed below. """
+    parser = argparse.ArgumentParser(description='Export the vSAN checks as Prometheus metrics')
+    parser.add_argument('-s', '--host', required=True, action='store', help='Remote host to connect to')
+    parser.add_argument('-o', '--port', type=int, default=443, action='store', help='Port to connect on')
+    parser.add_argument('-u', '--user', required=True, action='store', help='Username when connecting to host')
+    parser.add_argument('-p', '--password', required=False, action='store', help='Password when connecting to host')
+    parser.add_argument('--cluster', dest='cluster_names', metavar="CLUSTER", nargs='+', default=['*'],
+                        help='Cluster names or glob patterns (default: every vSAN enabled cluster)')
+    parser.add_argument('--checks', nargs='+', default=list(COLLECTORS), metavar='CHECK', choices=list(COLLECTORS),
+                        help='Checks to export: {}'.format(', '.join(COLLECTORS)))
+    parser.add_argument('--refresh', type=parse_interval, action='append', default=[], metavar='CHECK=SECONDS',
+                        help='Refresh interval of a check, defaults: {}'.format(
+                            ', '.join('{}={}'.format(k, v) for k, v in REFRESH_INTERVALS.items())))
+    parser.add_argument('--listen-address', default='', metavar='ADDRESS', help='Address of the HTTP server')
+    parser.add_argument('--listen-port', type=int, default=EXPORTER_PORT, metavar='PORT',
+                        help='Port of the HTTP server serving /metrics')
+    parser.add_argument('--batch-size', type=positive_int, default=BATCH_SIZE, metavar='N',
+                        help='Number of vSAN objects per object information query')
+    parser.add_argument('--batch-parallel', type=positive_int, default=BATCH_PARALLEL, metavar='N',
+                        help='Number of object information queries in flight')
+    parser.add_argument('--version-cache', metavar='FILE', help='JSON file caching the vSAN API version per vCenter')
+    parser.add_argument('--inventory-cache', metavar='FILE',
+                        help='JSON file caching the clusters, hosts and VMs, refreshed with the vCenter changes')
+    parser.add_argument('--history', metavar='FILE',
+                        help='SQLite database each refresh of the capacity, health and vms checks is appended to')
+    add_transport_args(parser)
+    args = parser.parse_args()
+    return args
+
+
+def main():
+    args = get_args()
+    transport = get_transport(args)
+    if args.password or (transport and transport.offline):
+        password = args.password
+    else:
+        password = getpass.getpass(prompt='Enter password for host {} and user {}: '.format(args.host, args.user))
+
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+
+    # The pool keeps the session alive for the lifetime of the exporter.
+    with SessionPool() as pool:
+        session = pool.get(host=args.host,
+                           user=args.user,
+                           password=password,
+                           port=int(args.port),
+                           context=context,
+                           version_cache=args.version_cache,
+                           transport=transport)
+
+        # The VMs of the cluster are looked up in the cache, which applies the vCenter changes on each refresh.
+        inventory = InventoryCache(session.si, path=args.inventory_cache) if args.inventory_cache else None
+        if inventory is not None and not inventory.loaded:
+            # A restarted exporter discovers the clusters from the saved state, the inventory of its
+            # session is loaded by the first refresh of the vms check.
+            inventory.refresh()
+        vsan_clusters = inventory.get_vsan_clusters() if inventory else get_vsan_clusters(session.si)
+        clusters = select_clusters(vsan_clusters, args.cluster_names)
+        history = HistoryStore(args.history) if args.history else None
+        exporter = Exporter(session,
+                            clusters,
+                            checks=args.checks,
+                            intervals=dict(args.refresh),
+                            address=args.listen_address,
+                            port=args.listen_port,
+                            batch_size=args.batch_size,
+                            batch_parallel=args.batch_parallel,
+                            inventory=inventory,
+                            history=history)
+        print('Serving /metrics on port {} for {} clusters'.format(args.listen_port, len(clusters)))
+        try:
+            exporter.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if inventory is not None:
+                inventory.close()
+            if history is not None:
+                history.close()
+
+    if args.profile:
+        transport.render_summary()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import argparse
+import sys
+
+import libs.vsanmgmtObjects
+from libs.fleet import VCENTER_TIMEOUT, load_inventory, print_fleet_summary, run_fleet
+from queryvsancluster import add_check_args, get_check_kwargs, positive_int
+
+
+def get_args():
+    """ Supports the command-line arguments listed below. """
+    parser = argparse.ArgumentParser(description='Run the vSAN checks on a fleet of vCenters')
+    parser.add_argument('inventory', metavar='INVENTORY', help='JSON or YAML file listing the vCenters')
+    parser.add_argument('--processes', type=positive_int, default=None, metavar='N',
+                        help='Number of vCenters checked concurrently, one process each (default: CPU count)')
+    parser.add_argument('--timeout', type=float, default=VCENTER_TIMEOUT, metavar='SECONDS',
+                        help='Time after which the checks of a vCenter are aborted')
+    add_check_args(parser)
+    args = parser.parse_args()
+    return args
+
+
+def main():
+    args = get_args()
+    vcenters = load_inventory(args.inventory)
+
+    results = run_fleet(vcenters, processes=args.processes, timeout=args.timeout, **get_check_kwargs(args))
+    print_fleet_summary(results)
+
+    if any(x.error or x.failed for x in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import re
+import sys
+import time
+
+from datetime import datetime
+
+from libs.forecast import THRESHOLD, forecast_capacity, print_capacity_forecast
+from libs.history import HistoryStore
+from libs.util import convert_bytes
+
+# Seconds of each duration unit
+UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+
+
+def parse_duration(value: str) -> int:
+    """ Duration argument in seconds, e.g. 90, 45m, 12h or 30d """
+    match = re.fullmatch(r'(\d+)([smhdw]?)', value)
+    if match is None:
+        raise argparse.ArgumentTypeError('expected a number of seconds or a duration such as 45m, 12h or 30d')
+    return int(match.group(1)) * UNITS[match.group(2) or 's']
+
+
+def get_args():
+    """ Supports the command-line arguments listed below. """
+    parser = argparse.ArgumentParser(description='Print the capacity and health history of the vSAN clusters')
+    parser.add_argument('history', metavar='FILE', help='SQLite database written by the --history option')
+    parser.add_argument('--vcenter', help='vCenter of the series')
+    parser.add_argument('--cluster', help='Cluster of the series')
+    parser.add_argument('--metric', help='Metric of the series, e.g. capacity_free_bytes')
+    parser.add_argument('--since', type=parse_duration, default=parse_duration('30d'), metavar='DURATION',
+                        help='Start of the time range before now (default 30d)')
+    parser.add_argument('--step', type=parse_duration, metavar='DURATION',
+                        help='Average the samples in buckets of this duration, e.g. 1d')
+    parser.add_argument('--list', action='store_true', help='List the series instead of their samples')
+    parser.add_argument('--forecast', action='store_true',
+                        help='Forecast the days until the used and committed capacity of every cluster reach the '
+                             'threshold, from their trend since --since')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, metavar='PERCENT',
+                        help='Percentage of the capacity of the forecast (default {})'.format(THRESHOLD))
+    args = parser.parse_args()
+    if not (args.list or args.forecast) and not (args.cluster and args.metric):
+        parser.error('--cluster and --metric are required, unless --list or --forecast is given')
+    return args
+
+
+def format_value(metric: str, value: float) -> str:
+    return convert_bytes(value) if metric.endswith('_bytes') else '{:.2f}'.format(value)
+
+
+def main():
+    args = get_args()
+    history = HistoryStore(args.history)
+    try:
+        if args.list:
+            for _, vcenter, cluster, metric, labels in history.series(args.vcenter, args.cluster, args.metric):
+                print('{:<30} {:<30} {:<32} {}'.format(
+                    vcenter, cluster, metric, ','.join('{}={}'.format(k, v) for k, v in labels.items())))
+            return
+
+        if args.forecast:
+            forecasts = forecast_capacity(history, threshold=args.threshold, window=args.since)
+            print_capacity_forecast([x for x in forecasts if args.vcenter in (None, x.host_name) and
+                                     args.cluster in (None, x.cluster_name)], threshold=args.threshold)
+            return
+
+        series = history.query(args.cluster, args.metric, time.time() - args.since, vcenter=args.vcenter,
+                               step=args.step)
+    finally:
+        history.close()
+
+    if not series:
+        print('No history of {} for cluster {}'.format(args.metric, args.cluster))
+        sys.exit(1)
+
+    for x in series:
+        print('\n{} on host {}\n'.format(x.metric, x.vcenter),
+              ' Cluster: {}'.format(x.cluster))
+        for name, value in x.labels.items():
+            print('  {}: {}'.format(name.capitalize(), value))
+        print()
+        for ts, value, minimum, maximum in zip(x.timestamps, x.values, x.minimums, x.maximums):
+            print('  {}'.format(datetime.fromtimestamp(ts).isoformat(sep=' ')),
+                  'Value: {:>12}'.format(format_value(x.metric, value)),
+                  'Min: {:>12}'.format(format_value(x.metric, minimum)),
+                  'Max: {:>12}'.format(format_value(x.metric, maximum)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import argparse
+import getpass
+import math
+import ssl
+import time
+
+from datetime import datetime, timezone
+from typing import List
+
+import libs.vsanmgmtObjects
+from libs.perf import PERF_ENTITY_TYPES, PerfSeries, percentiles
+from libs.perfpoller import PerfPoller
+from libs.session import VsanSession
+from libs.vsanclustercheck import VsanClusterCheck
+from queryvsancluster import add_transport_args, get_transport, positive_int
+from queryvsanhistory import parse_duration
+
+
+def get_args():
+    """ Supports the command-line arguments listed below. """
+    parser = argparse.ArgumentParser(description='Print the vSAN performance metrics of the entities of a cluster')
+    parser.add_argument('-s', '--host', required=True, action='store', help='Remote host to connect to')
+    parser.add_argument('-o', '--port', type=int, default=443, action='store', help='Port to connect on')
+    parser.add_argument('-u', '--user', required=True, action='store', help='Username when connecting to host')
+    parser.add_argument('-p', '--password', required=False, action='store', help='Password when connecting to host')
+    parser.add_argument('--cluster', default='VSAN-Cluster', help='Cluster name')
+    parser.add_argument('--entity-types', nargs='+', default=PERF_ENTITY_TYPES, metavar='TYPE',
+                        help='Perf entity types, default: {}'.format(', '.join(PERF_ENTITY_TYPES)))
+    parser.add_argument('--since', type=parse_duration, default=parse_duration('1h'), metavar='DURATION',
+                        help='Start of the time window before now (default 1h)')
+    parser.add_argument('--interval', type=positive_int, metavar='SECONDS',
+                        help='Seconds between two samples, the interval of the perf service by default')
+    parser.add_argument('--checkpoint', metavar='FILE',
+                        help='JSON file of the newest sample read of each entity, only the newer samples are read '
+                             'and printed, e.g. by a cron job. --since is the window of the first run')
+    parser.add_argument('--version-cache', metavar='FILE', help='JSON file caching the vSAN API version per vCenter')
+    add_transport_args(parser)
+    args = parser.parse_args()
+    return args
+
+
+def print_perf_series(series: List[PerfSeries]) -> None:
+    if not series:
+        print('\nNo samples')
+
+    for entity in sorted(series, key=lambda x: x.entity_ref_id):
+        timestamps = [x for x in entity.timestamps if not math.isnan(x)]
+        print('\n{} ({} samples{})'.format(entity.entity_ref_id, len(timestamps), ', {} to {}'.format(
+            *[datetime.fromtimestamp(x, timezone.utc).strftime('%Y-%m-%d %H:%M:%S') for x in
+              [min(timestamps), max(timestamps)]]) if timestamps else ''))
+        for label, values in sorted(entity.metrics.items()):
+            print('  {:<20}'.format(label),
+                  ' '.join('{}: {:>14.2f}'.format(k, v) for k, v in percentiles(values).items()))
+
+
+def main():
+    args = get_args()
+    transport = get_transport(args)
+    if args.password or (transport and transport.offline):
+        password = args.password
+    else:
+        password = getpass.getpass(prompt='Enter password for host {} and user {}: '.format(args.host, args.user))
+
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+
+    session = VsanSession(host=args.host,
+                          user=args.user,
+                          password=password,
+                          port=int(args.port),
+                          context=context,
+                          version_cache=args.version_cache,
+                          transport=transport)
+    try:
+        vcc = VsanClusterCheck(cluster=args.cluster, session=session)
+
+        def query(start_time: datetime, end_time: datetime, entity_types: List[str] = None) -> List[PerfSeries]:
+            return vcc.collect_perf_metrics(start_time, end_time, entity_types=entity_types, interval=args.interval)
+
+        if args.checkpoint:
+            poller = PerfPoller(query, args.checkpoint, entity_types=args.entity_types,
+                                initial_lookback=args.since)
+            series = poller.poll()
+        else:
+            now = time.time()
+            series = query(datetime.fromtimestamp(now - args.since, timezone.utc),
+                           datetime.fromtimestamp(now, timezone.utc),
+                           entity_types=args.entity_types)
+    finally:
+        session.close()
+
+    print('\nvSAN performance on host {}\n'.format(args.host),
+          ' Cluster: {}'.format(args.cluster))
+    print_perf_series(series)
+
+    if args.profile:
+        transport.render_summary()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import getpass
+import ssl
+
+from datetime import datetime
+
+import libs.vsanmgmtObjects
+from libs.resync import RESYNC_MAX_INTERVAL, RESYNC_MIN_INTERVAL, ResyncMonitor
+from libs.session import VsanSession
+from libs.util import convert_bytes, convert_seconds
+from libs.vsanclustercheck import RESYNC_PAGE_SIZE, VsanClusterCheck
+from queryvsancluster import add_transport_args, get_transport, positive_float, positive_int
+
+
+def get_args():
+    """ Supports the command-line arguments listed below. """
+    parser = argparse.ArgumentParser(description='Follow the resync of the objects of a vSAN cluster')
+    parser.add_argument('-s', '--host', required=True, action='store', help='Remote host to connect to')
+    parser.add_argument('-o', '--port', type=int, default=443, action='store', help='Port to connect on')
+    parser.add_argument('-u', '--user', required=True, action='store', help='Username when connecting to host')
+    parser.add_argument('-p', '--password', required=False, action='store', help='Password when connecting to host')
+    parser.add_argument('--cluster', default='VSAN-Cluster', help='Cluster name')
+    parser.add_argument('--min-interval', type=positive_float, default=RESYNC_MIN_INTERVAL, metavar='SECONDS',
+                        help='Seconds between two polls while the resync progresses '
+                             '(default {})'.format(RESYNC_MIN_INTERVAL))
+    parser.add_argument('--max-interval', type=positive_float, default=RESYNC_MAX_INTERVAL, metavar='SECONDS',
+                        help='Seconds between two polls at most while it does not '
+                             '(default {})'.format(RESYNC_MAX_INTERVAL))
+    parser.add_argument('--objects', action='store_true',
+                        help='Read every syncing object at each poll and print the largest ones')
+    parser.add_argument('--page-size', type=positive_int, default=RESYNC_PAGE_SIZE, metavar='N',
+                        help='Number of syncing objects per query')
+    parser.add_argument('--top', type=positive_int, default=10, metavar='N', help='Number of objects printed with --objects')
+    parser.add_argument('--forever', action='store_true',
+                        help='Keep polling once there are no objects to sync, e.g. for a whole maintenance')
+    parser.add_argument('--version-cache', metavar='FILE', help='JSON file caching the vSAN API version per vCenter')
+    add_transport_args(parser)
+    args = parser.parse_args()
+    return args
+
+
+def main():
+    args = get_args()
+    transport = get_transport(args)
+    if args.password or (transport and transport.offline):
+        password = args.password
+    else:
+        password = getpass.getpass(prompt='Enter password for host {} and user {}: '.format(args.host, args.user))
+
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+
+    session = VsanSession(host=args.host,
+                          user=args.user,
+                          password=password,
+                          port=int(args.port),
+                          context=context,
+                          version_cache=args.version_cache,
+                          transport=transport)
+    try:
+        vcc = VsanClusterCheck(cluster=args.cluster, session=session)
+        monitor = ResyncMonitor(lambda: vcc.collect_resync_status(include_objects=args.objects,
+                                                                  page_size=args.page_size),
+                                min_interval=args.min_interval,
+                                max_interval=args.max_interval)
+
+        print('vSAN resync of cluster {} on host {}\n'.format(args.cluster, args.host))
+        print('{:<19} {:>8} {:>12} {:>10} {:>12} {:>10} {:>8}'.format(
+            'Time', 'Objects', 'To sync', 'vSAN ETA', 'Rate', 'ETA', 'Next'))
+        for progress in monitor.run(until_done=not args.forever):
+            result = progress.result
+            print('{:<19} {:>8} {:>12} {:>10} {:>12} {:>10} {:>7.0f}s'.format(
+                datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                result.objects_to_sync,
+                convert_bytes(result.bytes_to_sync),
+                convert_seconds(result.eta) if result.objects_to_sync else '-',
+                convert_bytes(progress.rate) + '/s' if progress.rate is not None else '-',
+                convert_seconds(progress.eta),
+                progress.interval), flush=True)
+            for obj in sorted(result.objects, key=lambda x: x.bytes_to_sync, reverse=True)[:args.top]:
+                print('  UUID: {}'.format(obj.uuid),
+                      'To sync: {:>10}'.format(convert_bytes(obj.bytes_to_sync)),
+                      'Reasons: {}'.format(','.join(obj.reasons)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        session.close()
+
+    if args.profile:
+        transport.render_summary()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Exporter against the synthetic vCenter of libs.fakevcenter, scraped over HTTP.
+
+Run from the repository root:
+  python -m pytest tests
+"""
+
+import threading
+import time
+import urllib.request
+
+import pytest
+
+import libs.vsanmgmtObjects
+from libs.exporter import Exporter
+from libs.fakevcenter import FakeVcenter, FakeVcenterServer
+from libs.inventory import get_vsan_clusters
+from libs.session import VsanSession
+from libs.transport import Redirector
+
+CHECKS = ['capacity', 'health', 'vms']
+
+# Seconds to wait for the first refresh of every collector
+REFRESH_TIMEOUT = 30
+
+
+def parse_metrics(text: str) -> dict:
+    """ Value of each series of a Prometheus text exposition, by 'family{labels}' """
+    series = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            series[name] = float(value)
+    return series
+
+
+@pytest.fixture(scope='module')
+def fake():
+    fake = FakeVcenter(clusters=2, hosts=3, vms=6, objects=18)
+    server = FakeVcenterServer(fake)
+    server.start()
+    yield fake, server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(scope='module')
+def metrics(fake):
+    fake, server = fake
+    session = VsanSession(host='vc.fake', user='fake', password='fake', transport=Redirector(server.address))
+    exporter = Exporter(session, get_vsan_clusters(session.si), checks=CHECKS, address='127.0.0.1', port=0)
+    thread = threading.Thread(target=exporter.serve_forever, daemon=True)
+    thread.start()
+    url = 'http://127.0.0.1:{}/metrics'.format(exporter.server.server_address[1])
+    try:
+        deadline = time.time() + REFRESH_TIMEOUT
+        while True:
+            with urllib.request.urlopen(url) as response:
+                content_type = response.headers['Content-Type']
+                series = parse_metrics(response.read().decode('utf-8'))
+            if sum(x.startswith('vsan_exporter_collector_up{') for x in series) == 2 * len(CHECKS):
+                break
+            assert time.time() < deadline, 'collectors not refreshed after {} s'.format(REFRESH_TIMEOUT)
+            time.sleep(0.1)
+        yield content_type, series
+    finally:
+        exporter.server.shutdown()
+        thread.join()
+        session.close()
+
+
+def test_content_type(metrics):
+    content_type, _ = metrics
+    assert content_type.startswith('text/plain; version=0.0.4')
+
+
+def test_collectors_up(metrics):
+    _, series = metrics
+    for cluster in ['cluster-1', 'cluster-2']:
+        for check in CHECKS:
+            key = 'vsan_exporter_collector_up{{vcenter="vc.fake",cluster="{}",check="{}"}}'.format(cluster, check)
+            assert series[key] == 1
+
+
+def test_capacity(fake, metrics):
+    fake, _ = fake
+    _, series = metrics
+    for cluster_id, cluster in [('domain-c1', 'cluster-1'), ('domain-c2', 'cluster-2')]:
+        space_usage = fake.cluster_data[cluster_id]['space_usage']
+        labels = '{{vcenter="vc.fake",cluster="{}"}}'.format(cluster)
+        assert series['vsan_capacity_total_bytes' + labels] == space_usage.totalCapacityB
+        assert series['vsan_capacity_free_bytes' + labels] == space_usage.freeCapacityB
+
+
+def test_objects(fake, metrics):
+    fake, _ = fake
+    _, series = metrics
+    health_counts = fake.cluster_data['domain-c1']['health_counts']
+    for health, count in health_counts.items():
+        assert series['vsan_objects{{vcenter="vc.fake",cluster="cluster-1",health="{}"}}'.format(health)] == count
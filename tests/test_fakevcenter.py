@@ -0,0 +1,60 @@
+"""
+Faults and test histories of the synthetic vCenter of libs.fakevcenter.
+
+Run from the repository root:
+  python -m pytest tests
+"""
+
+import pytest
+
+import libs.vsanmgmtObjects
+from libs.fakevcenter import HISTORY_TESTS, HISTORY_VMDKS, FakeVcenter, FakeVcenterServer
+from libs.session import VsanSession
+from libs.transport import Redirector
+from libs.vsanclustercheck import VsanClusterCheck
+from pyVmomi import vmodl
+
+HOSTS = 3
+
+
+@pytest.fixture(scope='module')
+def session():
+    server = FakeVcenterServer(FakeVcenter(clusters=1, hosts=HOSTS, vms=6, objects=18))
+    server.start()
+    session = VsanSession(host='vc.fake', user='fake', password='fake', transport=Redirector(server.address))
+    yield session
+    session.close()
+    server.shutdown()
+    server.server_close()
+
+
+def test_method_not_found(session):
+    vcc = VsanClusterCheck(cluster='cluster-1', session=session)
+    vhs = vcc.vc_mos['vsan-cluster-health-system']
+    with pytest.raises(vmodl.fault.MethodNotFound) as error:
+        vhs.VsanQueryVcClusterCreateVmHealthHistoryTest(cluster=vcc.cluster_instance)
+    assert error.value.method == 'VsanQueryVcClusterCreateVmHealthHistoryTest'
+    assert error.value.receiver._moId == vhs._moId
+
+
+@pytest.mark.parametrize('mass_collector', [False, True])
+def test_network_performance_history(session, mass_collector):
+    vcc = VsanClusterCheck(cluster='cluster-1', session=session)
+    if mass_collector:
+        vcc.prefetch(['network-history'])
+        assert 'clusterNetworkPerfHistoryTest' in vcc.prefetched
+    result = vcc.collect_cluster_network_performance_history()
+    assert len(result.hosts) == HOSTS
+    assert all(len(x.metrics['bandwidth_bps']) == HISTORY_TESTS for x in result.hosts)
+    assert result == VsanClusterCheck(cluster='cluster-1', session=session).collect_cluster_network_performance_history()
+
+
+@pytest.mark.parametrize('mass_collector', [False, True])
+def test_vmdk_load_history(session, mass_collector):
+    vcc = VsanClusterCheck(cluster='cluster-1', session=session)
+    if mass_collector:
+        vcc.prefetch(['vmdk-history'])
+        assert 'clusterVmdkLoadHistoryTest' in vcc.prefetched
+    result = vcc.collect_cluster_vmk_load_history(count=3 if not mass_collector else 10)
+    tests = 3 if not mass_collector else HISTORY_TESTS
+    assert all(len(x.metrics['iops']) == tests * HISTORY_VMDKS for x in result.hosts)
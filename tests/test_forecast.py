@@ -0,0 +1,77 @@
+"""
+Capacity exhaustion forecast of libs.forecast, from the samples of a history store.
+
+Run from the repository root:
+  python -m pytest tests
+"""
+
+import time
+
+import pytest
+
+from libs.forecast import fit, forecast_capacity
+from libs.history import HistoryStore
+
+DAY = 86400
+# Recent samples, the first append compacts the store at the current time.
+NOW = int(time.time()) // DAY * DAY
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'))
+    yield store
+    store.close()
+
+
+def add_days(store: HistoryStore, cluster: str, used: list, committed: list = None) -> None:
+    """ One sample a day, the last one now """
+    committed = committed or used
+    for i, (x, y) in enumerate(zip(used, committed)):
+        store.append('vc', cluster, [('capacity_used_percent', {}, x), ('capacity_committed_percent', {}, y)],
+                     timestamp=NOW - (len(used) - 1 - i) * DAY)
+
+
+def test_fit_line():
+    # y = 50 + t / DAY at t = -2, -1 and 0 days
+    times = [-2 * DAY, -DAY, 0]
+    values = [48., 49., 50.]
+    trend = fit(3, sum(times), sum(x * x for x in times), sum(values), sum(x * y for x, y in zip(times, values)),
+                values[-1], threshold=80)
+    assert trend.percent == 50.
+    assert trend.growth == pytest.approx(1.)
+    assert trend.days == pytest.approx(30.)
+
+
+def test_fit_constant_time():
+    assert fit(3, 0., 0., 150., 0., 50., threshold=80) is None
+
+
+def test_forecast(store):
+    add_days(store, 'growing', [40. + i for i in range(11)])
+    add_days(store, 'fast', [60. + 2 * i for i in range(6)], committed=[70.] * 6)
+    add_days(store, 'flat', [30.] * 10)
+    add_days(store, 'full', [85., 85., 85.])
+    add_days(store, 'new', [10., 11.])
+
+    forecasts = forecast_capacity(store, threshold=80, now=NOW)
+    assert [x.cluster_name for x in forecasts] == ['full', 'fast', 'growing', 'flat']
+
+    full, fast, growing, flat = forecasts
+    assert full.used.days == 0
+    assert fast.used.days == pytest.approx(5.)
+    assert fast.committed.days is None
+    assert growing.samples == 11
+    assert growing.last_sample == NOW
+    assert growing.used.percent == 50.
+    assert growing.used.growth == pytest.approx(1.)
+    assert growing.used.days == pytest.approx(30.)
+    assert flat.used.growth == pytest.approx(0.)
+    assert flat.used.days is None
+
+
+def test_forecast_window(store):
+    add_days(store, 'growing', [10.] * 20 + [10. + 5 * i for i in range(1, 11)])
+    recent, = forecast_capacity(store, threshold=80, window=10 * DAY, now=NOW)
+    assert recent.samples == 11
+    assert recent.used.growth == pytest.approx(5.)
@@ -0,0 +1,105 @@
+"""
+Samples, compaction and transactions of libs.history.
+
+Run from the repository root:
+  python -m pytest tests
+"""
+
+import sqlite3
+import time
+
+import pytest
+
+from libs.history import HistoryStore
+
+DAY = 86400
+# Recent samples, the first append compacts the store at the current time.
+NOW = int(time.time()) // DAY * DAY
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'))
+    yield store
+    store.close()
+
+
+def test_append_and_query(store):
+    for i in range(5):
+        store.append('vc', 'cluster-1', [('capacity_free_bytes', {}, 100. - i),
+                                         ('disk_fullness_percent', {'disk': 'd1'}, 10. * i)], timestamp=NOW + i * 60)
+    store.append('vc', 'cluster-2', [('capacity_free_bytes', {}, 7.)], timestamp=NOW)
+
+    series, = store.query('cluster-1', 'capacity_free_bytes', start=NOW, end=NOW + DAY)
+    assert (series.vcenter, series.cluster, series.labels) == ('vc', 'cluster-1', {})
+    assert list(series.timestamps) == [NOW + i * 60 for i in range(5)]
+    assert list(series.values) == [100., 99., 98., 97., 96.]
+
+    series, = store.query('cluster-1', 'disk_fullness_percent', start=NOW, end=NOW + DAY)
+    assert series.labels == {'disk': 'd1'}
+    assert [x[3] for x in store.series(cluster='cluster-1')] == ['capacity_free_bytes', 'disk_fullness_percent']
+
+
+def test_query_step(store):
+    store.append('vc', 'cluster-1', [('capacity_free_bytes', {}, 10.)], timestamp=NOW)
+    store.append('vc', 'cluster-1', [('capacity_free_bytes', {}, 30.)], timestamp=NOW + 600)
+    store.append('vc', 'cluster-1', [('capacity_free_bytes', {}, 5.)], timestamp=NOW + 3600)
+    series, = store.query('cluster-1', 'capacity_free_bytes', start=NOW, end=NOW + DAY, step=3600)
+    assert list(series.timestamps) == [NOW, NOW + 3600]
+    assert list(series.values) == [20., 5.]
+    assert list(series.minimums) == [10., 5.]
+    assert list(series.maximums) == [30., 5.]
+
+
+def test_same_second_replaced(store):
+    store.append('vc', 'cluster-1', [('capacity_free_bytes', {}, 1.)], timestamp=NOW)
+    store.append('vc', 'cluster-1', [('capacity_free_bytes', {}, 2.), ('capacity_total_bytes', {}, None)],
+                 timestamp=NOW)
+    series, = store.query('cluster-1', 'capacity_free_bytes', start=NOW, end=NOW + 1)
+    assert list(series.values) == [2.]
+    assert store.query('cluster-1', 'capacity_total_bytes', start=NOW, end=NOW + 1) == []
+
+
+def test_compaction(store):
+    # Two samples an hour for 10 days, the ones older than 7 days are rolled up into hourly samples.
+    start = NOW - 10 * DAY
+    for i in range(10 * 48):
+        store.append('vc', 'cluster-1', [('capacity_free_bytes', {}, float(i % 2))], timestamp=start + i * 1800)
+    store.compact(now=NOW)
+
+    counts = dict(store.fetch('SELECT resolution, count(*) FROM samples GROUP BY resolution'))
+    assert counts[3600] == 3 * 24
+    assert counts[0] == 7 * 48
+    hourly = store.fetch('SELECT value, min, max, count FROM samples WHERE resolution = 3600')
+    assert set(hourly) == {(0.5, 0., 1., 2)}
+
+    # The query reads every resolution, the history is not cut at the retention of the raw samples.
+    series, = store.query('cluster-1', 'capacity_free_bytes', start=start, end=NOW, step=DAY)
+    assert len(series.timestamps) == 10
+    assert all(x == 0.5 for x in series.values)
+
+    # A second compaction of the same time does not average the hourly samples again.
+    store.compact(now=NOW)
+    assert dict(store.fetch('SELECT resolution, count(*) FROM samples GROUP BY resolution')) == counts
+
+
+def test_rolled_back_series_not_cached(store):
+    with pytest.raises(sqlite3.Error):
+        store.append('vc', 'cluster-1', [('capacity_free_bytes', {}, object())], timestamp=NOW)
+    assert store.series() == []
+    assert store.series_ids == {}
+
+    store.append('vc', 'cluster-1', [('capacity_free_bytes', {}, 1.)], timestamp=NOW)
+    series, = store.query('cluster-1', 'capacity_free_bytes', start=NOW, end=NOW + 1)
+    assert list(series.values) == [1.]
+
+
+def test_shared_database(store, tmp_path):
+    other = HistoryStore(str(tmp_path / 'history.db'))
+    try:
+        other.append('vc', 'cluster-1', [('capacity_free_bytes', {}, 1.)], timestamp=NOW)
+        store.append('vc', 'cluster-1', [('capacity_free_bytes', {}, 2.)], timestamp=NOW + 60)
+        series, = other.query('cluster-1', 'capacity_free_bytes', start=NOW, end=NOW + DAY)
+        assert list(series.values) == [1., 2.]
+    finally:
+        other.close()
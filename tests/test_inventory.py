@@ -0,0 +1,78 @@
+"""
+Cluster discovery and selection of libs.inventory and libs.inventorycache, against libs.fakevcenter.
+
+Run from the repository root:
+  python -m pytest tests
+"""
+
+import pytest
+
+import libs.vsanmgmtObjects
+from libs.fakevcenter import FakeVcenter, FakeVcenterServer
+from libs.inventory import get_cluster_vms, get_vsan_clusters, select_clusters
+from libs.inventorycache import InventoryCache
+from libs.session import VsanSession
+from libs.transport import Redirector
+
+SHARED_NAMES = ['Datacenter-1/cluster-1', 'Datacenter-1/cluster-2', 'Datacenter-2/cluster-1',
+                'Datacenter-2/cluster-2']
+
+
+def connect(fake: FakeVcenter):
+    server = FakeVcenterServer(fake)
+    server.start()
+    session = VsanSession(host='vc.fake', user='fake', password='fake', transport=Redirector(server.address))
+    return server, session
+
+
+@pytest.fixture(scope='module')
+def session():
+    server, session = connect(FakeVcenter(datacenters=2, clusters=2, hosts=2, vms=4, objects=4))
+    yield session
+    session.close()
+    server.shutdown()
+    server.server_close()
+
+
+def test_unique_names():
+    server, session = connect(FakeVcenter(clusters=2, hosts=2, vms=4, objects=4))
+    try:
+        assert sorted(get_vsan_clusters(session.si)) == ['cluster-1', 'cluster-2']
+    finally:
+        session.close()
+        server.shutdown()
+        server.server_close()
+
+
+def test_shared_names(session):
+    clusters = get_vsan_clusters(session.si)
+    assert sorted(clusters) == SHARED_NAMES
+    assert len({x._moId for x in clusters.values()}) == len(SHARED_NAMES)
+
+
+@pytest.mark.parametrize('patterns, expected', [
+    (['*'], SHARED_NAMES),
+    (['cluster-1'], ['Datacenter-1/cluster-1', 'Datacenter-2/cluster-1']),
+    (['Datacenter-2/*'], ['Datacenter-2/cluster-1', 'Datacenter-2/cluster-2']),
+    (['Datacenter-1/cluster-2', 'nope'], ['Datacenter-1/cluster-2']),
+])
+def test_select_clusters(session, patterns, expected):
+    assert list(select_clusters(get_vsan_clusters(session.si), patterns)) == expected
+
+
+def test_clusters_keep_their_vms(session):
+    clusters = get_vsan_clusters(session.si)
+    vms = [{x.moref for x in get_cluster_vms(session.si, clusters[name])} for name in SHARED_NAMES]
+    assert all(vms)
+    assert len(set.union(*vms)) == sum(len(x) for x in vms)
+
+
+def test_inventory_cache(session):
+    inventory = InventoryCache(session.si)
+    try:
+        inventory.refresh()
+        cached = inventory.get_vsan_clusters()
+        assert {k: v._moId for k, v in cached.items()} == {k: v._moId for k, v in
+                                                           get_vsan_clusters(session.si).items()}
+    finally:
+        inventory.close()
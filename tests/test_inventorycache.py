@@ -0,0 +1,122 @@
+"""
+Change-driven refresh and persistence of libs.inventorycache, against libs.fakevcenter.
+
+Run from the repository root:
+  python -m pytest tests
+"""
+
+import json
+
+import pytest
+
+import libs.vsanmgmtObjects
+from libs.fakevcenter import FakeVcenter, FakeVcenterServer
+from libs.inventory import get_cluster_vms, get_vsan_clusters
+from libs.inventorycache import InventoryCache
+from libs.session import VsanSession
+from libs.transport import Redirector
+from pyVmomi import vim
+
+
+@pytest.fixture
+def fake():
+    fake = FakeVcenter(clusters=2, hosts=3, vms=12, objects=4)
+    server = FakeVcenterServer(fake)
+    server.start()
+    session = VsanSession(host='vc.fake', user='fake', password='fake', transport=Redirector(server.address))
+    yield fake, session
+    session.close()
+    server.shutdown()
+    server.server_close()
+
+
+def change(fake: FakeVcenter, mo_id: str, **props) -> None:
+    """ Replace properties of an object and wake up the pending WaitForUpdatesEx calls """
+    with fake.changed:
+        fake.props[mo_id][1].update(props)
+        fake.changed.notify_all()
+
+
+def remove(fake: FakeVcenter, mo_id: str) -> None:
+    with fake.changed:
+        del fake.props[mo_id]
+        fake.changed.notify_all()
+
+
+def cached_vms(inventory: InventoryCache, session, cluster: str) -> list:
+    return inventory.get_cluster_vms(get_vsan_clusters(session.si)[cluster])
+
+
+def test_matches_inventory(fake):
+    fake, session = fake
+    inventory = InventoryCache(session.si, max_object_updates=5)
+    try:
+        inventory.refresh()
+        clusters = get_vsan_clusters(session.si)
+        assert {k: v._moId for k, v in inventory.get_vsan_clusters().items()} == \
+               {k: v._moId for k, v in clusters.items()}
+        for cluster in clusters.values():
+            assert inventory.get_cluster_vms(cluster) == get_cluster_vms(session.si, cluster)
+        assert inventory.find_cluster('cluster-2')._moId == clusters['cluster-2']._moId
+    finally:
+        inventory.close()
+
+
+def test_changes_applied(fake):
+    fake, session = fake
+    inventory = InventoryCache(session.si)
+    try:
+        inventory.refresh()
+        version = inventory.version
+        cluster = get_vsan_clusters(session.si)['cluster-1']
+        first, second = cached_vms(inventory, session, 'cluster-1')[:2]
+        hosts = fake.props[cluster._moId][1]['host']
+
+        change(fake, first.moref, name='renamed')
+        change(fake, second.moref, **{'runtime.host': vim.HostSystem(hosts[-1]._moId)})
+        inventory.refresh()
+        assert inventory.version != version
+        vms = {x.moref: x for x in inventory.get_cluster_vms(cluster)}
+        assert vms[first.moref].name == 'renamed'
+        assert vms[second.moref].host_name == fake.props[hosts[-1]._moId][1]['name']
+        # The fake does not move the VM in the 'vm' lists of the hosts, only the order on a host differs.
+        assert set(inventory.get_cluster_vms(cluster)) == set(get_cluster_vms(session.si, cluster))
+
+        remove(fake, first.moref)
+        inventory.refresh()
+        assert first.moref not in {x.moref for x in inventory.get_cluster_vms(cluster)}
+        assert first.moref not in inventory.vms
+
+        version = inventory.version
+        inventory.refresh()
+        assert inventory.version == version
+    finally:
+        inventory.close()
+
+
+def test_saved_state(fake, tmp_path):
+    fake, session = fake
+    path = str(tmp_path / 'inventory.json')
+    inventory = InventoryCache(session.si, path=path)
+    try:
+        assert not inventory.loaded
+        inventory.refresh()
+    finally:
+        inventory.close()
+
+    restarted = InventoryCache(session.si, path=path)
+    try:
+        assert restarted.loaded
+        cluster = get_vsan_clusters(session.si)['cluster-1']
+        assert restarted.get_cluster_vms(cluster) == get_cluster_vms(session.si, cluster)
+    finally:
+        restarted.close()
+
+
+def test_saved_state_of_another_vcenter(fake, tmp_path):
+    fake, session = fake
+    path = tmp_path / 'inventory.json'
+    path.write_text(json.dumps({'instance_uuid': 'another', 'clusters': {}, 'hosts': {}, 'vms': {}}))
+    inventory = InventoryCache(session.si, path=str(path))
+    assert not inventory.loaded
+    inventory.close()
@@ -0,0 +1,66 @@
+"""
+Output ordering and errors of libs.parallel.run_ordered.
+
+Run from the repository root:
+  python -m pytest tests
+"""
+
+import sys
+import threading
+import time
+
+import pytest
+
+from libs.parallel import run_ordered
+
+
+def printing_task(index: int, delay: float, lines: int = 3):
+    def task():
+        for line in range(lines):
+            print('task {} line {}'.format(index, line))
+            time.sleep(delay / lines)
+    return task
+
+
+def expected_output(count: int, lines: int = 3) -> str:
+    return ''.join('task {} line {}\n'.format(i, x) for i in range(count) for x in range(lines))
+
+
+@pytest.mark.parametrize('parallel', [1, 4])
+def test_output_in_task_order(capsys, parallel):
+    # The first tasks are the slowest, they finish last.
+    run_ordered([printing_task(i, 0.05 * (4 - i)) for i in range(4)], parallel=parallel)
+    assert capsys.readouterr().out == expected_output(4)
+
+
+def test_tasks_run_concurrently():
+    barrier = threading.Barrier(4, timeout=5)
+    run_ordered([barrier.wait for _ in range(4)], parallel=4)
+
+
+def test_error_after_previous_output(capsys):
+    def failing():
+        print('partial output')
+        raise ValueError('task failed')
+
+    with pytest.raises(ValueError, match='task failed'):
+        run_ordered([printing_task(0, 0.05), printing_task(1, 0), failing, printing_task(3, 0)], parallel=4)
+    assert capsys.readouterr().out == expected_output(2)
+
+
+def test_nested_output(capsys):
+    def nested(index: int):
+        def task():
+            print('outer {}'.format(index))
+            run_ordered([printing_task(index * 10 + i, 0.01 * (2 - i), lines=1) for i in range(2)], parallel=2)
+        return task
+
+    run_ordered([nested(i) for i in range(3)], parallel=3)
+    expected = ''.join('outer {}\ntask {} line 0\ntask {} line 0\n'.format(i, i * 10, i * 10 + 1) for i in range(3))
+    assert capsys.readouterr().out == expected
+
+
+def test_stdout_restored():
+    stdout = sys.stdout
+    run_ordered([printing_task(i, 0) for i in range(2)], parallel=2)
+    assert sys.stdout is stdout
@@ -0,0 +1,140 @@
+"""
+Windows and high-water marks of libs.perfpoller, against a synthetic perf service.
+
+Run from the repository root:
+  python -m pytest tests
+"""
+
+import json
+
+from array import array
+
+import pytest
+
+from libs.perf import PerfSeries
+from libs.perfpoller import PerfPoller
+
+ENTITY_TYPE = 'virtual-machine'
+SAMPLE_INTERVAL = 300
+POLL_INTERVAL = 300
+START = 100 * 3600
+
+
+class FakePerfService(object):
+    """ Samples every SAMPLE_INTERVAL seconds of each VM, 'lag' seconds late, between 'first' and 'last' """
+
+    def __init__(self):
+        self.now = START
+        self.vms = {}
+        self.requests = []
+        self.fail = False
+
+    def add(self, name: str, lag: float = 0, first: float = 0, last: float = float('inf')) -> None:
+        self.vms['{}:{}'.format(ENTITY_TYPE, name)] = (lag, first, last)
+
+    def query(self, start_time, end_time, entity_types=None):
+        if self.fail:
+            raise RuntimeError('perf service unavailable')
+        start, end = start_time.timestamp(), end_time.timestamp()
+        self.requests.append((start, end))
+        series = []
+        for entity_ref_id, (lag, first, last) in self.vms.items():
+            if self.now > last:
+                continue
+            timestamps = array('d', [x for x in range(0, int(end) + 1, SAMPLE_INTERVAL)
+                                     if start <= x <= self.now - lag and first <= x <= last])
+            series.append(PerfSeries(entity_ref_id, timestamps, {'iopsRead': array('d', timestamps)}))
+        return series
+
+
+@pytest.fixture
+def service():
+    return FakePerfService()
+
+
+@pytest.fixture
+def poller(service, tmp_path):
+    return PerfPoller(service.query, str(tmp_path / 'checkpoint.json'), entity_types=[ENTITY_TYPE],
+                      window=3600, initial_lookback=3 * 3600)
+
+
+def poll(service, poller):
+    service.now += POLL_INTERVAL
+    service.requests = []
+    return {x.entity_ref_id: list(x.timestamps) for x in poller.poll(now=service.now)}
+
+
+def test_first_poll_split_in_windows(service, poller):
+    service.add('vm-1')
+    poll(service, poller)
+    assert [end - start for start, end in service.requests] == [3600] * 3
+    assert service.requests[0][0] == service.now - 3 * 3600
+    assert service.requests[-1][1] == service.now
+
+
+def test_samples_read_once(service, poller):
+    service.add('vm-1')
+    seen = poll(service, poller)[ENTITY_TYPE + ':vm-1']
+    first = service.now - 3 * 3600
+    for _ in range(20):
+        seen.extend(poll(service, poller).get(ENTITY_TYPE + ':vm-1', []))
+    assert seen == list(range(first, service.now + 1, SAMPLE_INTERVAL))
+
+
+def test_lagging_entity_gets_late_samples(service, poller):
+    service.add('vm-1')
+    service.add('vm-2', lag=1500)
+    seen = []
+    for _ in range(20):
+        seen.extend(poll(service, poller).get(ENTITY_TYPE + ':vm-2', []))
+    assert seen == list(range(int(seen[0]), service.now - 1500 + 1, SAMPLE_INTERVAL))
+
+
+def test_removed_entity_does_not_grow_window(service, poller):
+    service.add('vm-1')
+    service.add('vm-2', lag=900, last=START + 3 * POLL_INTERVAL)
+    for _ in range(3):
+        poll(service, poller)
+    spans = []
+    for _ in range(10):
+        poll(service, poller)
+        spans.append(sum(end - start for start, end in service.requests))
+    assert max(spans) <= spans[0]
+    assert spans[-1] == spans[-2]
+    assert ENTITY_TYPE + ':vm-2' not in poller.checkpoint['entities']
+    assert ENTITY_TYPE + ':vm-1' in poller.checkpoint['entities']
+
+
+def test_entity_forgotten_after_max_misses(service, poller):
+    service.add('vm-1')
+    service.add('vm-2', last=START + POLL_INTERVAL)
+    poll(service, poller)
+    poll(service, poller)
+    assert poller.checkpoint['misses'] == {ENTITY_TYPE + ':vm-2': 1}
+    poll(service, poller)
+    assert ENTITY_TYPE + ':vm-2' not in poller.checkpoint['entities']
+    assert poller.checkpoint['misses'] == {}
+
+
+def test_failed_poll_keeps_checkpoint(service, poller, tmp_path):
+    service.add('vm-1')
+    poll(service, poller)
+    saved = json.loads((tmp_path / 'checkpoint.json').read_text())
+
+    service.fail = True
+    with pytest.raises(RuntimeError):
+        poll(service, poller)
+    assert poller.checkpoint == saved
+    assert json.loads((tmp_path / 'checkpoint.json').read_text()) == saved
+
+    service.fail = False
+    samples = poll(service, poller)[ENTITY_TYPE + ':vm-1']
+    assert samples == list(range(service.now - 2 * POLL_INTERVAL + SAMPLE_INTERVAL, service.now + 1,
+                                 SAMPLE_INTERVAL))
+
+
+def test_checkpoint_reloaded(service, poller, tmp_path):
+    service.add('vm-1')
+    poll(service, poller)
+    reloaded = PerfPoller(service.query, str(tmp_path / 'checkpoint.json'), entity_types=[ENTITY_TYPE])
+    assert reloaded.checkpoint == poller.checkpoint
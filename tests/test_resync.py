@@ -0,0 +1,90 @@
+"""
+Resync status paging, command-line arguments and adaptive monitor of queryvsanresync.py.
+
+Run from the repository root:
+  python -m pytest tests
+"""
+
+import argparse
+
+import pytest
+
+import libs.vsanmgmtObjects
+from libs.fakevcenter import FakeVcenter, FakeVcenterServer
+from libs.resync import ResyncMonitor
+from libs.results import ResyncResult
+from libs.session import VsanSession
+from libs.transport import Redirector
+from libs.vsanclustercheck import VsanClusterCheck
+from queryvsancluster import positive_float, positive_int
+
+
+@pytest.fixture(scope='module')
+def vcc():
+    server = FakeVcenterServer(FakeVcenter(clusters=1, hosts=4, vms=20, objects=400, resync_rate=0))
+    server.start()
+    session = VsanSession(host='vc.fake', user='fake', password='fake', transport=Redirector(server.address))
+    yield VsanClusterCheck(cluster='cluster-1', session=session)
+    session.close()
+    server.shutdown()
+    server.server_close()
+
+
+def resync_result(bytes_to_sync: int, objects_to_sync: int = 1) -> ResyncResult:
+    return ResyncResult(host_name='vc.fake', cluster_name='cluster-1', objects_to_sync=objects_to_sync,
+                        bytes_to_sync=bytes_to_sync, eta=None, active_objects=None, queued_objects=None,
+                        suspended_objects=None, objects=[])
+
+
+@pytest.mark.parametrize('value, expected', [('1', 1), ('50', 50)])
+def test_positive_int(value, expected):
+    assert positive_int(value) == expected
+
+
+@pytest.mark.parametrize('value', ['0', '-3', '1.5', 'ten', ''])
+def test_positive_int_rejected(value):
+    with pytest.raises(argparse.ArgumentTypeError):
+        positive_int(value)
+
+
+@pytest.mark.parametrize('value, expected', [('0.5', 0.5), ('5', 5.)])
+def test_positive_float(value, expected):
+    assert positive_float(value) == expected
+
+
+@pytest.mark.parametrize('value', ['0', '-1', 'nan', 'inf', 'five'])
+def test_positive_float_rejected(value):
+    with pytest.raises(argparse.ArgumentTypeError):
+        positive_float(value)
+
+
+def test_pages_read_in_full(vcc):
+    totals = vcc.collect_resync_status(include_objects=False)
+    assert totals.objects_to_sync > 0
+    for page_size in [1, 3, totals.objects_to_sync, 1000]:
+        result = vcc.collect_resync_status(page_size=page_size)
+        assert len(result.objects) == totals.objects_to_sync
+        assert len({x.uuid for x in result.objects}) == totals.objects_to_sync
+        assert sum(x.bytes_to_sync for x in result.objects) == totals.bytes_to_sync
+
+
+@pytest.mark.parametrize('page_size', [0, -1])
+def test_page_size_rejected(vcc, page_size):
+    with pytest.raises(ValueError):
+        vcc.collect_resync_status(page_size=page_size)
+
+
+def test_monitor_backoff():
+    monitor = ResyncMonitor(lambda: None, min_interval=5, max_interval=30, backoff=2)
+    intervals = [monitor.update(resync_result(1000), timestamp=i).interval for i in range(5)]
+    assert intervals == [5, 10, 20, 30, 30]
+    assert monitor.update(resync_result(900), timestamp=5).interval == 5
+
+
+def test_monitor_rate_and_eta():
+    monitor = ResyncMonitor(lambda: None, rate_weight=1)
+    assert monitor.update(resync_result(1000), timestamp=0).rate is None
+    progress = monitor.update(resync_result(600), timestamp=10)
+    assert progress.rate == 40
+    assert progress.eta == 15
+    assert monitor.update(resync_result(0, objects_to_sync=0), timestamp=20).eta == 0
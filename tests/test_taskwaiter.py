@@ -0,0 +1,87 @@
+"""
+Futures, deadlines and progress callbacks of libs.taskwaiter, against the tasks of libs.fakevcenter.
+
+Run from the repository root:
+  python -m pytest tests
+"""
+
+import pytest
+
+import libs.vsanmgmtObjects
+from libs.fakevcenter import FakeVcenter, FakeVcenterServer
+from libs.session import VsanSession
+from libs.taskwaiter import TaskWaiter
+from libs.transport import Redirector
+from pyVmomi import vim
+
+# Seconds to wait for a future of the tests, well above the task durations
+RESULT_TIMEOUT = 10
+
+
+@pytest.fixture(scope='module')
+def fake():
+    fake = FakeVcenter(clusters=1, hosts=1, vms=1, objects=1)
+    server = FakeVcenterServer(fake)
+    server.start()
+    yield fake, server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def waiter(fake):
+    fake, server = fake
+    fake.task_duration = 0.2
+    session = VsanSession(host='vc.fake', user='fake', password='fake', transport=Redirector(server.address))
+    waiter = TaskWaiter(session.si, max_wait_seconds=1)
+    yield waiter
+    waiter.close()
+    session.close()
+
+
+def start_task(fake, waiter: TaskWaiter, result: str = 'done') -> vim.Task:
+    return vim.Task(fake[0].start_task(result)._moId, waiter.si._stub)
+
+
+def test_result_and_progress(fake, waiter):
+    progress = []
+    future = waiter.submit(start_task(fake, waiter), on_progress=lambda task, value: progress.append(value))
+    assert future.result(timeout=RESULT_TIMEOUT) == 'done'
+    assert progress and progress[-1] == 100
+    assert not waiter.pending
+
+
+def test_wait_many(fake, waiter):
+    tasks = [start_task(fake, waiter, result='task {}'.format(i)) for i in range(5)]
+    assert waiter.wait(tasks, timeout=RESULT_TIMEOUT) == ['task {}'.format(i) for i in range(5)]
+
+
+def test_deadline(fake, waiter):
+    fake[0].task_duration = 30
+    future = waiter.submit(start_task(fake, waiter), timeout=0.5)
+    error = future.exception(timeout=RESULT_TIMEOUT)
+    assert isinstance(error, TimeoutError)
+    assert 'deadline' in str(error)
+    assert not waiter.pending
+
+
+def test_failing_progress_callback(fake, waiter, caplog):
+    def on_progress(task, value):
+        raise ValueError('callback error')
+
+    future = waiter.submit(start_task(fake, waiter), on_progress=on_progress)
+    assert future.result(timeout=RESULT_TIMEOUT) == 'done'
+    assert 'callback error' in caplog.text
+
+    # The waiter thread survived the callback errors and serves the next tasks.
+    assert waiter.submit(start_task(fake, waiter)).result(timeout=RESULT_TIMEOUT) == 'done'
+    assert waiter.thread.is_alive()
+
+
+def test_closed_waiter(fake, waiter):
+    fake[0].task_duration = 30
+    future = waiter.submit(start_task(fake, waiter))
+    waiter.close()
+    assert future.cancelled()
+    with pytest.raises(RuntimeError):
+        waiter.submit(start_task(fake, waiter))
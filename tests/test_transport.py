@@ -0,0 +1,86 @@
+"""
+Record and replay of the API calls by libs.transport, against the synthetic vCenter of libs.fakevcenter.
+
+Run from the repository root:
+  python -m pytest tests
+"""
+
+import gzip
+import http.client
+import json
+import zlib
+
+import pytest
+
+import libs.vsanmgmtObjects
+from libs.fakevcenter import FakeVcenter, FakeVcenterServer
+from libs.session import VsanSession
+from libs.transport import Recorder, Redirector, Replayer, Transport, decode_body
+from libs.vsanclustercheck import VsanClusterCheck
+
+BODY = b'<soapenv:Envelope>' + b'x' * 1000 + b'</soapenv:Envelope>'
+
+
+class ClosingTransport(Redirector):
+    closed = False
+
+    def close(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture(scope='module')
+def server():
+    server = FakeVcenterServer(FakeVcenter(clusters=1, hosts=3, vms=6, objects=18))
+    server.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def collect(transport: Transport) -> tuple:
+    session = VsanSession(host='vc.fake', user='fake', password='fake', transport=transport)
+    try:
+        vcc = VsanClusterCheck(cluster='cluster-1', session=session)
+        return vcc.collect_vsan_capacity(), vcc.collect_health_status()
+    finally:
+        session.close()
+
+
+@pytest.mark.parametrize('encoding, body', [
+    ('gzip', gzip.compress(BODY)),
+    ('deflate', zlib.compress(BODY)),
+    ('deflate', zlib.compress(BODY)[2:-4]),
+    ('identity', BODY),
+    (None, BODY),
+])
+def test_decode_body(encoding, body):
+    assert decode_body(body, encoding) == BODY
+
+
+def test_fake_vcenter_compresses(server):
+    connection = http.client.HTTPConnection(server.address)
+    connection.request('GET', '/sdk/vimServiceVersions.xml', headers={'Accept-Encoding': 'gzip, deflate'})
+    response = connection.getresponse()
+    assert response.getheader('Content-Encoding') == 'gzip'
+    assert gzip.decompress(response.read()).startswith(b'<namespaces')
+    connection.close()
+
+
+def test_record_replay_compressed_responses(server, tmp_path):
+    path = str(tmp_path / 'cassette.json')
+    recorded = collect(Recorder(path, inner=Redirector(server.address)))
+
+    with open(path) as f:
+        exchanges = json.load(f)['exchanges']
+    assert 'VsanQueryVcClusterHealthSummary' in [x['operation'] for x in exchanges]
+    assert all(x['body'].startswith('<?xml') for x in exchanges)
+    assert all(set(x['headers']) <= {'content-type'} for x in exchanges)
+
+    assert collect(Replayer(path)) == recorded
+
+
+def test_recorder_closes_inner_transport(server, tmp_path):
+    inner = ClosingTransport(server.address)
+    recorder = Recorder(str(tmp_path / 'cassette.json'), inner=inner)
+    recorder.close()
+    assert inner.closed